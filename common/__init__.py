@@ -0,0 +1 @@
+# 作业脚本共用的数据加载、解析与分析模块
@@ -0,0 +1,80 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# 可合并的部分聚合：每个批次/文件各自累加，最后 merge 得到全量结果，内存只与批次大小和不同取值个数有关。
+
+
+class Histogram:
+    """固定分箱直方图，分箱边界在创建时确定，可跨批次/进程合并。"""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+    @classmethod
+    def uniform(cls, lo, hi, bins):
+        if hi <= lo:
+            hi = lo + 1
+        return cls(np.linspace(lo, hi, bins + 1))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.counts += np.histogram(values, bins=self.edges)[0]
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("分箱边界不一致，无法合并")
+        self.counts += other.counts
+        return self
+
+    @property
+    def centers(self):
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+
+def update_counter(counter, values):
+    """把一批取值的频数累加进 Counter（空值不计）；category 类型按编码计数，未出现的类别不计入。"""
+    counts = pd.Series(values).value_counts(dropna=True)
+    counter.update(counts[counts > 0].to_dict())
+    return counter
+
+
+def merge_counters(counters):
+    total = Counter()
+    for c in counters:
+        total.update(c)
+    return total
+
+
+def top_k(counter, k):
+    return pd.Series(dict(counter.most_common(k)), dtype="int64")
+
+
+# ---------- 基于 Parquet 统计信息的取值范围 ----------
+def parquet_min_max(files, column):
+    """从各 row group 的 min/max 统计信息得到列的全局取值范围，不读取数据页；
+    统计信息缺失时回退为只读取该列扫描一遍。"""
+    lo, hi = None, None
+    for f in files:
+        meta = pq.ParquetFile(f).metadata
+        idx = meta.schema.names.index(column)
+        for i in range(meta.num_row_groups):
+            stats = meta.row_group(i).column(idx).statistics
+            if stats is None or not stats.has_min_max:
+                col = pq.read_table(f, columns=[column]).column(column)
+                stats_lo, stats_hi = pc.min_max(col).values()
+                stats_lo, stats_hi = stats_lo.as_py(), stats_hi.as_py()
+                if stats_lo is None:
+                    break
+                lo = stats_lo if lo is None else min(lo, stats_lo)
+                hi = stats_hi if hi is None else max(hi, stats_hi)
+                break
+            lo = stats.min if lo is None else min(lo, stats.min)
+            hi = stats.max if hi is None else max(hi, stats.max)
+    return lo, hi
@@ -0,0 +1,126 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from common.timestamps import ISO8601, EpochLists
+
+# 评分流水线的计算后端：流水线只通过下面这组小接口操作数据，同一份评分代码可以在 CPU 或 GPU 上运行。
+#   from_arrow / to_arrow / select / assign：Arrow 表与后端数据帧之间的转换与列操作
+#   column：取出一列为 float64（空值为 NaN），列之间可直接做四则运算
+#   fill_null / min_max / to_numpy / value_counts：单列操作，to_numpy 只拷贝一列到主机内存
+#   latest_days_since：时间戳列表列 -> 最近一次距 today 的天数
+#   cut：按边界分层（与 pd.cut(include_lowest=True) 一致），在后端内完成，不做整表转换
+# CPUBackend（NumPy/pyarrow）为默认后端；CuDFBackend 只在安装了 cudf 时可用。
+
+
+class CPUBackend:
+    name = "cpu"
+
+    def from_arrow(self, table):
+        return table
+
+    def to_arrow(self, frame):
+        return frame
+
+    def select(self, frame, columns):
+        return frame.select(columns)
+
+    def assign(self, frame, **columns):
+        for name, values in columns.items():
+            values = values if isinstance(values, (pa.Array, pa.ChunkedArray)) else pa.array(values, from_pandas=True)
+            if name in frame.column_names:
+                frame = frame.set_column(frame.column_names.index(name), name, values)
+            else:
+                frame = frame.append_column(name, values)
+        return frame
+
+    def column(self, frame, name):
+        return pc.cast(frame.column(name), pa.float64()).to_numpy()
+
+    def fill_null(self, values, value):
+        return np.where(np.isnan(values), value, values)
+
+    def min_max(self, values):
+        return float(np.nanmin(values)), float(np.nanmax(values))
+
+    def to_numpy(self, values):
+        return np.asarray(values, dtype=float)
+
+    def value_counts(self, values):
+        counts = pc.value_counts(values.dictionary_decode() if isinstance(values, pa.DictionaryArray) else values)
+        return {v["values"]: v["counts"] for v in counts.to_pylist() if v["values"] is not None}
+
+    def latest_days_since(self, frame, name, today, fmt):
+        # 展平为 CSR 结构的 int64 秒，按行分段求最大值
+        return EpochLists.from_arrow(frame.column(name), fmt).days_since_latest(today)
+
+    def cut(self, values, edges, labels):
+        values = np.asarray(values, dtype=float)
+        # 右闭区间 (edges[i], edges[i+1]]，第一个区间包含左端点
+        idx = np.searchsorted(edges, values, side="left") - 1
+        idx[values == edges[0]] = 0
+        mask = np.isnan(values) | (idx < 0) | (idx >= len(labels))
+        indices = pa.array(np.clip(idx, 0, len(labels) - 1).astype(np.int32), mask=mask)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(labels, type=pa.string()))
+
+
+class CuDFBackend:
+    name = "cudf"
+
+    def __init__(self):
+        import cudf  # 未安装 cudf 时抛出 ImportError
+        self.cudf = cudf
+
+    def from_arrow(self, table):
+        return self.cudf.DataFrame.from_arrow(table)
+
+    def to_arrow(self, frame):
+        return frame.to_arrow(preserve_index=False)
+
+    def select(self, frame, columns):
+        return frame[list(columns)]
+
+    def assign(self, frame, **columns):
+        frame = frame.copy(deep=False)
+        for name, values in columns.items():
+            frame[name] = values
+        return frame
+
+    def column(self, frame, name):
+        return frame[name].astype("float64")
+
+    def fill_null(self, values, value):
+        return values.fillna(value)
+
+    def min_max(self, values):
+        return float(values.min()), float(values.max())
+
+    def to_numpy(self, values):
+        return values.to_numpy(na_value=np.nan)
+
+    def value_counts(self, values):
+        return values.value_counts().to_pandas().to_dict()
+
+    def latest_days_since(self, frame, name, today, fmt):
+        # ISO8601 交给 cudf 自行识别
+        parsed = self.cudf.to_datetime(frame[name].explode(), format=None if fmt == ISO8601 else fmt, errors="coerce")
+        latest = parsed.groupby(level=0).max().reindex(frame.index)
+        return (self.cudf.to_datetime(today) - latest).dt.days.astype("float64")
+
+    def cut(self, values, edges, labels):
+        return self.cudf.cut(values, bins=edges, labels=labels, include_lowest=True)
+
+
+BACKENDS = {"cpu": CPUBackend, "cudf": CuDFBackend}
+
+
+def get_backend(name="cpu"):
+    """按名称创建后端；"auto" 在 cudf 可用时使用 GPU，否则回退到 CPU。"""
+    if name == "auto":
+        try:
+            return CuDFBackend()
+        except ImportError:
+            return CPUBackend()
+    if name not in BACKENDS:
+        raise ValueError(f"未知的计算后端：{name}（可选 {', '.join(BACKENDS)}、auto）")
+    return BACKENDS[name]()
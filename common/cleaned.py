@@ -0,0 +1,136 @@
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from common.cleaning import abnormal_masks
+from common.json_cache import CACHE_DIR_ENV, file_fingerprint, load_parsed
+from common.loader import CLEANED_SUFFIX, list_files, load_table
+from common.parallel import map_reduce
+from common.profiling import stage
+from common.validators import DEFAULT_RULES, validate
+
+# 清洗后的数据集：每个 part 文件对应一个未压缩的 Arrow IPC（Feather v2）文件，包含填充/替换后的原始列、
+# 解析缓存中的 JSON 字段、email_valid / phone_valid / empty_purchase / empty_login 与 gender 哑变量，
+# 已删除 income 异常记录与无行为用户。下游评分与挖掘脚本以内存映射方式读取（common.loader.open_cleaned），
+# 不再重复解码 Parquet 和清洗。文件元数据中记录版本、源文件指纹与填充值，三者任一变化时重新写出。
+
+CLEANED_VERSION = "2"
+JSON_COLUMNS = ("purchase_history", "login_history")
+# 与原清洗脚本一致：标准化为 male / female / other，其余（含缺失）为 unknown
+GENDER_MAP = {"male": "male", "female": "female", "other": "other"}
+GENDER_LEVELS = ["female", "male", "other", "unknown"]
+
+
+def default_cleaned_dir(files):
+    data_dir = os.path.dirname(os.path.abspath(files[0]))
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    # 共用缓存目录时按数据集目录名区分，避免不同数据集的同名 part 文件互相覆盖
+    return os.path.join(cache_dir, "_cleaned", os.path.basename(data_dir)) if cache_dir else os.path.join(data_dir, "_cleaned")
+
+
+def cleaned_path_for(path, out_dir):
+    base = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_dir, base + CLEANED_SUFFIX)
+
+
+def cleaned_files(out_dir):
+    return list_files(os.path.join(out_dir, "*" + CLEANED_SUFFIX))
+
+
+def _expected_key(path, fill):
+    fill = {k: v.item() if hasattr(v, "item") else v for k, v in fill.items()}  # numpy 标量转为 JSON 可写的值
+    return {"version": CLEANED_VERSION, "source": file_fingerprint(path), "fill": fill}
+
+
+def _read_key(cleaned_file):
+    try:
+        meta = pa.ipc.open_file(pa.memory_map(cleaned_file)).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    raw = meta.get(b"dm_cleaned")
+    return json.loads(raw) if raw else None
+
+
+# ---------- 单个分区的清洗 ----------
+def _gender_dummies(gender):
+    labels = np.array([GENDER_MAP.get(str(g).lower(), "unknown") for g in gender.dictionary.to_pylist()] + ["unknown"])
+    codes = gender.indices.fill_null(len(labels) - 1).to_numpy(zero_copy_only=False)
+    normalized = labels[codes]
+    return {"gender_" + level: pa.array(normalized == level) for level in GENDER_LEVELS}
+
+
+def clean_partition(path, fill):
+    """按 fill_values 的填充值清洗单个 part 文件，返回清洗后的 Arrow 表（行顺序与源文件一致）。"""
+    columns = [c for c in pq.read_schema(path).names if c not in JSON_COLUMNS]
+    table = load_table(path, columns=columns)
+    parsed = load_parsed(path)
+    df = table.select(['age', 'income']).to_pandas()
+    abnormal_age, abnormal_income = abnormal_masks(df)
+
+    # ---------- 缺失值填充与异常年龄替换 ----------
+    age = df['age'].fillna(fill['age']).astype("float64")
+    age[abnormal_age] = fill['age_abnormal']
+    income = df['income'].fillna(fill['income'])
+    gender = pc.fill_null(table.column('gender').cast(pa.string()), fill['gender'])
+    gender = pc.dictionary_encode(gender.combine_chunks())
+    out = {name: table.column(name) for name in columns}
+    out.update(age=pa.array(age.to_numpy()), income=pa.array(income.to_numpy()), gender=gender)
+
+    # ---------- 解析字段与校验结果 ----------
+    out.update({name: parsed.column(name) for name in parsed.column_names})
+    valid = validate(table, DEFAULT_RULES)
+    out.update({name: valid.column(name) for name in valid.column_names})
+    empty_purchase = pc.equal(parsed.column('item_count'), 0)
+    empty_login = pc.equal(pc.list_value_length(parsed.column('login_timestamps')).fill_null(0), 0)
+    out.update(empty_purchase=empty_purchase, empty_login=empty_login)
+    out.update(_gender_dummies(gender))
+
+    # 删除 income 异常记录与无行为用户
+    keep = pc.and_(pa.array(~abnormal_income.to_numpy()), pc.invert(pc.and_(empty_purchase, empty_login)))
+    return pa.table(out).filter(keep)
+
+
+def _write_cleaned(task):
+    path, fill, out_dir = task
+    cleaned_file = cleaned_path_for(path, out_dir)
+    key = _expected_key(path, fill)
+    if os.path.exists(cleaned_file) and _read_key(cleaned_file) == key:
+        return [(cleaned_file, False)]
+
+    # IPC 文件格式要求同一列在各批次中使用同一字典；不压缩，读取时才能直接映射
+    table = clean_partition(path, fill).unify_dictionaries().combine_chunks()
+    table = table.replace_schema_metadata({b"dm_cleaned": json.dumps(key).encode("utf-8")})
+    tmp_file = cleaned_file + ".tmp"
+    with pa.OSFile(tmp_file, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_file, cleaned_file)
+    return [(cleaned_file, True)]
+
+
+def write_cleaned(files, fill, out_dir=None, workers=None):
+    """把 files 清洗后写出到 out_dir（默认数据目录下的 _cleaned/），返回 (清洗后文件列表, 本次写出的文件数)。
+
+    源文件与填充值均未变化的分区直接复用已有文件。
+    """
+    files = list(files)
+    out_dir = out_dir or default_cleaned_dir(files)
+    os.makedirs(out_dir, exist_ok=True)
+    with stage("cleaning_write"):
+        results = map_reduce(_write_cleaned, [(f, fill, out_dir) for f in files], lambda a, b: a + b, workers) or []
+    return [p for p, _ in results], sum(written for _, written in results)
+
+
+def resolve_files(files, cleaned=False, out_dir=None):
+    """cleaned=True 时返回 files 对应的清洗后数据集文件（需先运行 hw1/2-1.py 写出），否则原样返回。"""
+    files = list(files)
+    if not cleaned or not files:
+        return files
+    paths = [cleaned_path_for(f, out_dir or default_cleaned_dir(files)) for f in files]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(f"缺少清洗后的数据集文件（请先运行 hw1/2-1.py）：{missing[0]} 等 {len(missing)} 个")
+    return paths
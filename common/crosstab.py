@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from common.json_cache import load_parsed
+from common.transactions import _dictionary_codes
+
+# 二维列联表：两个低基数字段（如 支付方式 × 商品类别）按整数编码一次 bincount 得到计数矩阵，
+# 单项前件 -> 单项后件 的支持度、置信度、提升度都由矩阵及其行/列边际和直接算出，不经过事务编码与项集挖掘。
+# 计数矩阵可按分区构建后合并（按标签对齐），因此可以覆盖全部 part 文件。
+
+HIGH_VALUE_PRICE = 5000
+PAYMENT_CATEGORY_COLUMNS = ["payment_method", "categories", "avg_price"]
+
+
+class ContingencyTable:
+    def __init__(self, rows, cols, counts, flagged=None):
+        # rows / cols：行、列标签；counts：len(rows) × len(cols) 的 int64 计数矩阵；
+        # flagged：各行中带标记（如高价值）的记录数，与 counts 同一遍统计
+        self.rows = list(rows)
+        self.cols = list(cols)
+        self.counts = counts
+        self.flagged = flagged if flagged is not None else np.zeros(len(self.rows), dtype=np.int64)
+
+    @classmethod
+    def from_codes(cls, row_codes, rows, col_codes, cols, flag=None):
+        """由两列整数编码（空值为 -1）构建；任一列为空的记录不计。"""
+        row_codes, col_codes = np.asarray(row_codes), np.asarray(col_codes)
+        keep = (row_codes >= 0) & (col_codes >= 0)
+        cells = row_codes[keep].astype(np.int64) * len(cols) + col_codes[keep]
+        counts = np.bincount(cells, minlength=len(rows) * len(cols)).reshape(len(rows), len(cols))
+        flagged = None
+        if flag is not None:
+            flagged = np.bincount(row_codes[keep & np.asarray(flag, dtype=bool)], minlength=len(rows))
+        return cls(rows, cols, counts.astype(np.int64), None if flagged is None else flagged.astype(np.int64))
+
+    @property
+    def n(self):
+        return int(self.counts.sum())
+
+    def merge(self, other):
+        """按标签对齐后相加；一侧没有的标签补 0。"""
+        rows = {label: i for i, label in enumerate(self.rows)}
+        for label in other.rows:
+            rows.setdefault(label, len(rows))
+        cols = {label: i for i, label in enumerate(self.cols)}
+        for label in other.cols:
+            cols.setdefault(label, len(cols))
+        counts = np.zeros((len(rows), len(cols)), dtype=np.int64)
+        flagged = np.zeros(len(rows), dtype=np.int64)
+        for table in (self, other):
+            r = np.array([rows[x] for x in table.rows], dtype=np.int64)
+            c = np.array([cols[x] for x in table.cols], dtype=np.int64)
+            counts[np.ix_(r, c)] += table.counts
+            flagged[r] += table.flagged
+        self.rows, self.cols, self.counts, self.flagged = list(rows), list(cols), counts, flagged
+        return self
+
+    def to_frame(self):
+        return pd.DataFrame(self.counts, index=self.rows, columns=self.cols)
+
+    def flagged_shares(self):
+        """带标记记录在各行上的占比（只保留出现过的行），降序。"""
+        total = self.flagged.sum()
+        shares = pd.Series(self.flagged / total if total else self.flagged.astype(float), index=self.rows)
+        return shares[shares > 0].sort_values(ascending=False)
+
+    def rules(self, min_support=0.0, min_confidence=0.0, row_prefix="", col_prefix=""):
+        """行 -> 列 的单项规则，列与 itemsets.association_rules 一致（项为加上前缀的标签）。"""
+        n = self.n
+        if not n:
+            return pd.DataFrame(columns=["antecedents", "consequents", "antecedent support", "consequent support",
+                                         "support", "confidence", "lift", "leverage", "conviction"])
+        row_total = self.counts.sum(axis=1)
+        col_total = self.counts.sum(axis=0)
+        r, c = np.nonzero(self.counts)
+        support = self.counts[r, c] / n
+        antecedent = row_total[r] / n
+        consequent = col_total[c] / n
+        confidence = self.counts[r, c] / row_total[r]
+        rules = pd.DataFrame({
+            "antecedents": [frozenset([f"{row_prefix}{self.rows[i]}"]) for i in r],
+            "consequents": [frozenset([f"{col_prefix}{self.cols[j]}"]) for j in c],
+            "antecedent support": antecedent,
+            "consequent support": consequent,
+            "support": support,
+            "confidence": confidence,
+            "lift": confidence / consequent,
+            "leverage": support - antecedent * consequent,
+        })
+        with np.errstate(divide="ignore"):
+            rules["conviction"] = np.where(confidence >= 1, np.inf, (1 - consequent) / (1 - confidence))
+        keep = (rules["support"] >= min_support) & (rules["confidence"] >= min_confidence)
+        return rules[keep].sort_values("lift", ascending=False).reset_index(drop=True)
+
+
+# ---------- 单个分区 ----------
+def payment_category_table(path, high_value_price=HIGH_VALUE_PRICE):
+    """支付方式 × 商品类别 的计数矩阵，同一遍统计价格 > high_value_price 的记录在各支付方式上的个数（hw2/2.py）。"""
+    return payment_category_from(load_parsed(path, columns=PAYMENT_CATEGORY_COLUMNS), high_value_price)
+
+
+def payment_category_from(parsed, high_value_price=HIGH_VALUE_PRICE):
+    """同 payment_category_table，输入为已读取的解析列（含 PAYMENT_CATEGORY_COLUMNS）。"""
+    pay, pay_dict = _dictionary_codes(parsed.column("payment_method"))
+    cat, cat_dict = _dictionary_codes(parsed.column("categories"))
+    price = parsed.column("avg_price").to_numpy(zero_copy_only=False)
+    high_value = np.nan_to_num(price.astype(float), nan=0.0) > high_value_price
+    return ContingencyTable.from_codes(pay, pay_dict.to_pylist(), cat, cat_dict.to_pylist(), flag=high_value)
@@ -0,0 +1,121 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.json_cache import CACHE_DIR_ENV, file_fingerprint, load_parsed
+from common.loader import CLEANED_SUFFIX
+from common.parallel import map_reduce
+
+# 时间 × 类别聚合立方体：一次扫描得到 (year, month, quarter, weekday, category) -> (count, revenue)，
+# 按来源 part 文件分别保存各自的部分聚合并持久化。再次运行时只重新聚合新增或发生变化（大小/mtime）的
+# part 文件，其余直接复用；季节性分析的各种透视都由立方体上卷得到，不再回到明细数据。
+
+CUBE_VERSION = "1"
+DIMENSIONS = ["year", "month", "quarter", "weekday", "category"]
+MEASURES = ["count", "revenue"]
+CUBE_COLUMNS = ["categories", "purchase_date", "avg_price"]
+
+
+def default_cube_path(files, name="time_category_cube"):
+    data_dir = os.path.dirname(os.path.abspath(files[0]))
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    cube_dir = os.path.join(cache_dir, "_aggregates", os.path.basename(data_dir)) if cache_dir else os.path.join(data_dir, "_aggregates")
+    # 清洗后数据集与原始数据在共用缓存目录下同名，分开保存，避免交替运行时互相覆盖、整体重新聚合
+    if files[0].endswith(CLEANED_SUFFIX):
+        name += ".cleaned"
+    return os.path.join(cube_dir, name + ".parquet")
+
+
+# ---------- 单个分区的聚合 ----------
+def partition_cube(path):
+    """单个 part 文件的立方体单元；revenue 为购买记录 avg_price 之和，缺失记 0。"""
+    return cube_cells_from(load_parsed(path, columns=CUBE_COLUMNS))
+
+
+def cube_cells_from(parsed):
+    """同 partition_cube，输入为已读取的解析列（含 CUBE_COLUMNS）。"""
+    parsed = parsed.to_pandas()
+    parsed = parsed.dropna(subset=["categories", "purchase_date"])
+    date = pd.to_datetime(parsed["purchase_date"], errors="coerce")
+    keep = date.notna()
+    date = date[keep]
+    frame = pd.DataFrame({
+        "year": date.dt.year,
+        "month": date.dt.month,
+        "quarter": date.dt.quarter,
+        "weekday": date.dt.dayofweek,  # 0=Monday
+        "category": parsed["categories"][keep],
+        "revenue": parsed["avg_price"][keep].fillna(0),
+    })
+    cells = frame.groupby(DIMENSIONS, observed=True).agg(count=("revenue", "size"), revenue=("revenue", "sum")).reset_index()
+    return cells.astype({"year": "int32", "month": "int8", "quarter": "int8", "weekday": "int8", "count": "int64"})
+
+
+def merge_cells(a, b):
+    """两份立方体单元相加（按维度对齐）。"""
+    cells = pd.concat([a, b], ignore_index=True)
+    return cells.groupby(DIMENSIONS, observed=True, as_index=False)[MEASURES].sum()
+
+
+def _partition_cells(path):
+    fingerprint = file_fingerprint(path)
+    cells = partition_cube(path)
+    cells.insert(0, "source", fingerprint["path"])
+    return [(fingerprint, cells)]
+
+
+class TimeCategoryCube:
+    def __init__(self, cells=None, sources=None):
+        # cells：source + DIMENSIONS + MEASURES；sources：{源文件绝对路径: 指纹}
+        self.cells = cells if cells is not None else pd.DataFrame(columns=["source"] + DIMENSIONS + MEASURES)
+        self.sources = sources or {}
+
+    # ---------- 持久化 ----------
+    @classmethod
+    def load(cls, path):
+        """读取已保存的立方体；文件不存在或版本不符时返回空立方体。"""
+        if not os.path.exists(path):
+            return cls()
+        table = pq.read_table(path)
+        meta = json.loads((table.schema.metadata or {}).get(b"dm_cube", b"{}"))
+        if meta.get("version") != CUBE_VERSION:
+            return cls()
+        return cls(table.replace_schema_metadata(None).to_pandas(), meta["sources"])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        table = pa.Table.from_pandas(self.cells, preserve_index=False)
+        meta = {"version": CUBE_VERSION, "sources": self.sources}
+        table = table.replace_schema_metadata({b"dm_cube": json.dumps(meta).encode("utf-8")})
+        tmp_file = path + ".tmp"
+        pq.write_table(table, tmp_file)
+        os.replace(tmp_file, path)
+
+    # ---------- 增量更新 ----------
+    def stale(self, files):
+        """需要（重新）聚合的文件：未收录或指纹发生变化。"""
+        return [f for f in files if self.sources.get(os.path.abspath(f)) != file_fingerprint(f)]
+
+    def update(self, files, workers=None):
+        """使立方体与 files 一致：聚合新增/变化的文件，移除不在 files 中的来源。返回重新聚合的文件数。"""
+        current = {os.path.abspath(f) for f in files}
+        stale = self.stale(files)
+        results = map_reduce(_partition_cells, stale, lambda a, b: a + b, workers=workers) or []
+
+        replaced = {fp["path"] for fp, _ in results}
+        keep = self.cells["source"].isin(current - replaced)
+        parts = [cells for cells in [self.cells[keep]] + [cells for _, cells in results] if len(cells)]
+        self.cells = pd.concat(parts, ignore_index=True) if parts else self.cells[keep]
+        self.sources = {p: fp for p, fp in self.sources.items() if p in current - replaced}
+        self.sources.update({fp["path"]: fp for fp, _ in results})
+        return len(stale)
+
+    # ---------- 上卷查询 ----------
+    def rollup(self, dims, measure="count"):
+        """按 dims 汇总 measure；两个维度时第二个维度展开为列（与 groupby(...).size().unstack() 相同）。"""
+        totals = self.cells.groupby(list(dims), observed=True)[measure].sum()
+        return totals.unstack().fillna(0) if len(dims) == 2 else totals
+
@@ -0,0 +1,126 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.itemsets import association_rules
+from common.json_cache import file_fingerprint
+from common.manifest import ITEMSET_FLOOR, PartitionManifest, default_manifest_dir
+from common.son import son_from_local_counts, son_mine
+from common.transactions import category_transactions, refund_transactions
+
+# 阈值扫描缓存：以最低支持度 floor 得到一次频繁项集并保存，之后任意不低于 floor 的支持度、任意置信度/提升度
+# 的查询都只在缓存上筛选并生成规则（频繁项集的子集也频繁，筛选后的结果与直接挖掘一致）。
+# floor 的频繁项集由剪枝的 SON/Eclat 得到：floor 不低于分区清单的 ITEMSET_FLOOR 时复用清单中各分区的局部频繁项集
+# 与次数，只对新增或变化的 part 重新挖掘；更低的 floor 直接对全部 part 做两阶段 SON。
+# 缓存键为 交易定义（分区清单中的项集种类）+ 全部 part 的指纹 + max_len；同一键下保存各个 floor 的结果，
+# 查询时取 floor 不超过所需支持度的最大一份。
+#   <清单目录>/frequent/<种类>.<键>.<floor>.parquet   support + itemsets（字符串列表），元数据中记录交易数
+
+CACHE_VERSION = "1"
+# 交易定义 -> 单个 part 的交易（位图）
+ITEMSET_KINDS = {"category_itemsets": category_transactions, "refund_itemsets": refund_transactions}
+DEFAULT_FLOOR = ITEMSET_FLOOR
+
+
+def _cache_key(files, max_len):
+    fingerprints = sorted((fp["path"], fp["size"], fp["mtime_ns"]) for fp in map(file_fingerprint, files))
+    payload = json.dumps({"version": CACHE_VERSION, "files": fingerprints, "max_len": max_len})
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def rules_from_frequent(frequent, min_confidence=0.0, min_lift=None):
+    """按置信度（及提升度）阈值生成关联规则，按 lift 降序。"""
+    rules = association_rules(frequent, metric="confidence", min_threshold=min_confidence)
+    if min_lift is not None:
+        rules = rules[rules["lift"] >= min_lift]
+    return rules.sort_values(by="lift", ascending=False)
+
+
+class ItemsetCache:
+    def __init__(self, root):
+        self.root = root
+
+    @classmethod
+    def for_files(cls, files):
+        return cls(os.path.join(default_manifest_dir(list(files)), "frequent"))
+
+    def _path(self, kind, key, floor):
+        return os.path.join(self.root, f"{kind}.{key}.{floor!r}.parquet")
+
+    def _cached_floors(self, kind, key):
+        floors = []
+        for path in glob.glob(os.path.join(self.root, f"{kind}.{key}.*.parquet")):
+            floor = os.path.basename(path)[len(f"{kind}.{key}."):-len(".parquet")]
+            try:
+                floors.append(float(floor))
+            except ValueError:
+                continue
+        return sorted(floors)
+
+    def frequent(self, files, kind, min_support, floor=DEFAULT_FLOOR, max_len=None, workers=None):
+        """支持度 >= min_support 的频繁项集与交易数；缓存中没有可用的 floor 时，以 min(floor, min_support) 计算并保存。
+
+        返回 (频繁项集 DataFrame, 交易数, 是否命中缓存)。
+        """
+        if kind not in ITEMSET_KINDS:
+            raise ValueError(f"未知的交易定义：{kind}，可选 {list(ITEMSET_KINDS)}")
+        files = list(files)
+        key = _cache_key(files, max_len)
+        usable = [f for f in self._cached_floors(kind, key) if f <= min_support]
+        if usable:
+            frequent, n = self._load(self._path(kind, key, usable[-1]))
+            hit = True
+        else:
+            floor = min(floor, min_support)
+            frequent, n = self._mine(files, kind, floor, max_len, workers)
+            self._save(self._path(kind, key, floor), frequent, n)
+            hit = False
+        # 与 SON 相同的计数阈值，避免浮点比较造成边界上的差异
+        counts = np.rint(frequent["support"].to_numpy() * n)
+        frequent = frequent[counts >= np.ceil(min_support * n - 1e-9)].reset_index(drop=True)
+        return frequent, n, hit
+
+    def rules(self, files, kind, min_support, min_confidence=0.0, min_lift=None, floor=DEFAULT_FLOOR, max_len=None, workers=None):
+        """在缓存的频繁项集上按阈值生成关联规则，返回 (频繁项集, 规则, 是否命中缓存)；规则按 lift 降序。"""
+        frequent, _, hit = self.frequent(files, kind, min_support, floor=floor, max_len=max_len, workers=workers)
+        return frequent, rules_from_frequent(frequent, min_confidence, min_lift), hit
+
+    @staticmethod
+    def _mine(files, kind, floor, max_len, workers):
+        build_transactions = ITEMSET_KINDS[kind]
+        if floor < ITEMSET_FLOOR:
+            # 清单中的局部结果用不上，交易数由 SON 第一阶段给出
+            return son_mine(files, build_transactions, min_support=floor, max_len=max_len, workers=workers)
+        partials, _ = PartitionManifest.for_files(files).partials(files, kind, workers=workers)
+        n = sum(n_i for _, n_i in partials)
+        frequent = son_from_local_counts(files, partials, build_transactions, floor, ITEMSET_FLOOR,
+                                         max_len=max_len, workers=workers)
+        return frequent, n
+
+    # ---------- 读写 ----------
+    def _save(self, path, frequent, n_transactions):
+        os.makedirs(self.root, exist_ok=True)
+        table = pa.table({
+            "support": pa.array(frequent["support"].to_numpy(), type=pa.float64()),
+            "itemsets": pa.array([sorted(s) for s in frequent["itemsets"]], type=pa.list_(pa.string())),
+        })
+        meta = {"version": CACHE_VERSION, "n_transactions": n_transactions}
+        table = table.replace_schema_metadata({b"dm_itemsets": json.dumps(meta).encode("utf-8")})
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _load(path):
+        table = pq.read_table(path)
+        meta = json.loads(table.schema.metadata[b"dm_itemsets"])
+        frequent = pd.DataFrame({
+            "support": table.column("support").to_numpy(),
+            "itemsets": [frozenset(s) for s in table.column("itemsets").to_pylist()],
+        })
+        return frequent, meta["n_transactions"]
@@ -0,0 +1,234 @@
+from collections import Counter
+from itertools import chain, combinations
+
+import numpy as np
+import pandas as pd
+
+from common.profiling import timed
+
+# 基于垂直位图的频繁项集挖掘（Eclat）：每个项对应一个按交易编号打包的 uint64 位图，
+# 候选项集的支持度由位图按位与后 popcount 得到。输出格式与 mlxtend 的 apriori /
+# association_rules 保持一致，下游代码无需改动。
+# 相同的交易可以合并为一位并带上出现次数（weights），此时支持度为按位与后各位的次数之和。
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words):
+        return np.bitwise_count(words)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return _BYTE_COUNTS[words.view(np.uint8)].reshape(*words.shape, 8).sum(axis=-1)
+
+
+class TransactionBitmaps:
+    """交易的垂直位图表示：items[i] 对应 bitmaps[i]，第 t 位表示第 t 条交易是否包含该项。
+
+    weights 为各交易的出现次数（None 表示均为 1），由 from_counts 构建。
+    """
+
+    def __init__(self, items, bitmaps, n_transactions, weights=None):
+        self.items = list(items)
+        self.bitmaps = bitmaps
+        self.n_transactions = n_transactions
+        self.weights = weights
+
+    @property
+    def total(self):
+        """按出现次数计的交易总数。"""
+        return self.n_transactions if self.weights is None else int(self.weights.sum())
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        transactions = list(transactions)
+        lengths = np.fromiter((len(t) for t in transactions), dtype=np.int64, count=len(transactions))
+        flat = list(chain.from_iterable(transactions))
+        codes, items = pd.factorize(pd.Series(flat, dtype=object), sort=True)
+        tids = np.repeat(np.arange(len(transactions), dtype=np.int64), lengths)
+        # 空值不作为项
+        keep = codes >= 0
+        return cls.from_codes(tids[keep], codes[keep], list(items), len(transactions))
+
+    @classmethod
+    def from_counts(cls, counts):
+        """由 transaction_counts 的结果（{交易项集: 次数}）构建，每个不同的交易占一位。"""
+        transactions = list(counts)
+        tb = cls.from_transactions([list(t) for t in transactions])
+        tb.weights = np.array([counts[t] for t in transactions], dtype=np.int64)
+        return tb
+
+    @classmethod
+    def from_dictionary(cls, tids, indices, dictionary, n_transactions):
+        """由字典编码的项构建：indices 为字典下标，只保留出现过的项，并按取值排序（与 from_transactions 一致）。"""
+        labels = np.asarray(list(dictionary), dtype=object)
+        indices = np.asarray(indices, dtype=np.int64)
+        used = np.unique(indices)
+        used = used[np.argsort([str(v) for v in labels[used]], kind="stable")]
+        remap = np.full(len(labels), -1, dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        return cls.from_codes(np.asarray(tids, dtype=np.int64), remap[indices], list(labels[used]), n_transactions)
+
+    @classmethod
+    def from_codes(cls, tids, codes, items, n_transactions):
+        n_words = max(1, (n_transactions + 63) // 64)
+        bitmaps = np.zeros((len(items), n_words), dtype=np.uint64)
+        bits = np.left_shift(np.uint64(1), (tids & 63).astype(np.uint64))
+        np.bitwise_or.at(bitmaps, (codes, tids >> 6), bits)
+        return cls(items, bitmaps, n_transactions)
+
+    def support_counts(self, prefix=None, candidates=None):
+        rows = self.bitmaps if candidates is None else self.bitmaps[candidates]
+        if prefix is not None:
+            rows = rows & prefix
+        return _supports(rows, self.weights)
+
+    def count_itemsets(self, itemsets):
+        """逐个统计项集（由原始项组成）的出现次数，含未出现项的项集计数为 0。"""
+        index = {item: i for i, item in enumerate(self.items)}
+        counts = np.zeros(len(itemsets), dtype=np.int64)
+        for pos, itemset in enumerate(itemsets):
+            rows = [index.get(item) for item in itemset]
+            if None in rows:
+                continue
+            counts[pos] = _supports(np.bitwise_and.reduce(self.bitmaps[rows], axis=0), self.weights)
+        return counts
+
+    def contains(self, itemset):
+        """各交易是否包含 itemset 的布尔数组（长度为交易数）。"""
+        index = {item: i for i, item in enumerate(self.items)}
+        if any(item not in index for item in itemset):
+            return np.zeros(self.n_transactions, dtype=bool)
+        words = np.bitwise_and.reduce(self.bitmaps[[index[item] for item in itemset]], axis=0)
+        bits = np.unpackbits(words.view(np.uint8), bitorder="little")
+        return bits[:self.n_transactions].astype(bool)
+
+
+def _supports(rows, weights=None):
+    # 最后一维为位图的支持度；有 weights 时为各位出现次数之和
+    if weights is None:
+        return _popcount(rows).sum(axis=-1, dtype=np.int64)
+    bits = np.unpackbits(rows.view(np.uint8), axis=-1, bitorder="little")[..., :len(weights)]
+    return bits.astype(np.int64) @ weights
+
+
+def _eclat(bitmaps, weights, prefix_items, prefix_bitmap, candidates, min_count, max_len, out):
+    if not len(candidates) or (max_len is not None and len(prefix_items) >= max_len):
+        return
+    rows = bitmaps[candidates] & prefix_bitmap
+    counts = _supports(rows, weights)
+    frequent = np.flatnonzero(counts >= min_count)
+    for pos, idx in enumerate(frequent):
+        itemset = prefix_items + (candidates[idx],)
+        out.append((itemset, counts[idx]))
+        _eclat(bitmaps, weights, itemset, rows[idx], candidates[frequent[pos + 1:]], min_count, max_len, out)
+
+
+def _transaction_rows(transactions, *args, **kwargs):
+    if isinstance(transactions, TransactionBitmaps):
+        return transactions.total
+    return len(transactions) if hasattr(transactions, "__len__") else None
+
+
+@timed("itemsets", rows=_transaction_rows)
+def mine_frequent_itemsets(transactions, min_support=0.5, max_len=None):
+    """挖掘频繁项集，返回与 mlxtend apriori(use_colnames=True) 相同的 support / itemsets 两列。
+
+    transactions 可以是交易列表（每条交易为项的列表）或已构建的 TransactionBitmaps（可带出现次数）。
+    """
+    tb = transactions if isinstance(transactions, TransactionBitmaps) else TransactionBitmaps.from_transactions(transactions)
+    n = tb.total
+    if n == 0:
+        return pd.DataFrame({"support": pd.Series(dtype=float), "itemsets": pd.Series(dtype=object)})
+    min_count = int(np.ceil(min_support * n - 1e-9))
+
+    counts = tb.support_counts()
+    frequent = np.flatnonzero(counts >= min_count)
+    found = []
+    for pos, idx in enumerate(frequent):
+        found.append(((idx,), counts[idx]))
+        _eclat(tb.bitmaps, tb.weights, (idx,), tb.bitmaps[idx], frequent[pos + 1:], min_count, max_len, found)
+
+    found.sort(key=lambda x: (len(x[0]), x[0]))
+    return pd.DataFrame({
+        "support": np.array([c for _, c in found], dtype=float) / n,
+        "itemsets": [frozenset(tb.items[i] for i in codes) for codes, _ in found],
+    })
+
+
+# ---------- 可合并的计数 ----------
+def transaction_counts(transactions):
+    """相同的交易合并计数，返回 (Counter{交易项集: 次数}, 交易数)。
+
+    各分区的结果相加即为全量，由 TransactionBitmaps.from_counts 构建后用 mine_frequent_itemsets 剪枝挖掘；
+    只保存不同的交易而不展开子集，大小不超过交易数。
+    """
+    tb = transactions if isinstance(transactions, TransactionBitmaps) else TransactionBitmaps.from_transactions(transactions)
+    counts = Counter()
+    if not len(tb.items):
+        if tb.n_transactions:
+            counts[frozenset()] = tb.n_transactions
+        return counts, tb.n_transactions
+    # 每条交易的项集合打包为若干个 uint64（不超过 64 项时为一个整数），相同的交易只保留一份
+    bits = np.unpackbits(tb.bitmaps.view(np.uint8), axis=1, bitorder="little")[:, :tb.n_transactions]
+    n_words = (len(tb.items) + 63) // 64
+    packed = np.zeros((tb.n_transactions, n_words * 8), dtype=np.uint8)
+    packed[:, :(len(tb.items) + 7) // 8] = np.packbits(bits, axis=0, bitorder="little").T
+    keys = packed.view(np.uint64)
+    if n_words == 1:
+        keys, sizes = np.unique(keys[:, 0], return_counts=True)
+        keys = keys[:, None]
+    else:
+        keys, sizes = np.unique(keys, axis=0, return_counts=True)
+    rows = np.unpackbits(np.ascontiguousarray(keys).view(np.uint8), axis=1, bitorder="little")
+    for row, size in zip(rows, sizes):
+        counts[frozenset(tb.items[i] for i in np.flatnonzero(row))] += int(size)
+    return counts, tb.n_transactions
+
+
+def frequent_from_counts(counts, n_transactions, min_support=0.5, max_len=None):
+    """由项集计数（{项集: 次数}，如 SON 合并后的结果）筛出频繁项集，列与顺序同 son_frequent_itemsets。"""
+    min_count = np.ceil(min_support * n_transactions - 1e-9)
+    found = sorted(
+        (s for s, c in counts.items() if c >= min_count and (max_len is None or len(s) <= max_len)),
+        key=lambda s: (len(s), sorted(s)),
+    )
+    return pd.DataFrame({
+        "support": np.array([counts[s] for s in found], dtype=float) / max(n_transactions, 1),
+        "itemsets": found,
+    })
+
+
+# ---------- 关联规则 ----------
+_METRICS = ("support", "confidence", "lift", "leverage", "conviction")
+
+
+def _itemset_rows(frequent_itemsets, *args, **kwargs):
+    return len(frequent_itemsets)
+
+
+@timed("association_rules", rows=_itemset_rows)
+def association_rules(frequent_itemsets, metric="confidence", min_threshold=0.8):
+    """由频繁项集生成关联规则，列与 mlxtend.frequent_patterns.association_rules 一致。"""
+    if metric not in _METRICS:
+        raise ValueError(f"不支持的度量：{metric}")
+    support = dict(zip(frequent_itemsets["itemsets"], frequent_itemsets["support"]))
+
+    rows = []
+    for itemset, sup in support.items():
+        if len(itemset) < 2:
+            continue
+        for k in range(1, len(itemset)):
+            for antecedent in combinations(itemset, k):
+                antecedent = frozenset(antecedent)
+                consequent = itemset - antecedent
+                rows.append((antecedent, consequent, support[antecedent], support[consequent], sup))
+
+    rules = pd.DataFrame(rows, columns=["antecedents", "consequents", "antecedent support", "consequent support", "support"])
+    rules["confidence"] = rules["support"] / rules["antecedent support"]
+    rules["lift"] = rules["confidence"] / rules["consequent support"]
+    rules["leverage"] = rules["support"] - rules["antecedent support"] * rules["consequent support"]
+    with np.errstate(divide="ignore"):
+        rules["conviction"] = np.where(
+            rules["confidence"] >= 1, np.inf, (1 - rules["consequent support"]) / (1 - rules["confidence"])
+        )
+    return rules[rules[metric] >= min_threshold].reset_index(drop=True)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.json_extract import ANY_OBJECT_LIST, JsonField, extract_fields
+from common.loader import is_cleaned, open_cleaned
+from common.profiling import timed
+
+# 每个 part-*.parquet 对应一个旁路缓存文件，保存 purchase_history / login_history 解析后的列式结果。
+# 缓存行顺序与源文件一致，可以直接按行与源数据拼接。
+
+CACHE_VERSION = "5"
+CACHE_DIR_ENV = "DM_CACHE_DIR"
+
+PURCHASE_FIELDS = [
+    JsonField("avg_price", "avg_price", pa.float64()),
+    JsonField("categories", "categories", pa.string(), dictionary=True),
+    # categories 也可能是类别列表（原脚本把整个列表作为一条交易），单独保存为列表列
+    JsonField("category_list", "categories", pa.list_(pa.string()), dictionary=True),
+    JsonField("item_count", "items", ANY_OBJECT_LIST, 0, "len"),
+    JsonField("item_categories", "items[].categories", pa.string(), dictionary=True),
+    JsonField("payment_method", "payment_method", pa.string(), dictionary=True),
+    JsonField("payment_status", "payment_status", pa.string(), dictionary=True),
+    JsonField("purchase_date", "purchase_date", pa.string()),
+]
+
+LOGIN_FIELDS = [
+    JsonField("login_count", "login_count", pa.int64(), 0),
+    JsonField("login_timestamps", "timestamps", pa.list_(pa.string())),
+]
+
+# 低基数的类别/支付字段以字典编码保存，读出后在 pandas 中为 category 类型
+DICTIONARY_STRING = pa.dictionary(pa.int32(), pa.string())
+
+PARSED_SCHEMA = pa.schema([
+    ("purchase_valid", pa.bool_()),
+    ("avg_price", pa.float64()),
+    ("categories", DICTIONARY_STRING),
+    ("category_list", pa.list_(DICTIONARY_STRING)),
+    ("item_count", pa.int32()),
+    ("item_categories", pa.list_(DICTIONARY_STRING)),
+    ("payment_method", DICTIONARY_STRING),
+    ("payment_status", DICTIONARY_STRING),
+    ("purchase_date", pa.string()),
+    ("login_valid", pa.bool_()),
+    ("login_count", pa.int64()),
+    ("login_timestamps", pa.list_(pa.string())),
+])
+
+
+# ---------- 源文件标识 ----------
+def file_fingerprint(path):
+    st = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def cache_path_for(path, cache_dir=None):
+    abs_path = os.path.abspath(path)
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.dirname(abs_path), "_parsed_cache")
+    digest = hashlib.sha1(abs_path.encode("utf-8")).hexdigest()[:10]
+    base = os.path.splitext(os.path.basename(abs_path))[0]
+    return os.path.join(cache_dir, f"{base}.{digest}.parsed.parquet")
+
+
+def _read_cache_key(cache_file):
+    try:
+        meta = pq.read_schema(cache_file).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    raw = meta.get(b"dm_cache_key")
+    return json.loads(raw) if raw else None
+
+
+def _expected_key(path):
+    key = file_fingerprint(path)
+    key["version"] = CACHE_VERSION
+    return key
+
+
+def is_fresh(path, cache_dir=None):
+    cache_file = cache_path_for(path, cache_dir)
+    return os.path.exists(cache_file) and _read_cache_key(cache_file) == _expected_key(path)
+
+
+# ---------- JSON 展平 ----------
+def parse_table(table):
+    """把含 purchase_history / login_history 两列的 Arrow 表展平为 PARSED_SCHEMA 列。"""
+    purchase = extract_fields(table.column("purchase_history"), PURCHASE_FIELDS, valid_name="purchase_valid")
+    login = extract_fields(table.column("login_history"), LOGIN_FIELDS, valid_name="login_valid")
+    columns = {name: purchase.column(name) for name in purchase.column_names}
+    columns.update({name: login.column(name) for name in login.column_names})
+    return pa.Table.from_arrays([columns[f.name] for f in PARSED_SCHEMA], schema=PARSED_SCHEMA)
+
+
+# ---------- 读写缓存 ----------
+@timed("json_parse")
+def build_cache(path, cache_dir=None):
+    source = pq.read_table(path, columns=["purchase_history", "login_history"])
+    parsed = parse_table(source)
+    meta = {b"dm_cache_key": json.dumps(_expected_key(path)).encode("utf-8")}
+    parsed = parsed.replace_schema_metadata(meta)
+
+    cache_file = cache_path_for(path, cache_dir)
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = cache_file + ".tmp"
+    pq.write_table(parsed, tmp_file)
+    os.replace(tmp_file, cache_file)  # 原子替换，避免中断后留下半个缓存
+    return parsed
+
+
+def load_parsed(path, columns=None, cache_dir=None, refresh=False):
+    """读取单个 part 文件的解析结果；缓存缺失或源文件变化（大小/mtime）时重新解析。
+
+    path 为清洗后的数据集文件时，其中已包含解析列，直接内存映射读取。
+    """
+    if is_cleaned(path):
+        return open_cleaned(path, columns)
+    cache_file = cache_path_for(path, cache_dir)
+    if not refresh and is_fresh(path, cache_dir):
+        return pq.read_table(cache_file, columns=columns)
+    parsed = build_cache(path, cache_dir)
+    return parsed.select(columns) if columns is not None else parsed
+
+
+def load_parsed_files(files, columns=None, cache_dir=None, refresh=False):
+    tables = [load_parsed(f, columns=columns, cache_dir=cache_dir, refresh=refresh) for f in files]
+    if not tables:
+        schema = PARSED_SCHEMA if columns is None else pa.schema([PARSED_SCHEMA.field(c) for c in columns])
+        return schema.empty_table()
+    return pa.concat_tables([t.replace_schema_metadata(None) for t in tables])
@@ -0,0 +1,318 @@
+import json
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+
+# 批量 JSON 字段抽取：把一整列 JSON 字符串拼成 NDJSON 交给 Arrow 的 C++ 解析器一次解析，
+# 按声明的字段规格取出各列。整段解析失败时按 Arrow 报告的出错行（或二分）缩小范围，出错行与小块
+# 改为逐行 json.loads 并逐字段转换类型：不是 JSON 对象的行所有字段取默认值（与原脚本 except 分支一致），
+# 单个字段类型不符时只有该字段取默认值，其余字段照常取出（与原脚本 data.get 的行为一致）。
+# 同一顶层路径可以再声明不同类型的字段（如 categories 既可能是字符串也可能是字符串列表）：Arrow 按先声明的
+# 类型解析，后声明的字段只在逐行解析时取值；整块解析成功说明块内没有该类型的值，直接为 null。
+
+# name: 输出列名；path: 字段路径，如 "avg_price"、"items"、"items[].categories"；
+# dtype: 路径处 JSON 值的 Arrow 类型；default: 缺失/为 null/整行解析失败时的取值；
+# reduce: 对列表值的归约，None / "len" / "max" / "min"；
+# dictionary: 输出为 Arrow 字典编码（低基数字符串列，列表列对元素编码）
+JsonField = namedtuple("JsonField", ["name", "path", "dtype", "default", "reduce", "dictionary"],
+                       defaults=[None, None, False])
+
+# 只关心列表长度、不关心元素内容时使用的类型
+ANY_OBJECT_LIST = pa.list_(pa.struct([]))
+
+DEFAULT_BATCH_SIZE = 65536
+_MIN_BLOCK_SIZE = 1 << 20
+# 不超过该行数的块解析失败时不再二分，直接逐行解析
+_FALLBACK_ROWS = 64
+_ERROR_ROW = re.compile(r"in row (\d+)")
+
+
+# ---------- 字段规格 -> 解析 schema ----------
+def _split_path(path):
+    tokens = []
+    for part in path.split("."):
+        is_list = part.endswith("[]")
+        tokens.append((part[:-2] if is_list else part, is_list))
+    return tokens
+
+
+def _insert(tree, tokens, dtype, path):
+    key, is_list = tokens[0]
+    kind = "list" if is_list else "struct"
+    existing = tree.get(key)
+    if len(tokens) == 1:
+        # 只取长度的列表可以与取子字段的同名列表共用同一个 list<struct>
+        if existing is None:
+            tree[key] = dtype
+        elif not (existing == dtype or (dtype == ANY_OBJECT_LIST and isinstance(existing, tuple) and existing[0] == "list")):
+            raise ValueError(f"字段路径冲突：{path}")
+        return
+    if existing is None or existing == ANY_OBJECT_LIST and kind == "list":
+        existing = tree[key] = (kind, {})
+    if not isinstance(existing, tuple) or existing[0] != kind:
+        raise ValueError(f"字段路径冲突：{path}")
+    _insert(existing[1], tokens[1:], dtype, path)
+
+
+def _node_type(node):
+    if isinstance(node, pa.DataType):
+        return node
+    kind, children = node
+    struct = pa.struct([pa.field(k, _node_type(v)) for k, v in children.items()])
+    return pa.list_(struct) if kind == "list" else struct
+
+
+def split_alternates(fields):
+    """(交给 Arrow 解析的字段, 同一顶层路径上类型不同、只在逐行解析时取值的字段)。"""
+    primary, alternates, types = [], [], {}
+    for field in fields:
+        tokens = _split_path(field.path)
+        if len(tokens) == 1 and not tokens[0][1] and types.get(field.path, field.dtype) != field.dtype:
+            alternates.append(field)
+            continue
+        types.setdefault(field.path, field.dtype)
+        primary.append(field)
+    return primary, alternates
+
+
+def _alternate_name(field):
+    # 逐行解析结果中的列名，不会与 JSON 的键冲突
+    return "\0" + field.name
+
+
+def build_schema(fields):
+    tree = {}
+    for field in fields:
+        tokens = _split_path(field.path)
+        if tokens[-1][1]:
+            raise ValueError(f"路径不能以 [] 结尾：{field.path}")
+        _insert(tree, tokens, field.dtype, field.path)
+    return pa.schema([pa.field(k, _node_type(v)) for k, v in tree.items()])
+
+
+# ---------- NDJSON 解析 ----------
+def _to_string_array(column):
+    if isinstance(column, pd.Series):
+        column = pa.array(column, type=pa.string(), from_pandas=True)
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks() if column.num_chunks else pa.array([], type=pa.string())
+    if not pa.types.is_string(column.type):
+        column = column.cast(pa.string())
+    return column
+
+
+class _NDJSON:
+    """一批 JSON 字符串拼成的连续 NDJSON 缓冲区，按行区间 [lo, hi) 交给 Arrow 解析。
+
+    解析结果在 schema 的各列之后附加 alternates 各字段的列（见 split_alternates）。
+    """
+
+    def __init__(self, text, schema, alternates=()):
+        # 每行追加换行符后，结果数组的数据缓冲区就是一段连续的 NDJSON
+        lines = pc.binary_join_element_wise(text, "\n", "")
+        self.text = text
+        self.schema = schema
+        self.alternates = list(alternates)
+        self.table_schema = pa.schema(list(schema) + [pa.field(_alternate_name(f), f.dtype) for f in self.alternates])
+        self.data = lines.buffers()[2]
+        self.offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)[lines.offset:lines.offset + len(lines) + 1]
+        self.parse_options = pj.ParseOptions(explicit_schema=schema, unexpected_field_behavior="ignore")
+
+    def read(self, lo, hi):
+        """解析 [lo, hi) 行，返回 (表, None)；失败时返回 (None, 相对 lo 的出错行号或 None)。"""
+        start, end = int(self.offsets[lo]), int(self.offsets[hi])
+        # 整个区间作为一个块解析，Arrow 报告的出错行号才是相对区间起点的行号
+        read_options = pj.ReadOptions(block_size=max(_MIN_BLOCK_SIZE, end - start + 1))
+        try:
+            table = pj.read_json(pa.BufferReader(self.data.slice(start, end - start)),
+                                 read_options=read_options, parse_options=self.parse_options)
+        except pa.ArrowInvalid as e:
+            match = _ERROR_ROW.search(str(e))
+            return None, int(match.group(1)) if match else None
+        # 一行中有多个对象时行数对不上，按出错行未知处理
+        if table.num_rows != hi - lo:
+            return None, None
+        for field in self.alternates:
+            table = table.append_column(_alternate_name(field), pa.nulls(table.num_rows, field.dtype))
+        return table, None
+
+    def read_rows(self, lo, hi):
+        """逐行 json.loads 解析 [lo, hi) 行，按 schema 逐字段转换，返回 (表, 是否为 JSON 对象)。"""
+        struct = pa.struct(list(self.schema))
+        rows, ok = [], np.zeros(hi - lo, dtype=bool)
+        for i, line in enumerate(self.text.slice(lo, hi - lo).to_pylist()):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            ok[i] = isinstance(data, dict)
+            row = _coerce(data, struct) if ok[i] else {}
+            for field in self.alternates:
+                row[_alternate_name(field)] = _coerce(data.get(field.path), field.dtype) if ok[i] else None
+            rows.append(row)
+        return pa.Table.from_pylist(rows, schema=self.table_schema), ok
+
+
+def _coerce(value, dtype):
+    # json.loads 得到的值 -> dtype 可接受的 Python 值；类型不符时为 None，只影响这一个字段
+    if value is None:
+        return None
+    if pa.types.is_struct(dtype):
+        return {f.name: _coerce(value.get(f.name), f.type) for f in dtype} if isinstance(value, dict) else None
+    if pa.types.is_list(dtype):
+        return [_coerce(v, dtype.value_type) for v in value] if isinstance(value, list) else None
+    if pa.types.is_string(dtype):
+        return value if isinstance(value, str) else None
+    if isinstance(value, bool):
+        return value if pa.types.is_boolean(dtype) else None
+    if pa.types.is_integer(dtype):
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return value if isinstance(value, int) and -2 ** 63 <= value < 2 ** 63 else None
+    if pa.types.is_floating(dtype):
+        return float(value) if isinstance(value, (int, float)) else None
+    return None
+
+
+def _parse_lines(nd, lo, hi):
+    # 从 lo 起按窗口解析：成功则窗口加倍；失败时若 Arrow 给出出错行，出错行之前的部分重新按块解析、
+    # 出错行逐行解析，窗口缩小到出错位置附近后从下一行继续；否则二分。
+    # 不超过 _FALLBACK_ROWS 行的块直接逐行解析。各段结果按行序拼接
+    parts, pos, window = [], lo, hi - lo
+    while pos < hi:
+        end = min(hi, pos + window)
+        if end - pos <= _FALLBACK_ROWS:
+            parts.append(nd.read_rows(pos, end))
+            pos = end
+            continue
+        table, row = nd.read(pos, end)
+        if table is not None:
+            parts.append((table, np.ones(end - pos, dtype=bool)))
+            pos, window = end, window * 2
+        elif row is None or row >= end - pos:
+            mid = (pos + end) // 2
+            parts += [_parse_lines(nd, pos, mid), _parse_lines(nd, mid, end)]
+            pos = end
+        else:
+            if row:
+                parts.append(_parse_lines(nd, pos, pos + row))
+            parts.append(nd.read_rows(pos + row, pos + row + 1))
+            pos, window = pos + row + 1, max(2 * row, _FALLBACK_ROWS + 1)
+    if not parts:
+        return nd.read_rows(lo, lo)
+    return pa.concat_tables([t for t, _ in parts]), np.concatenate([ok for _, ok in parts])
+
+
+def _parse_batch(arr, schema, alternates=()):
+    # 先用向量化的首尾字符检查筛掉明显非法的行，避免二分过程反复重解析
+    trimmed = pc.utf8_trim_whitespace(arr)
+    looks_ok = pc.and_(pc.starts_with(trimmed, "{"), pc.ends_with(trimmed, "}")).fill_null(False)
+    text = pc.if_else(looks_ok, arr, "{}")
+    text = pc.replace_substring_regex(text, r"[\r\n]", " ")
+    table, parsed_ok = _parse_lines(_NDJSON(text, schema, alternates), 0, len(text))
+    valid = np.logical_and(looks_ok.to_numpy(zero_copy_only=False), parsed_ok)
+    return table, valid
+
+
+# ---------- 按路径取值与归约 ----------
+def _select(arr, tokens):
+    key, is_list = tokens[0]
+    child = pc.struct_field(arr, key)
+    if len(tokens) == 1:
+        return child
+    if not is_list:
+        return _select(child, tokens[1:])
+    values = _select(child.flatten(), tokens[1:])
+    offsets = pc.subtract(child.offsets, child.offsets[0])
+    return pa.ListArray.from_arrays(offsets, values, mask=child.is_null())
+
+
+def _list_extreme(arr, how):
+    values = pc.list_flatten(arr)
+    parents = pc.list_parent_indices(arr)
+    grouped = pa.table({"row": parents, "value": values}).group_by("row").aggregate([("value", how)])
+    index = np.full(len(arr), -1, dtype=np.int64)
+    index[grouped.column("row").to_numpy()] = np.arange(grouped.num_rows)
+    return pc.take(grouped.column(f"value_{how}"), pa.array(index, mask=index < 0)).combine_chunks()
+
+
+def _reduce(values, how):
+    if how is None:
+        return values
+    if how == "len":
+        return pc.list_value_length(values)
+    if how in ("max", "min"):
+        return _list_extreme(values, how)
+    raise ValueError(f"不支持的归约方式：{how}")
+
+
+def _extract_batch(arr, fields, schema, alternates=()):
+    table, valid = _parse_batch(arr, schema, alternates)
+    struct = pa.StructArray.from_arrays(
+        [table.column(i).combine_chunks() for i in range(table.num_columns)],
+        fields=list(table.schema),
+    )
+    mask = pa.array(~valid)
+    out = {}
+    for field in fields:
+        tokens = [(_alternate_name(field), False)] if field in alternates else _split_path(field.path)
+        values = _reduce(_select(struct, tokens), field.reduce)
+        values = pc.if_else(mask, pa.scalar(None, values.type), values)
+        if field.default is not None:
+            values = values.fill_null(pa.scalar(field.default, values.type))
+        out[field.name] = values
+    return out, valid
+
+
+def extract_fields(column, fields, batch_size=DEFAULT_BATCH_SIZE, valid_name=None):
+    """对 JSON 字符串列按 fields 批量抽取字段，返回与输入逐行对齐的 Arrow 表。
+
+    valid_name 不为 None 时额外输出一列布尔值，标记该行是否成功解析为 JSON 对象。
+    """
+    arr = _to_string_array(column)
+    fields = list(fields)
+    primary, alternates = split_alternates(fields)
+    schema = build_schema(primary)
+
+    chunks = {f.name: [] for f in fields}
+    valid_chunks = []
+    for start in range(0, len(arr), batch_size):
+        out, valid = _extract_batch(arr.slice(start, batch_size), fields, schema, alternates)
+        for name, values in out.items():
+            chunks[name].append(values)
+        valid_chunks.append(valid)
+
+    columns, names = [], []
+    if valid_name is not None:
+        valid = np.concatenate(valid_chunks) if valid_chunks else np.zeros(0, dtype=bool)
+        columns.append(pa.array(valid))
+        names.append(valid_name)
+    for field in fields:
+        if chunks[field.name]:
+            values = pa.chunked_array(chunks[field.name]).combine_chunks()
+        else:
+            values = _reduce(pa.array([], type=_select_type(field)), field.reduce)
+        columns.append(_dictionary_encode(values) if field.dictionary else values)
+        names.append(field.name)
+    return pa.Table.from_arrays(columns, names=names)
+
+
+def _dictionary_encode(values):
+    # 整列统一编码，同一文件内只有一个字典
+    if pa.types.is_list(values.type):
+        offsets = pc.subtract(values.offsets, values.offsets[0])
+        encoded = pc.dictionary_encode(values.flatten())
+        return pa.ListArray.from_arrays(offsets, encoded, mask=values.is_null())
+    return pc.dictionary_encode(values)
+
+
+def _select_type(field):
+    tokens = _split_path(field.path)
+    if any(is_list for _, is_list in tokens[:-1]):
+        return pa.list_(field.dtype)
+    return field.dtype
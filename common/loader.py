@@ -0,0 +1,93 @@
+import glob
+import os
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from common.profiling import timed
+
+# 统一的数据加载入口：基于 pyarrow.dataset，只解码需要的列，并利用 Parquet 的 row group
+# 统计信息（min/max）跳过不满足过滤条件的 row group。
+
+DATA_ROOT = os.environ.get("DM_DATA_ROOT", "/data/qy/homework/2")
+DEFAULT_BATCH_SIZE = 65536
+# 低基数字符串列按字典编码读取（pandas 中为 category），计数与分组直接作用于整数编码
+DICTIONARY_COLUMNS = ("country", "gender")
+# 清洗后数据集（common.cleaned 写出）的文件后缀；这类文件以内存映射方式读取
+CLEANED_SUFFIX = ".cleaned.arrow"
+
+
+def dataset_pattern(name, part="part-*.parquet"):
+    """数据集名（如 "10G"）对应的 part 文件匹配模式。"""
+    return os.path.join(DATA_ROOT, name + "_data_new", part)
+
+
+def list_files(source, limit=None):
+    """source 可以是 glob 模式或文件列表；返回排序后的文件列表，limit 限制文件个数。"""
+    files = sorted(glob.glob(source)) if isinstance(source, str) else list(source)
+    return files[:limit] if limit is not None else files
+
+
+def _to_expression(filters):
+    # 支持 pyarrow.compute 表达式，或 [('age', '>', 0), ...] 形式的 DNF 过滤条件
+    if filters is None or isinstance(filters, ds.Expression):
+        return filters
+    return pq.filters_to_expression(filters)
+
+
+def open_dataset(source, limit=None, dictionary_columns=DICTIONARY_COLUMNS):
+    fmt = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=list(dictionary_columns)))
+    return ds.dataset(list_files(source, limit), format=fmt)
+
+
+@timed("load")
+def load_table(source, columns=None, filters=None, limit=None):
+    """读取为 Arrow 表；未指定过滤条件时行顺序与文件顺序一致，可与解析缓存逐行对齐。"""
+    files = list_files(source, limit)
+    if files and all(is_cleaned(f) for f in files):
+        table = pa.concat_tables([open_cleaned(f, columns) for f in files])
+        return table if filters is None else table.filter(_to_expression(filters))
+    return open_dataset(files).to_table(columns=columns, filter=_to_expression(filters))
+
+
+def load_df(source, columns=None, filters=None, limit=None):
+    return load_table(source, columns=columns, filters=filters, limit=limit).to_pandas()
+
+
+def iter_batches(source, columns=None, filters=None, limit=None, batch_size=DEFAULT_BATCH_SIZE):
+    files = list_files(source, limit)
+    if files and all(is_cleaned(f) for f in files):
+        yield from load_table(files, columns=columns, filters=filters).to_batches(max_chunksize=batch_size)
+        return
+    dataset = open_dataset(files)
+    yield from dataset.to_batches(columns=columns, filter=_to_expression(filters), batch_size=batch_size)
+
+
+# ---------- 清洗后数据集（Arrow IPC 文件，内存映射） ----------
+def is_cleaned(path):
+    return str(path).endswith(CLEANED_SUFFIX)
+
+
+def open_cleaned(path, columns=None):
+    """以内存映射方式打开清洗后的 Arrow IPC 文件：列数据直接引用映射的页面，不解码也不复制，
+    同一主机上的多个进程共享页缓存。"""
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.select(columns) if columns is not None else table
+
+
+# ---------- 基于元数据的统计 ----------
+def parquet_null_counts(path):
+    """从 row group 统计信息读取各列空值个数，统计信息缺失的列回退为读取该列计数。"""
+    meta = pq.ParquetFile(path).metadata
+    counts = {}
+    for idx, column in enumerate(meta.schema.names):
+        total = 0
+        for i in range(meta.num_row_groups):
+            stats = meta.row_group(i).column(idx).statistics
+            if stats is None or not stats.has_null_count:
+                total = pq.read_table(path, columns=[column]).column(column).null_count
+                break
+            total += stats.null_count
+        counts[column] = total
+    return counts
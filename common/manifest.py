@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import namedtuple
+
+from common.cleaning import merge_stats, partition_stats
+from common.crosstab import ContingencyTable, payment_category_table
+from common.json_cache import CACHE_DIR_ENV, CACHE_VERSION, file_fingerprint
+from common.parallel import map_reduce
+from common.son import local_itemset_counts
+from common.transactions import category_transactions, refund_transactions
+
+# 分区清单：数据目录按追加 part-*.parquet 的方式增长，清单记录每个已处理 part 的标识（路径、大小、mtime）
+# 及其可合并的部分结果（清洗统计、支付方式 × 类别列联表）。每次运行只处理新增或变化的 part，
+# 其余分区直接读取保存的部分结果，合并后即为全量结果。
+# 项集种类保存的是 SON 第一阶段的结果：以 ITEMSET_FLOOR 为局部支持度的频繁项集及其在该分区的次数，
+# 不能直接相加，由 partials() 逐分区取出后交给 common.son.son_from_local_counts。
+#   root/manifest.json      {"version", "cache_version", "parts": {种类: {源文件绝对路径: {"fingerprint"}}}}
+#   root/<种类>/<文件名>.<路径摘要>.pkl   单个 part 的部分结果
+
+MANIFEST_VERSION = "2"
+ITEMSET_FLOOR = 0.005
+
+# compute(path) -> 单个 part 的部分结果；merge(a, b) -> 合并结果（可以修改并返回 a），None 表示只能逐分区使用
+PartialKind = namedtuple("PartialKind", ["compute", "merge"])
+
+
+# ---------- 各种部分结果 ----------
+def _category_itemsets(path):
+    return local_itemset_counts(category_transactions(path), ITEMSET_FLOOR)
+
+
+def _refund_itemsets(path):
+    return local_itemset_counts(refund_transactions(path), ITEMSET_FLOOR)
+
+
+KINDS = {
+    "cleaning": PartialKind(partition_stats, merge_stats),
+    "category_itemsets": PartialKind(_category_itemsets, None),
+    "refund_itemsets": PartialKind(_refund_itemsets, None),
+    "payment_category": PartialKind(payment_category_table, ContingencyTable.merge),
+}
+
+
+def _compute_partial(task):
+    path, kind = task
+    return [(file_fingerprint(path), KINDS[kind].compute(path))]
+
+
+# ---------- 清单 ----------
+def default_manifest_dir(files):
+    data_dir = os.path.dirname(os.path.abspath(files[0]))
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    return os.path.join(cache_dir, "_manifest", os.path.basename(data_dir)) if cache_dir else os.path.join(data_dir, "_manifest")
+
+
+class PartitionManifest:
+    def __init__(self, root):
+        self.root = root
+        self.parts = {}
+        path = os.path.join(root, "manifest.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                meta = json.load(f)
+            # 清单或解析缓存的版本变化后，保存的部分结果全部作废
+            if meta.get("version") == MANIFEST_VERSION and meta.get("cache_version") == CACHE_VERSION:
+                self.parts = meta["parts"]
+
+    @classmethod
+    def for_files(cls, files):
+        return cls(default_manifest_dir(list(files)))
+
+    def _partial_path(self, kind, source):
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+        base = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.root, kind, f"{base}.{digest}.pkl")
+
+    def stale(self, files, kind):
+        """需要（重新）计算的文件：未收录、指纹变化或部分结果文件缺失。"""
+        entries = self.parts.get(kind, {})
+        out = []
+        for f in files:
+            source = os.path.abspath(f)
+            entry = entries.get(source)
+            if entry is None or entry["fingerprint"] != file_fingerprint(f) or not os.path.exists(self._partial_path(kind, source)):
+                out.append(f)
+        return out
+
+    def update(self, files, kind, workers=None):
+        """计算并保存新增/变化文件的部分结果，返回 (files 全部分区的合并结果, 本次计算的文件数)。"""
+        if kind in KINDS and KINDS[kind].merge is None:
+            raise ValueError(f"部分结果种类 {kind} 不能直接合并，请使用 partials()")
+        partials, updated = self.partials(files, kind, workers=workers)
+        total = None
+        for partial in partials:
+            total = partial if total is None else KINDS[kind].merge(total, partial)
+        return total, updated
+
+    def partials(self, files, kind, workers=None):
+        """计算并保存新增/变化文件的部分结果，返回 (与 files 对应的各分区部分结果, 本次计算的文件数)。"""
+        if kind not in KINDS:
+            raise ValueError(f"未知的部分结果种类：{kind}，可选 {sorted(KINDS)}")
+        files = list(files)
+        stale = self.stale(files, kind)
+        results = map_reduce(_compute_partial, [(f, kind) for f in stale], lambda a, b: a + b, workers) or []
+
+        entries = self.parts.setdefault(kind, {})
+        for fingerprint, partial in results:
+            self._save_partial(kind, fingerprint["path"], partial)
+            entries[fingerprint["path"]] = {"fingerprint": fingerprint}
+        if results:
+            self.save()
+
+        fresh = {fp["path"]: partial for fp, partial in results}
+        partials = []
+        for f in files:
+            source = os.path.abspath(f)
+            partials.append(fresh[source] if source in fresh else self._load_partial(kind, source))
+        return partials, len(stale)
+
+    # ---------- 读写 ----------
+    def _save_partial(self, kind, source, partial):
+        path = self._partial_path(kind, source)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    def _load_partial(self, kind, source):
+        with open(self._partial_path(kind, source), "rb") as f:
+            return pickle.load(f)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "manifest.json")
+        meta = {"version": MANIFEST_VERSION, "cache_version": CACHE_VERSION, "parts": self.parts}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,30 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def default_workers(n_items):
+    return max(1, min(n_items, os.cpu_count() or 1))
+
+
+def map_reduce(func, items, merge, workers=None):
+    """在进程池中对每个分区执行 func，并依次用 merge 合并各分区的部分结果。
+
+    func 必须是可被子进程导入的模块级函数；workers <= 1 时在当前进程顺序执行。
+    """
+    items = list(items)
+    if not items:
+        return None
+    if workers is None:
+        workers = default_workers(len(items))
+
+    if workers <= 1:
+        return _reduce(map(func, items), merge)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return _reduce(executor.map(func, items), merge)
+
+
+def _reduce(results, merge):
+    total = None
+    for result in results:
+        total = result if total is None else merge(total, result)
+    return total
@@ -0,0 +1,122 @@
+import pyarrow as pa
+
+from common.crosstab import PAYMENT_CATEGORY_COLUMNS, ContingencyTable, payment_category_from
+from common.cube import CUBE_COLUMNS, TimeCategoryCube, cube_cells_from, merge_cells
+from common.itemsets import TransactionBitmaps, mine_frequent_itemsets, transaction_counts
+from common.json_cache import load_parsed
+from common.loader import DEFAULT_BATCH_SIZE
+from common.parallel import map_reduce
+from common.transactions import CATEGORY_COLUMNS, REFUND_COLUMNS, category_transactions_from, refund_transactions_from
+
+# 单遍扫描的多分析流水线：各分析注册为算子，声明所需的解析列。每个 part 文件只读取一次全部算子所需列的并集，
+# 按记录批次依次交给每个算子得到可合并的部分结果；各分区在进程池中执行，合并后由每个算子各自给出最终结果。
+# 算子须为可 pickle 的模块级类实例（随任务传给子进程）。
+
+
+class Operator:
+    """算子接口：consume(batch) -> 部分结果；merge(a, b) -> 合并结果；finalize(total) -> 最终结果。"""
+    columns = ()
+
+    def consume(self, batch):
+        raise NotImplementedError
+
+    def merge(self, a, b):
+        raise NotImplementedError
+
+    def finalize(self, total):
+        return total
+
+
+class _ItemsetOperator(Operator):
+    def __init__(self, min_support, max_len=None):
+        self.min_support = min_support
+        self.max_len = max_len
+
+    def transactions(self, batch):
+        raise NotImplementedError
+
+    def consume(self, batch):
+        # 只合并相同的交易，不展开子集；挖掘在 finalize 中剪枝进行
+        return transaction_counts(self.transactions(batch))
+
+    def merge(self, a, b):
+        a[0].update(b[0])
+        return a[0], a[1] + b[1]
+
+    def finalize(self, total):
+        """支持度不低于 min_support 的频繁项集与交易数。"""
+        counts, n = total
+        bitmaps = TransactionBitmaps.from_counts(counts)
+        return mine_frequent_itemsets(bitmaps, min_support=self.min_support, max_len=self.max_len), n
+
+
+class CategoryTransactions(_ItemsetOperator):
+    """每条成功解析的购买记录的商品类别为一条交易（hw2/1.py）。"""
+    columns = CATEGORY_COLUMNS
+
+    def __init__(self, min_support=0.02, max_len=None):
+        super().__init__(min_support, max_len)
+
+    def transactions(self, batch):
+        return category_transactions_from(batch)
+
+
+class RefundItemsets(_ItemsetOperator):
+    """退款记录中各商品类别去重后为一条交易（hw2/4.py）。"""
+    columns = REFUND_COLUMNS
+
+    def __init__(self, min_support=0.005, max_len=None):
+        super().__init__(min_support, max_len)
+
+    def transactions(self, batch):
+        return refund_transactions_from(batch)
+
+
+class PaymentCategoryPairs(Operator):
+    """支付方式 × 商品类别 列联表及高价值商品的支付方式计数（hw2/2.py），结果为 ContingencyTable。"""
+    columns = PAYMENT_CATEGORY_COLUMNS
+
+    def consume(self, batch):
+        return payment_category_from(batch)
+
+    def merge(self, a, b):
+        return ContingencyTable.merge(a, b)
+
+
+class SeasonalityCounts(Operator):
+    """时间 × 类别 的购买次数与金额（hw2/3.py），结果为可上卷查询的 TimeCategoryCube。"""
+    columns = CUBE_COLUMNS
+
+    def consume(self, batch):
+        return cube_cells_from(batch)
+
+    def merge(self, a, b):
+        return merge_cells(a, b)
+
+    def finalize(self, total):
+        return TimeCategoryCube(total)
+
+
+# ---------- 运行 ----------
+def _merge_partials(operators, a, b):
+    return [p if q is None else q if p is None else op.merge(p, q) for op, p, q in zip(operators, a, b)]
+
+
+def _scan_partition(task):
+    path, operators, batch_size = task
+    columns = sorted({c for op in operators for c in op.columns})
+    table = load_parsed(path, columns=columns)
+    partials = [None] * len(operators)
+    for batch in table.to_batches(max_chunksize=batch_size):
+        batch = pa.Table.from_batches([batch])
+        partials = _merge_partials(operators, partials, [op.consume(batch) for op in operators])
+    return partials
+
+
+def run_pipeline(files, operators, batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """对 files 单遍扫描并运行 operators（{名称: 算子}），返回 {名称: 最终结果}；没有数据的算子结果为 None。"""
+    names, ops = list(operators), list(operators.values())
+    merged = map_reduce(_scan_partition, [(f, ops, batch_size) for f in files],
+                        lambda a, b: _merge_partials(ops, a, b), workers=workers)
+    merged = merged or [None] * len(ops)
+    return {name: None if total is None else op.finalize(total) for name, op, total in zip(names, ops, merged)}
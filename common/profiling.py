@@ -0,0 +1,219 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# 分阶段计时与资源统计：用 stage() 上下文管理器或 @timed 装饰器包住一段代码，记录
+# 墙钟时间、CPU 时间、输入行数、读取字节数与该阶段的峰值 RSS。
+#   - 记录保存在本进程的 RECORDS 中（只保留最近 MAX_RECORDS 条，enable() 开始新一轮时与 print_summary() 汇总后清空）；设置环境变量 DM_PROFILE=<文件> 时每条记录再以 JSON 行追加写出，
+#     进程池中的子进程继承该变量，各进程的记录写到同一文件（带 pid）。
+#   - DM_PROFILE_STAGE=<阶段名>（可用逗号分隔多个）时对这些阶段启用 cProfile，
+#     统计结果保存为 <阶段名>.<pid>.prof 并打印耗时最多的函数。
+# 峰值 RSS 在 Linux 上通过 /proc/self/clear_refs 重置进程的 VmHWM 后读取，得到的是阶段内的峰值；
+# 其他平台退化为进程启动以来的峰值（ru_maxrss）。
+
+PROFILE_ENV = "DM_PROFILE"
+PROFILE_STAGE_ENV = "DM_PROFILE_STAGE"
+MAX_RECORDS = 10000
+
+RECORDS = deque(maxlen=MAX_RECORDS)
+_stack = []
+
+
+# ---------- 资源读数 ----------
+def _read_proc(path, key):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(key):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    hwm = _read_proc("/proc/self/status", "VmHWM:")  # KB
+    if hwm is not None:
+        return hwm / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _bytes_read():
+    return _read_proc("/proc/self/io", "rchar:")
+
+
+class StageRecord:
+    """单个阶段的记录；rows / bytes_read 可在阶段内由调用方填写（bytes_read 缺省为进程读取字节数的增量）。"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.bytes_read = None
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss_mb = None
+        self._child_peak = 0.0
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "pid": os.getpid(),
+            "wall_s": round(self.wall, 6),
+            "cpu_s": round(self.cpu, 6),
+            "rows": self.rows,
+            "bytes_read": self.bytes_read,
+            "peak_rss_mb": None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+        }
+
+
+def _emit(record):
+    RECORDS.append(record.as_dict())
+    path = os.environ.get(PROFILE_ENV)
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record.as_dict(), ensure_ascii=False) + "\n")
+
+
+def _profiled(name):
+    names = os.environ.get(PROFILE_STAGE_ENV, "")
+    return name in {n.strip() for n in names.split(",") if n.strip()}
+
+
+# ---------- 对外接口 ----------
+@contextmanager
+def stage(name, rows=None, profile=None):
+    """记录一个阶段。profile=None 时由 DM_PROFILE_STAGE 决定是否启用 cProfile。"""
+    record = StageRecord(name)
+    record.rows = rows
+    if _stack:
+        # 嵌套阶段会重置峰值，先把外层到目前为止的峰值记下来
+        parent = _stack[-1]
+        parent._child_peak = max(parent._child_peak, _peak_rss_mb())
+    _stack.append(record)
+    profiler = cProfile.Profile() if (profile if profile is not None else _profiled(name)) else None
+
+    _reset_peak()
+    start_bytes = _bytes_read()
+    wall, cpu = time.perf_counter(), time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+        record.wall = time.perf_counter() - wall
+        record.cpu = time.process_time() - cpu
+        end_bytes = _bytes_read()
+        if record.bytes_read is None and start_bytes is not None and end_bytes is not None:
+            record.bytes_read = end_bytes - start_bytes
+        record.peak_rss_mb = max(_peak_rss_mb(), record._child_peak)
+        _stack.pop()
+        if _stack:
+            _stack[-1]._child_peak = max(_stack[-1]._child_peak, record.peak_rss_mb)
+        if profiler:
+            _dump_profile(name, profiler)
+        _emit(record)
+
+
+def timed(name=None, rows=None):
+    """装饰器形式的 stage，记录的行数为输入行数。
+
+    rows(*args, **kwargs) 由调用参数给出输入行数；未给出时取返回值的行数（表的 num_rows 或 __len__），
+    只适用于输出与输入逐行对应的阶段（如读取、解析、校验）。
+    """
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as record:
+                if rows is not None:
+                    record.rows = rows(*args, **kwargs)
+                result = func(*args, **kwargs)
+                if rows is None and hasattr(result, "num_rows"):
+                    record.rows = result.num_rows
+                elif rows is None and hasattr(result, "__len__"):
+                    record.rows = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _dump_profile(name, profiler, top=20):
+    path = f"{name}.{os.getpid()}.prof"
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    print(f"[profile] 阶段 {name} 的 cProfile 结果已保存到 {path}")
+    print(out.getvalue())
+
+
+def enable(path):
+    """把记录写到 path（清空已有内容），之后创建的子进程同样写入该文件。"""
+    open(path, "w").close()
+    os.environ[PROFILE_ENV] = os.path.abspath(path)
+    reset()
+
+
+def reset():
+    """清空本进程已有的记录。"""
+    RECORDS.clear()
+
+
+# ---------- 汇总 ----------
+def load_records(path=None):
+    """读取 JSON 行记录（默认 DM_PROFILE 指定的文件，包含子进程的记录）；未设置时返回本进程的记录。"""
+    path = path or os.environ.get(PROFILE_ENV)
+    if not path or not os.path.exists(path):
+        return list(RECORDS)
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summary(records=None):
+    """按阶段汇总：调用次数、总耗时、CPU 时间、行数、读取字节、峰值 RSS 与吞吐。"""
+    records = load_records() if records is None else records
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame(records)
+    table = df.groupby("stage", sort=False).agg(
+        calls=("wall_s", "size"),
+        wall_s=("wall_s", "sum"),
+        cpu_s=("cpu_s", "sum"),
+        rows=("rows", "sum"),
+        bytes_read=("bytes_read", "sum"),
+        peak_rss_mb=("peak_rss_mb", "max"),
+    )
+    table["rows_per_s"] = (table["rows"] / table["wall_s"]).where(table["rows"] > 0).round(1)
+    return table.sort_values("wall_s", ascending=False)
+
+
+def print_summary(records=None):
+    """打印汇总表；未传入 records 时汇总的是本轮记录，打印后清空本进程的 RECORDS。"""
+    table = summary(records)
+    if len(table):
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(table)
+    if records is None:
+        reset()
@@ -0,0 +1,237 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# 可合并的流式分位数：KLL sketch 按分区构建、跨进程合并，内存只与 k 有关；
+# 需要精确结果时用两遍扫描：第一遍 sketch 给出目标秩附近的取值窗口，第二遍只保留窗口内的取值并精确定位。
+# 精确结果与 pandas 的 quantile/median（线性插值）一致。
+
+DEFAULT_K = 200
+DEFAULT_SEED = 0
+SEGMENT_LABELS = ['E', 'D', 'C', 'B', 'A']
+
+
+class KLLSketch:
+    """KLL 分位数 sketch。第 h 层的每个元素代表 2**h 个原始值。
+
+    归一化秩误差约为 1.65 / k（99% 置信），k=200 时约 0.8%。
+    压缩时的随机取舍默认使用固定种子，同一数据（按相同顺序写入与合并）每次运行的结果相同。
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=DEFAULT_SEED):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, eps, seed=DEFAULT_SEED):
+        return cls(k=max(8, math.ceil(1.65 / eps)), seed=seed)
+
+    @property
+    def rank_error(self):
+        return 1.65 / self.k
+
+    # ---------- 写入与合并 ----------
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def update_repeated(self, value, count):
+        """写入 count 个相同取值：按 count 的二进制位直接放入对应层，不展开。"""
+        count = int(count)
+        if count <= 0 or value is None or np.isnan(value):
+            return self
+        self.n += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        h = 0
+        while count:
+            if count & 1:
+                self._ensure_level(h)
+                self.levels[h] = np.append(self.levels[h], value)
+            count >>= 1
+            h += 1
+        self._compress()
+        return self
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._ensure_level(len(other.levels) - 1)
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+        return self
+
+    def _ensure_level(self, h):
+        while len(self.levels) <= h:
+            self.levels.append(np.empty(0))
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self._capacity(h):
+                items = np.sort(items)
+                # 奇数个时保留最大的一个在本层，其余两两配对随机保留一个升到上一层
+                keep_back = items[-1:] if len(items) % 2 else items[:0]
+                paired = items[:len(items) - len(keep_back)]
+                promoted = paired[self._rng.integers(2)::2]
+                self.levels[h] = keep_back
+                self._ensure_level(h + 1)
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    # ---------- 查询 ----------
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 1 << h, dtype=np.int64) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        values, cum = self._weighted()
+        out = []
+        for q in qs:
+            if q <= 0:
+                out.append(self.min)
+            elif q >= 1:
+                out.append(self.max)
+            else:
+                idx = min(np.searchsorted(cum, q * cum[-1], side="left"), len(values) - 1)
+                out.append(values[idx])
+        return np.asarray(out, dtype=float)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+# ---------- 两遍精确分位数 ----------
+class QuantileWindows:
+    """第二遍扫描的部分结果：对每个窗口 [lo, hi] 统计小于 lo 的个数，并保留窗口内的取值。"""
+
+    def __init__(self, windows):
+        self.windows = [(float(lo), float(hi)) for lo, hi in windows]
+        self.below = np.zeros(len(self.windows), dtype=np.int64)
+        self.inside = [[] for _ in self.windows]
+        self.repeated = [[] for _ in self.windows]
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        for i, (lo, hi) in enumerate(self.windows):
+            self.below[i] += int((values < lo).sum())
+            self.inside[i].append(values[(values >= lo) & (values <= hi)])
+        return self
+
+    def update_repeated(self, value, count):
+        if count <= 0 or value is None or np.isnan(value):
+            return self
+        for i, (lo, hi) in enumerate(self.windows):
+            if value < lo:
+                self.below[i] += int(count)
+            elif value <= hi:
+                self.repeated[i].append((float(value), int(count)))
+        return self
+
+    def merge(self, other):
+        self.below += other.below
+        for i in range(len(self.windows)):
+            self.inside[i].extend(other.inside[i])
+            self.repeated[i].extend(other.repeated[i])
+        return self
+
+    def _window_values(self, i):
+        parts = self.inside[i] + [np.full(c, v) for v, c in self.repeated[i]]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0)
+
+    def resolve(self, n, qs):
+        """按 pandas 的线性插值定义求精确分位数；n=0 时为 NaN，目标秩不在窗口内时对应位置返回 None。"""
+        if n == 0:
+            return [math.nan] * len(qs)
+        out = []
+        for i, q in enumerate(qs):
+            pos = q * (n - 1)
+            lo_rank, hi_rank = int(math.floor(pos)), int(math.ceil(pos))
+            values = self._window_values(i)
+            start = self.below[i]
+            if lo_rank < start or hi_rank >= start + len(values):
+                out.append(None)
+                continue
+            lo_v, hi_v = values[lo_rank - start], values[hi_rank - start]
+            out.append(float(lo_v + (pos - lo_rank) * (hi_v - lo_v)))
+        return out
+
+
+def quantile_windows(sketch, qs, slack=2.0):
+    """由第一遍的 sketch 给出包含各目标秩的取值窗口，slack 为秩误差的倍数。"""
+    eps = sketch.rank_error * slack
+    return [(sketch.quantile(max(0.0, q - eps)), sketch.quantile(min(1.0, q + eps))) for q in qs]
+
+
+def rescan_until_resolved(scan, rank_error, slack=2.0):
+    """两遍精确分位数的第二遍。scan(slack) 以 quantile_windows(..., slack) 的窗口扫描一遍，返回各目标的精确值列表。
+
+    结果含 None（sketch 误差超出窗口）时放宽窗口重扫；窗口已覆盖全部取值仍无法求解时抛出 RuntimeError。
+    """
+    while True:
+        result = scan(slack)
+        if None not in result:
+            return result
+        if slack >= 1 / rank_error:
+            raise RuntimeError("精确分位数求解失败：目标秩不在取值窗口内")
+        slack *= 4
+
+
+def exact_quantiles(make_batches, qs, k=DEFAULT_K):
+    """两遍扫描求精确分位数。make_batches() 每次调用返回一个新的取值批次迭代器。"""
+    sketch = KLLSketch(k)
+    for values in make_batches():
+        sketch.update(values)
+
+    def scan(slack):
+        windows = QuantileWindows(quantile_windows(sketch, qs, slack))
+        for values in make_batches():
+            windows.update(values)
+        return windows.resolve(sketch.n, qs)
+
+    return np.asarray(rescan_until_resolved(scan, sketch.rank_error), dtype=float)
+
+
+# ---------- 五等分分层（qcut） ----------
+def segment_edges(values=None, sketch=None, q=5, exact=False):
+    """qcut 的分箱边界。exact=True 时与 pd.qcut 完全一致；否则由 sketch（或由 values 构建的 sketch）近似。"""
+    qs = np.linspace(0, 1, q + 1)
+    if exact:
+        return pd.Series(values).quantile(qs).to_numpy()
+    if sketch is None:
+        sketch = KLLSketch().update(values)
+    return sketch.quantiles(qs)
+
+
+def assign_segments(values, edges, labels=SEGMENT_LABELS):
+    return pd.cut(values, bins=edges, labels=labels, include_lowest=True)
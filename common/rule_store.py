@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 关联规则存储：规则按列式保存（前件/后件为字符串列表列），并分别为前件、后件建立
+# 项 -> 规则编号 的倒排索引，按项或按度量阈值查询时不必逐条扫描规则。
+
+SIDES = ("antecedents", "consequents")
+_RULES_FILE = "rules.parquet"
+_INDEX_FILE = "index.parquet"
+
+
+class RuleStore:
+    def __init__(self, rules, index):
+        # rules: 以 rule_id 为行号的 DataFrame（前件/后件为 frozenset）；index: {side: {item: 规则编号数组}}
+        self.rules = rules
+        self.index = index
+
+    def __len__(self):
+        return len(self.rules)
+
+    # ---------- 构建 ----------
+    @classmethod
+    def from_rules(cls, rules):
+        """由 association_rules 输出的 DataFrame 构建。"""
+        rules = rules.reset_index(drop=True).copy()
+        for side in SIDES:
+            rules[side] = rules[side].apply(frozenset)
+        index = {side: _build_index(rules[side]) for side in SIDES}
+        return cls(rules, index)
+
+    # ---------- 持久化 ----------
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        table = pa.Table.from_pandas(self.rules.drop(columns=list(SIDES)), preserve_index=False)
+        for side in SIDES:
+            values = [sorted(map(str, s)) for s in self.rules[side]]
+            table = table.append_column(side, pa.array(values, type=pa.list_(pa.string())))
+        pq.write_table(table, os.path.join(path, _RULES_FILE))
+
+        sides, items, ids = [], [], []
+        for side in SIDES:
+            for item, rule_ids in self.index[side].items():
+                sides.append(side)
+                items.append(str(item))
+                ids.append(rule_ids)
+        index = pa.table({
+            "side": pa.array(sides, type=pa.string()),
+            "item": pa.array(items, type=pa.string()),
+            "rule_ids": pa.array(ids, type=pa.list_(pa.int64())),
+        })
+        pq.write_table(index, os.path.join(path, _INDEX_FILE))
+
+    @classmethod
+    def load(cls, path):
+        table = pq.read_table(os.path.join(path, _RULES_FILE))
+        rules = table.drop_columns(list(SIDES)).to_pandas()
+        for side in reversed(SIDES):
+            rules.insert(0, side, [frozenset(v) for v in table.column(side).to_pylist()])
+
+        index = {side: {} for side in SIDES}
+        raw = pq.read_table(os.path.join(path, _INDEX_FILE)).to_pydict()
+        for side, item, rule_ids in zip(raw["side"], raw["item"], raw["rule_ids"]):
+            index[side][item] = np.asarray(rule_ids, dtype=np.int64)
+        return cls(rules, index)
+
+    # ---------- 查询 ----------
+    def items(self, side="antecedents"):
+        return list(self.index[side])
+
+    def items_with_prefix(self, prefix, side=None):
+        sides = SIDES if side is None else (side,)
+        return sorted({item for s in sides for item in self.index[s] if str(item).startswith(prefix)})
+
+    def rule_ids(self, items, side):
+        """前件（或后件）包含 items 中任一项的规则编号。"""
+        if isinstance(items, str):
+            items = [items]
+        hits = [self.index[side][i] for i in items if i in self.index[side]]
+        if not hits:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(hits))
+
+    def query(self, lhs=None, rhs=None, any_item=None, min_support=None, min_confidence=None, min_lift=None):
+        """按项和度量阈值查询规则。
+
+        lhs / rhs：前件 / 后件包含其中任一项；any_item：任一侧包含其中任一项。
+        """
+        ids = None
+        if lhs is not None:
+            ids = self.rule_ids(lhs, "antecedents")
+        if rhs is not None:
+            rhs_ids = self.rule_ids(rhs, "consequents")
+            ids = rhs_ids if ids is None else np.intersect1d(ids, rhs_ids, assume_unique=True)
+        if any_item is not None:
+            any_ids = np.union1d(self.rule_ids(any_item, "antecedents"), self.rule_ids(any_item, "consequents"))
+            ids = any_ids if ids is None else np.intersect1d(ids, any_ids, assume_unique=True)
+        if ids is None:
+            ids = np.arange(len(self.rules))
+
+        for column, threshold in (("support", min_support), ("confidence", min_confidence), ("lift", min_lift)):
+            if threshold is not None and len(ids):
+                ids = ids[self.rules[column].to_numpy()[ids] >= threshold]
+        return self.rules.iloc[ids]
+
+
+def _build_index(itemsets):
+    exploded = pd.Series(list(itemsets), dtype=object).apply(list).explode().dropna()
+    grouped = pd.Series(exploded.index.to_numpy(dtype=np.int64), index=exploded.to_numpy()).groupby(level=0)
+    return {item: np.sort(ids.to_numpy()) for item, ids in grouped}
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from common.json_cache import load_parsed
+from common.loader import DEFAULT_BATCH_SIZE, list_files, load_table
+
+# 抽样模式：一遍流式扫描全部 part 文件，抽取固定大小的均匀样本或分层样本（如按 country、is_active 分层），
+# 代替只读取第一个 part 文件的做法。每行赋一个均匀随机键，各层保留键最小的行（即不放回的均匀抽样）；
+# 扫描时只读取分层列、只记录候选行的位置，结束后按各层总行数比例分配样本量，选中的行按文件一次取出。
+# 样本带有各层的总体行数，计数、比例、支持度都给出正态近似的置信区间：
+#   比例/均值：各层均值按层权重 W_h = N_h / N 加权，方差 Σ W_h² (1 - n_h/N_h) s_h² / n_h
+#   比值（如支持度 = 含项集的交易数 / 交易数）：线性化 d = y - R·x 后按均值估计方差
+
+Z_95 = 1.959964
+ALL = "全部"
+
+
+class Sample:
+    def __init__(self, table, strata, labels, population):
+        # table：样本行；strata：各行所属层的下标；labels：层标签；population：各层总体行数
+        self.table = table
+        self.strata = np.asarray(strata, dtype=np.int64)
+        self.labels = list(labels)
+        self.population = np.asarray(population, dtype=np.int64)
+        self.sizes = np.bincount(self.strata, minlength=len(self.labels))
+
+    def __len__(self):
+        return len(self.strata)
+
+    @property
+    def total(self):
+        return int(self.population.sum())
+
+    def weights(self):
+        """各行代表的总体行数 N_h / n_h。"""
+        return (self.population / np.maximum(self.sizes, 1))[self.strata]
+
+    def _mean(self, values):
+        # 分层均值与其方差；只有一行的层方差记为 0
+        values = np.asarray(values, dtype=float)
+        W = self.population / max(self.total, 1)
+        n = np.maximum(self.sizes, 1)
+        sums = np.bincount(self.strata, weights=values, minlength=len(self.labels))
+        sq = np.bincount(self.strata, weights=values ** 2, minlength=len(self.labels))
+        means = sums / n
+        s2 = np.where(self.sizes > 1, (sq - n * means ** 2) / np.maximum(self.sizes - 1, 1), 0.0)
+        fpc = 1 - self.sizes / np.maximum(self.population, 1)
+        return float(np.sum(W * means)), float(np.sum(W ** 2 * fpc * np.maximum(s2, 0) / n))
+
+    def proportion(self, mask, z=Z_95):
+        """满足 mask 的行在总体中的比例：(估计值, 下限, 上限)。"""
+        est, var = self._mean(mask)
+        half = z * np.sqrt(var)
+        return est, max(est - half, 0.0), min(est + half, 1.0)
+
+    def count(self, mask, z=Z_95):
+        """满足 mask 的行在总体中的个数：(估计值, 下限, 上限)。"""
+        return tuple(self.total * v for v in self.proportion(mask, z))
+
+    def ratio(self, numerator, denominator, z=Z_95):
+        """Σy / Σx 的比值估计：(估计值, 下限, 上限)；如支持度、分母为某个子集时的比例。"""
+        y, x = np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float)
+        x_mean, _ = self._mean(x)
+        if x_mean == 0:
+            return np.nan, np.nan, np.nan
+        est = self._mean(y)[0] / x_mean
+        _, var = self._mean(y - est * x)
+        half = z * np.sqrt(var) / x_mean
+        return est, max(est - half, 0.0), min(est + half, 1.0)
+
+    def supports(self, frequent, bitmaps, rows, z=Z_95):
+        """给频繁项集加上支持度的置信区间；bitmaps 的第 t 条交易对应样本的第 rows[t] 行。"""
+        rows = np.asarray(rows, dtype=np.int64)
+        x = np.zeros(len(self))
+        x[rows] = 1
+        out = []
+        for itemset in frequent["itemsets"]:
+            y = np.zeros(len(self))
+            y[rows] = bitmaps.contains(itemset)
+            out.append(self.ratio(y, x, z))
+        frequent = frequent.copy()
+        frequent["support"], frequent["support_low"], frequent["support_high"] = (
+            np.array([v[i] for v in out], dtype=float) for i in range(3))
+        return frequent
+
+
+# ---------- 抽样 ----------
+def _stratum_values(batch, strata):
+    if strata is None:
+        return np.full(batch.num_rows, ALL, dtype=object)
+    values = batch.column(strata).to_pandas().astype(object)
+    return values.where(values.notna(), "缺失").astype(str).to_numpy(dtype=object)
+
+
+def _read_partition(path, columns, parsed_columns):
+    # 原始列与解析列逐行对齐，合并为一张表；清洗后的数据集两者来自同一文件
+    table = load_table([path], columns=columns) if columns else None
+    if parsed_columns:
+        parsed = load_parsed(path, columns=parsed_columns)
+        if table is None:
+            table = parsed
+        else:
+            for name in parsed.column_names:
+                if name not in table.column_names:
+                    table = table.append_column(name, parsed.column(name))
+    return table.replace_schema_metadata(None)
+
+
+def _partition_strata(path, columns, parsed_columns, strata):
+    # 第一遍只读取分层列；不分层时只读取一列以得到行数
+    if strata is not None:
+        table = _read_partition(path, [strata], None)
+    else:
+        table = _read_partition(path, columns[:1], None if columns else parsed_columns[:1])
+    return _stratum_values(table, strata)
+
+
+def sample_table(files, size, columns=None, parsed_columns=None, strata=None, seed=0, batch_size=DEFAULT_BATCH_SIZE):
+    """从 files 中抽取约 size 行的样本（原始列 columns + 解析列 parsed_columns），strata 为分层列名。
+
+    第一遍只读取分层列：每层最多保留 size 个随机键最小的候选（只记录键、文件与行号），结束时按各层总行数比例
+    分配样本量（每个非空层至少 1 行）；选中的行再按文件一次读取取出。
+    """
+    rng = np.random.default_rng(seed)
+    columns = list(columns or [])
+    parsed_columns = list(parsed_columns or [])
+    if strata is not None and strata not in columns:
+        columns.append(strata)
+    files = list_files(files)
+    reservoirs, population = {}, {}  # 层标签 -> (键, 文件下标, 行号)
+    for f, path in enumerate(files):
+        labels = _partition_strata(path, columns, parsed_columns, strata)
+        for start in range(0, len(labels), batch_size):
+            batch_labels = labels[start:start + batch_size]
+            keys = rng.random(len(batch_labels))
+            codes, uniques = pd.factorize(batch_labels)
+            for code, label in enumerate(uniques):
+                rows = np.flatnonzero(codes == code)
+                population[label] = population.get(label, 0) + len(rows)
+                part = (keys[rows], np.full(len(rows), f, dtype=np.int64), rows + start)
+                if label in reservoirs:
+                    part = tuple(np.concatenate(pair) for pair in zip(reservoirs[label], part))
+                if len(part[0]) > size:
+                    keep = np.argpartition(part[0], size)[:size]
+                    part = tuple(a[keep] for a in part)
+                reservoirs[label] = part
+
+    labels = sorted(reservoirs)
+    counts = np.array([population[label] for label in labels], dtype=np.int64)
+    allocation = np.maximum(np.round(size * counts / max(counts.sum(), 1)).astype(np.int64), 1) if len(labels) else counts
+    stratum, file_index, rows = [np.zeros(0, np.int64)], [np.zeros(0, np.int64)], [np.zeros(0, np.int64)]
+    for h, (label, n_h) in enumerate(zip(labels, allocation)):
+        keys, files_h, rows_h = reservoirs[label]
+        keep = np.argsort(keys, kind="stable")[:n_h]
+        stratum.append(np.full(len(keep), h, dtype=np.int64))
+        file_index.append(files_h[keep])
+        rows.append(rows_h[keep])
+    stratum, file_index, rows = np.concatenate(stratum), np.concatenate(file_index), np.concatenate(rows)
+
+    # 选中的行按 (文件, 行号) 逐文件读取一次，再按 (层, 文件, 行号) 排列
+    by_file = np.lexsort((rows, file_index))
+    tables = [_read_partition(files[f], columns, parsed_columns).take(pa.array(rows[by_file][file_index[by_file] == f]))
+              for f in np.unique(file_index)]
+    if not tables:
+        return Sample(pa.table({}), stratum, labels, counts)
+    position = np.empty(len(by_file), dtype=np.int64)
+    position[by_file] = np.arange(len(by_file))
+    order = np.lexsort((rows, file_index, stratum))
+    table = pa.concat_tables(tables).take(pa.array(position[order]))
+    return Sample(table, stratum[order], labels, counts)
+
+
+def format_interval(estimate, low, high, digits=4):
+    return f"{estimate:.{digits}f}（95% 置信区间 {low:.{digits}f} – {high:.{digits}f}）"
@@ -0,0 +1,189 @@
+import json
+import os
+import shutil
+from collections import Counter
+from datetime import datetime
+
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from common.aggregates import Histogram
+from common.backends import get_backend
+from common.json_cache import load_parsed
+from common.loader import load_table
+from common.parallel import map_reduce
+from common.profiling import stage
+from common.quantiles import QuantileWindows, KLLSketch, quantile_windows, rescan_until_resolved
+from common.timestamps import check_format, infer_format
+
+# 用户价值评分引擎（不把全量数据读进内存）：
+#   1. 统计遍：逐分区计算各特征的 min/max 并合并，得到全局归一化参数；
+#      再逐分区计算得分，合并 KLL sketch（可选精确窗口）得到分层边界和得分直方图；
+#   2. 写出遍：逐分区重新打分、按边界分层，写出以 value_segment 分区的 Parquet 目录。
+# 每个进程同时只持有一个分区，内存与数据集大小无关。评分权重来自配置文件。
+# 列计算与分层由 common.backends 中的计算后端完成（默认 CPU，可选 cuDF）。
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "scoring.json")
+DEFAULT_CONFIG = {
+    "weights": {"avg_purchase": 0.4, "purchase_count": 0.2, "login_count": 0.2, "recency": 0.1, "is_active": 0.1},
+    "segments": ["E", "D", "C", "B", "A"],
+    "missing_login_days": 9999,
+    "score_bins": 50,
+    "timestamp_format": None,  # None 时由样本推断（按名称缓存）
+    "backend": "cpu",
+}
+
+# 需要全局归一化的特征；recency 为 -days_since_login（越近越大）
+NORMALIZED_FEATURES = ("avg_purchase", "purchase_count", "login_count", "recency")
+OUTPUT_COLUMNS = ['id', 'user_name', 'avg_purchase', 'purchase_count', 'login_count', 'days_since_login', 'score']
+
+
+def load_config(path=None):
+    """读取评分配置，缺省项使用 DEFAULT_CONFIG。"""
+    path = path or DEFAULT_CONFIG_PATH
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            user = json.load(f)
+        config["weights"].update(user.pop("weights", {}))
+        config.update(user)
+    return config
+
+
+# ---------- 单个分区的特征 ----------
+def partition_features(path, today, config, backend):
+    """读取一个分区的评分字段（JSON 字段来自解析缓存），返回后端数据帧。"""
+    table = load_table(path, columns=['id', 'user_name', 'is_active'])
+    parsed = load_parsed(path, columns=['avg_price', 'item_count', 'login_count', 'login_timestamps'])
+    for source, name in (('avg_price', 'avg_purchase'), ('item_count', 'purchase_count'),
+                         ('login_count', 'login_count'), ('login_timestamps', 'login_timestamps')):
+        table = table.append_column(name, parsed.column(source))
+
+    # 时间戳格式：配置未指定时推断；无论哪种来源，样本大面积解析失败都直接报错
+    stamps = pc.list_flatten(table.column('login_timestamps'))
+    fmt = config["timestamp_format"] or infer_format(stamps, key='login_timestamps')
+    check_format(stamps, fmt, key='login_timestamps')
+
+    frame = backend.from_arrow(table)
+    days = backend.latest_days_since(frame, 'login_timestamps', today, fmt)
+    return backend.assign(frame, days_since_login=backend.fill_null(days, config["missing_login_days"]))
+
+
+def _feature_values(frame, name, backend):
+    if name == 'recency':
+        return -backend.column(frame, 'days_since_login')
+    values = backend.column(frame, name)
+    return backend.fill_null(values, 0) if name == 'avg_purchase' else values
+
+
+def feature_ranges(frame, backend):
+    return {name: backend.min_max(_feature_values(frame, name, backend)) for name in NORMALIZED_FEATURES}
+
+
+def merge_ranges(a, b):
+    return {name: (min(a[name][0], b[name][0]), max(a[name][1], b[name][1])) for name in NORMALIZED_FEATURES}
+
+
+def score_frame(frame, ranges, weights, backend):
+    """按全局 min/max 归一化后加权求和；取值范围退化（max == min）的特征记 0 分。"""
+    score = backend.column(frame, 'is_active') * weights['is_active']
+    for name in NORMALIZED_FEATURES:
+        lo, hi = ranges[name]
+        if hi > lo:
+            score = score + (_feature_values(frame, name, backend) - lo) / (hi - lo) * weights[name]
+    return score
+
+
+# ---------- 子进程任务（需为模块级函数，后端在子进程内按名称创建） ----------
+def _scored_partition(path, config, today, ranges):
+    backend = get_backend(config["backend"])
+    frame = partition_features(path, today, config, backend)
+    return backend, frame, score_frame(frame, ranges, config["weights"], backend)
+
+
+def _partition_ranges(task):
+    path, config, today = task
+    backend = get_backend(config["backend"])
+    return feature_ranges(partition_features(path, today, config, backend), backend)
+
+
+def _partition_scores(task):
+    path, config, today, ranges = task
+    backend, _, score = _scored_partition(path, config, today, ranges)
+    score = backend.to_numpy(score)
+    hist = Histogram.uniform(0, sum(config["weights"].values()), config["score_bins"]).update(score)
+    return KLLSketch().update(score), hist
+
+
+def _merge_scores(a, b):
+    return a[0].merge(b[0]), a[1].merge(b[1])
+
+
+def _partition_windows(task):
+    path, config, today, ranges, windows = task
+    backend, _, score = _scored_partition(path, config, today, ranges)
+    return QuantileWindows(windows).update(backend.to_numpy(score))
+
+
+def _merge_windows(a, b):
+    return a.merge(b)
+
+
+def _write_partition(task):
+    path, config, today, ranges, edges, output_dir = task
+    backend, frame, score = _scored_partition(path, config, today, ranges)
+    segment = backend.cut(score, edges, config["segments"])
+    frame = backend.assign(backend.select(frame, OUTPUT_COLUMNS[:-1]), score=score, value_segment=segment)
+
+    # 以源文件名作为输出文件名前缀，各进程写入互不冲突
+    base = os.path.splitext(os.path.basename(path))[0]
+    pq.write_to_dataset(backend.to_arrow(frame), output_dir, partition_cols=['value_segment'],
+                        basename_template=base + "-{i}.parquet", existing_data_behavior="overwrite_or_ignore")
+    return Counter(backend.value_counts(segment))
+
+
+# ---------- 评分流程 ----------
+def score_edges(files, config, today, ranges, exact=False, workers=None):
+    """分层边界与得分直方图。exact=True 时与全量 pd.qcut 的边界一致（多一遍扫描）。"""
+    qs = [i / len(config["segments"]) for i in range(len(config["segments"]) + 1)]
+    sketch, hist = map_reduce(_partition_scores, [(f, config, today, ranges) for f in files], _merge_scores, workers)
+    edges = sketch.quantiles(qs)
+    if exact:
+        def scan(slack):
+            windows = quantile_windows(sketch, qs, slack)
+            tasks = [(f, config, today, ranges, windows) for f in files]
+            return map_reduce(_partition_windows, tasks, _merge_windows, workers).resolve(sketch.n, qs)
+
+        edges = rescan_until_resolved(scan, sketch.rank_error)
+    return list(edges), hist
+
+
+def run_scoring(files, output_dir, config=None, exact=False, workers=None, today=None, backend=None):
+    """对 files 中的全部分区评分，按 value_segment 分区写出到 output_dir。
+
+    backend：计算后端名称（cpu / cudf / auto），默认取配置中的 backend。
+
+    返回 dict：ranges（归一化参数）、edges（分层边界）、segment_counts、histogram。
+    """
+    config = dict(config or load_config())
+    if backend is not None:
+        config["backend"] = get_backend(backend).name  # auto 在主进程解析为具体后端
+    today = today or datetime.now().strftime("%Y-%m-%d")
+
+    with stage("scoring_ranges"):
+        ranges = map_reduce(_partition_ranges, [(f, config, today) for f in files], merge_ranges, workers)
+    with stage("scoring_edges"):
+        edges, hist = score_edges(files, config, today, ranges, exact=exact, workers=workers)
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    tasks = [(f, config, today, ranges, edges, output_dir) for f in files]
+    with stage("scoring_write") as record:
+        counts = map_reduce(_write_partition, tasks, lambda a, b: a + b, workers)
+        record.rows = sum(counts.values())
+    return {"ranges": ranges, "edges": edges, "segment_counts": counts, "histogram": hist}
+
+
+def read_segment(output_dir, segment, columns=None):
+    """读取某一分层的评分结果。"""
+    return pq.read_table(os.path.join(output_dir, "value_segment=" + segment), columns=columns).to_pandas()
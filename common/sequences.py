@@ -0,0 +1,343 @@
+import math
+import os
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.parallel import default_workers, map_reduce
+from common.profiling import timed
+from common.sketches import GroupedHyperLogLog, SpaceSaving
+
+# 顺序模式挖掘：每个用户的购买事件按时间排序构成一条序列，类别编码为整数后以 CSR 形式存放
+# （codes[offsets[u]:offsets[u+1]] 为第 u 个用户的序列），全部计算在 NumPy 数组上完成。
+#   - 相邻购买对：排序后错位一位比较，同一用户的相邻事件用 bincount 计数；
+#   - 长度为 k 的序列模式：PrefixSpan 式深度优先扩展，支持度为包含该模式的用户数，
+#     可限制相邻两步的最大时间间隔（max_gap）与整个模式的时间窗口（window）。
+# 并行时按 user_id 的哈希把用户分到若干桶，同一用户的事件只出现在一个桶中：每个 part 文件只读取、解析一次，
+# 各行按桶写入溢出文件，之后各遍都按桶读取（见 EventBuckets）。
+# 模式挖掘沿用 SON 两阶段：各桶局部挖掘得到候选，再逐桶精确计数，结果与全量挖掘一致。
+
+_HASH_MULT = np.uint64(0x9E3779B97F4A7C15)
+_TIME_BITS = 33  # 秒级时间相对最小值的偏移，可覆盖约 270 年
+
+
+def user_buckets(user_ids, n_buckets):
+    """user_id -> 桶编号（乘法哈希，避免连续 id 集中到同一桶）。"""
+    hashed = (np.asarray(user_ids).astype(np.uint64) * _HASH_MULT) >> np.uint64(32)
+    return (hashed % np.uint64(n_buckets)).astype(np.int64)
+
+
+def _seconds(delta):
+    """时间约束统一为秒：接受 pd.Timedelta 可解析的值（如 "30D"），数字按天计。"""
+    if delta is None:
+        return None
+    if isinstance(delta, (int, float)):
+        delta = pd.Timedelta(days=delta)
+    return int(pd.Timedelta(delta).total_seconds())
+
+
+class SequenceData:
+    def __init__(self, codes, times, offsets, labels):
+        self.codes = codes
+        self.times = times
+        self.offsets = offsets
+        self.labels = list(labels)
+        lengths = np.diff(offsets)
+        self.seq = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        self.ends = offsets[1:][self.seq]
+        # (用户, 时间) 组合键全局有序，用于按时间约束二分查找扩展范围
+        base = times.min() if len(times) else 0
+        self.keys = (self.seq << _TIME_BITS) | (times - base)
+        self._base = base
+
+    @property
+    def n_users(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_events(cls, events):
+        """events：user_id / purchase_date / category 三列；同一用户同一时间的事件保持输入顺序。"""
+        codes, labels = pd.factorize(events["category"], sort=True)
+        users = events["user_id"].to_numpy()
+        times = events["purchase_date"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        order = np.lexsort((times, users))
+        users, times, codes = users[order], times[order], codes[order].astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]]) if len(users) else np.zeros(0, dtype=np.int64)
+        offsets = np.append(starts, len(users)).astype(np.int64)
+        return cls(codes, times, offsets, labels)
+
+    def decode(self, pattern):
+        return tuple(self.labels[c] for c in pattern)
+
+    def encode(self, patterns):
+        """类别元组 -> 编码元组；含本数据中不存在的类别的模式被跳过。"""
+        lookup = {label: i for i, label in enumerate(self.labels)}
+        return {tuple(lookup[label] for label in p) for p in patterns if all(label in lookup for label in p)}
+
+    def _limit(self, positions, offset):
+        """同一用户中时间不晚于 times[positions] + offset 的最后一个位置之后。"""
+        key = (self.seq[positions] << _TIME_BITS) | (self.times[positions] + offset - self._base)
+        return np.searchsorted(self.keys, key, side="right")
+
+
+# ---------- 相邻购买对 ----------
+def _event_rows(data, *args, **kwargs):
+    return len(data.codes)
+
+
+@timed("sequence_pairs", rows=_event_rows)
+def consecutive_pairs(data, max_gap=None):
+    """同一用户相邻两次购买的 (前, 后) 类别对计数。"""
+    same = data.seq[1:] == data.seq[:-1]
+    if max_gap is not None:
+        same &= data.times[1:] - data.times[:-1] <= _seconds(max_gap)
+    n = len(data.labels)
+    counts = np.bincount(data.codes[:-1][same] * n + data.codes[1:][same], minlength=n * n)
+    return Counter({(data.labels[i // n], data.labels[i % n]): int(counts[i]) for i in np.flatnonzero(counts)})
+
+
+# ---------- PrefixSpan ----------
+def _extend(data, start, last, max_gap, window):
+    """每个嵌入 (start, last) 之后、同一用户内满足时间约束的全部位置，返回 (嵌入编号, 位置)。"""
+    end = data.ends[last]
+    if max_gap is not None:
+        end = np.minimum(end, data._limit(last, max_gap))
+    if window is not None:
+        end = np.minimum(end, data._limit(start, window))
+    lengths = np.maximum(end - last - 1, 0)
+    owner = np.repeat(np.arange(len(last)), lengths)
+    step = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+    return owner, last[owner] + step
+
+
+def _dedupe(data, start, last, max_gap, window):
+    """扩展结果只取决于 last（有时间窗口时还取决于 start），相同的嵌入只保留一个；
+    没有时间约束时每个用户只需保留最早的 last（经典 PrefixSpan 投影）。"""
+    if window is None:
+        start = last
+    pairs = np.unique(np.stack([start, last]), axis=1)
+    start, last = pairs[0], pairs[1]
+    if max_gap is None and window is None:
+        _, first = np.unique(data.seq[last], return_index=True)
+        start, last = start[first], last[first]
+    return start, last
+
+
+def _grow(data, pattern, seq, start, pos, min_count, max_len, max_gap, window, allowed, results):
+    n = len(data.labels)
+    codes = data.codes[pos]
+    support = np.bincount(np.unique(seq * n + codes) % n, minlength=n)
+    for c in np.flatnonzero(support >= min_count):
+        new = pattern + (int(c),)
+        if allowed is not None and new not in allowed:
+            continue
+        results[new] = int(support[c])
+        if max_len is not None and len(new) >= max_len:
+            continue
+        hit = codes == c
+        st, last = _dedupe(data, start[hit], pos[hit], max_gap, window)
+        owner, nxt = _extend(data, st, last, max_gap, window)
+        if len(nxt):
+            _grow(data, new, data.seq[nxt], st[owner], nxt, min_count, max_len, max_gap, window, allowed, results)
+
+
+@timed("prefixspan", rows=_event_rows)
+def prefixspan(data, min_count=1, max_len=None, max_gap=None, window=None, allowed=None):
+    """返回 {类别编码元组: 包含该模式的用户数}。
+
+    allowed 为编码元组集合（须对前缀封闭）时只沿其中的模式扩展，用于对候选模式计数。
+    """
+    results = {}
+    positions = np.arange(len(data.codes), dtype=np.int64)
+    _grow(data, (), data.seq, positions, positions, max(1, min_count), max_len,
+          _seconds(max_gap), _seconds(window), allowed, results)
+    return results
+
+
+# ---------- 按用户哈希分桶并行 ----------
+def _scatter_partition(task):
+    """读取并解析一个 part 文件的事件（只此一次），按用户桶写入各桶的溢出文件。"""
+    index, path, build_events, n_buckets, root = task
+    events = build_events(path)
+    buckets = user_buckets(events["user_id"].to_numpy(), n_buckets)
+    table = pa.table({
+        "user_id": pa.array(events["user_id"].to_numpy(), type=pa.int64()),
+        "purchase_date": pa.array(events["purchase_date"].to_numpy().astype("datetime64[s]")),
+        "category": pa.array(events["category"].astype(str).to_numpy(), type=pa.string()),
+    })
+    base = f"{index:05d}-" + os.path.splitext(os.path.basename(path))[0]
+    written = []
+    for bucket in np.unique(buckets):
+        out = os.path.join(root, f"bucket-{bucket:04d}", base + ".parquet")
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        pq.write_table(table.filter(pa.array(buckets == bucket)), out)
+        written.append((int(bucket), out))
+    return written
+
+
+class EventBuckets:
+    """按 user_id 哈希分桶后的购买事件。每个 part 文件只读取、解析一次，各桶的行写入 root 下的溢出文件；
+    相邻购买对、局部候选、候选计数三遍都只读取各自桶的溢出文件。可作为上下文管理器，退出时删除溢出文件。"""
+
+    def __init__(self, root, n_buckets, paths):
+        self.root = root
+        self.n_buckets = n_buckets
+        self.paths = paths  # 桶编号 -> 该桶的溢出文件列表
+
+    @classmethod
+    def scatter(cls, files, build_events, n_buckets=None, spill_dir=None, workers=None):
+        """build_events(path) 返回单个分区的事件表（见 transactions.purchase_events），须为模块级函数。"""
+        files = list(files)
+        n_buckets = n_buckets or default_workers(len(files))
+        root = tempfile.mkdtemp(prefix="dm_event_buckets_", dir=spill_dir)
+        tasks = [(i, f, build_events, n_buckets, root) for i, f in enumerate(files)]
+        paths = {b: [] for b in range(n_buckets)}
+        for bucket, path in map_reduce(_scatter_partition, tasks, lambda a, b: a + b, workers=workers) or []:
+            paths[bucket].append(path)
+        return cls(root, n_buckets, paths)
+
+    def tasks(self, *args):
+        return [(self.paths[b],) + args for b in range(self.n_buckets)]
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+@contextmanager
+def _buckets_for(files, build_events, n_buckets, workers, buckets):
+    # 调用方已分桶时直接复用，否则临时分桶并在结束后删除
+    if buckets is not None:
+        yield buckets
+        return
+    with EventBuckets.scatter(files, build_events, n_buckets, workers=workers) as buckets:
+        yield buckets
+
+
+def _bucket_events(paths):
+    if not paths:
+        return pd.DataFrame({"user_id": np.zeros(0, np.int64), "purchase_date": np.zeros(0, "datetime64[s]"),
+                             "category": np.zeros(0, object)})
+    return pa.concat_tables([pq.read_table(p) for p in paths]).to_pandas()
+
+
+def _bucket_data(paths):
+    return SequenceData.from_events(_bucket_events(paths))
+
+
+def _bucket_pairs(task):
+    paths, max_gap, sketch = task
+    counts = consecutive_pairs(_bucket_data(paths), max_gap)
+    return counts if sketch is None else SpaceSaving(sketch).update(list(counts), list(counts.values()))
+
+
+def _bucket_buyers(task):
+    # 同一用户只出现在一个桶中，各桶的不同用户数相加即为全量结果
+    paths, p = task
+    events = _bucket_events(paths)
+    month = events["purchase_date"].dt.to_period("M")
+    if p is None:
+        return events.groupby([month, events["category"]], observed=True)["user_id"].nunique()
+    return GroupedHyperLogLog(p).update(list(zip(month, events["category"])), events["user_id"].to_numpy())
+
+
+def _merge_buyers(a, b):
+    if isinstance(a, GroupedHyperLogLog):
+        return a.merge(b)
+    return a.add(b, fill_value=0)
+
+
+def _local_patterns(task):
+    paths, min_support, max_len, max_gap, window = task
+    data = _bucket_data(paths)
+    min_count = math.ceil(min_support * data.n_users - 1e-9)
+    found = prefixspan(data, min_count, max_len, max_gap, window)
+    return Counter({data.decode(p): c for p, c in found.items()}), data.n_users
+
+
+def _count_patterns(task):
+    paths, candidates, max_len, max_gap, window = task
+    data = _bucket_data(paths)
+    found = prefixspan(data, 1, max_len, max_gap, window, allowed=data.encode(candidates))
+    return Counter({data.decode(p): c for p, c in found.items()}), data.n_users
+
+
+def _local_candidates(task):
+    return set(_local_patterns(task)[0])
+
+
+def _merge_counts(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+def sequential_pair_counts(files, build_events, max_gap=None, n_buckets=None, workers=None, sketch=None, buckets=None):
+    """全部分区的相邻购买对计数，返回 from_category / to_category / count，按 count 降序。
+
+    build_events(path) 返回单个分区的事件表（见 transactions.purchase_events），须为模块级函数。
+    sketch=容量 时各桶的计数合并为 SpaceSaving 摘要（只保留最频繁的若干对），count 为上界，
+    另有 error 列给出可能的高估量。buckets 为已分桶的 EventBuckets 时直接复用（此时不再读取 files）。
+    """
+    with _buckets_for(files, build_events, n_buckets, workers, buckets) as buckets:
+        tasks = buckets.tasks(max_gap, sketch)
+        if sketch is not None:
+            summary = map_reduce(_bucket_pairs, tasks, lambda a, b: a.merge(b), workers=workers) or SpaceSaving(sketch)
+        else:
+            counts = map_reduce(_bucket_pairs, tasks, lambda a, b: a + b, workers=workers) or Counter()
+    if sketch is not None:
+        top = summary.top_k()
+        return pd.DataFrame({
+            "from_category": [a for a, _ in top["key"]],
+            "to_category": [b for _, b in top["key"]],
+            "count": top["count"],
+            "error": top["error"],
+        })
+    rows = [(a, b, c) for (a, b), c in counts.most_common()]
+    return pd.DataFrame(rows, columns=["from_category", "to_category", "count"])
+
+
+def distinct_buyers(files, build_events, p=None, n_buckets=None, workers=None, buckets=None):
+    """各月（年-月）各类别的不同购买用户数，行为月份、列为类别。
+
+    默认逐桶精确计数后相加（内存只与单个桶的用户数有关）；p 给定时每个 (月份, 类别) 用一个 2**p 个寄存器的
+    HyperLogLog 逐桶合并，相对标准误差约 1.04 / sqrt(2**p)。buckets 为已分桶的 EventBuckets 时直接复用。
+    """
+    with _buckets_for(files, build_events, n_buckets, workers, buckets) as buckets:
+        merged = map_reduce(_bucket_buyers, buckets.tasks(p), _merge_buyers, workers=workers)
+    if merged is None or not len(merged.groups if isinstance(merged, GroupedHyperLogLog) else merged):
+        return pd.DataFrame()
+    counts = merged.estimates().round() if isinstance(merged, GroupedHyperLogLog) else merged.astype(float)
+    counts.index.names = ["month", "category"]
+    return counts.unstack().fillna(0).astype("int64").sort_index()
+
+
+def mine_sequential_patterns(files, build_events, min_support=0.01, max_len=3, max_gap=None, window=None,
+                             n_buckets=None, workers=None, buckets=None):
+    """频繁序列模式（支持度 = 包含该模式的用户比例），返回 sequence / length / count / support。
+
+    max_gap / window：相邻两步的最大间隔与整个模式的时间跨度，数字按天计，也可传 "12h" 等。
+    buckets 为已分桶的 EventBuckets 时直接复用（此时不再读取 files）。
+    """
+    constraints = (max_len, max_gap, window)
+    with _buckets_for(files, build_events, n_buckets, workers, buckets) as buckets:
+        local = buckets.tasks(min_support, *constraints)
+        if buckets.n_buckets == 1:
+            counts, n = _local_patterns(local[0])  # 只有一个桶时局部结果即全量结果
+        else:
+            candidates = map_reduce(_local_candidates, local, set.union, workers=workers)
+            counts, n = map_reduce(_count_patterns, buckets.tasks(candidates, *constraints), _merge_counts, workers=workers)
+
+    threshold = math.ceil(min_support * n - 1e-9)
+    rows = [(p, len(p), c, c / n) for p, c in counts.items() if c >= threshold]
+    result = pd.DataFrame(rows, columns=["sequence", "length", "count", "support"])
+    return result.sort_values(["length", "count", "sequence"], ascending=[True, False, True], ignore_index=True)
@@ -0,0 +1,209 @@
+import io
+import math
+
+import numpy as np
+import pandas as pd
+
+# 可合并的概率 sketch：内存与不同取值个数无关，可按分区/进程分别构建后合并，并可序列化保存。
+#   SpaceSaving：   频繁项（heavy hitters），最多保留 capacity 个计数器。每个保留的键带有区间
+#                   count - error <= 真实值 <= count；未保留的键的真实频数不超过 floor（最小计数）。
+#                   单个数据流上 error <= N / capacity；合并时两侧缺失的键按对方的 floor 补齐后取前 capacity 个，
+#                   上述区间始终成立，合并后的误差不超过各部分误差界之和。
+#   HyperLogLog：   不同取值个数估计，2**p 个寄存器，相对标准误差约 1.04 / sqrt(2**p)（p=14 时约 0.8%），合并取逐位最大值。
+# 键统一用 pandas 的 hash_array 散列为 uint64（固定密钥，跨进程结果一致）。
+
+DEFAULT_CAPACITY = 1000
+DEFAULT_P = 14
+
+
+def _key_array(values):
+    # 一维 object 数组；键可以是元组，不能直接交给 np.asarray（会被展开成二维）
+    if isinstance(values, (pd.Series, pd.Index, np.ndarray)) and np.ndim(values) == 1:
+        return np.asarray(values, dtype=object)
+    out = np.empty(len(values), dtype=object)
+    out[:] = list(values)
+    return out
+
+
+def hash_values(values):
+    values = np.asarray(values) if isinstance(values, (pd.Series, np.ndarray)) else _key_array(values)
+    if values.dtype.kind in "iub":
+        return pd.util.hash_array(values)
+    return pd.util.hash_array(values.astype(object), categorize=False)
+
+
+def _aggregate(values, counts=None):
+    """一批取值先按键汇总，返回 (键数组, 频数数组)；空值不计。"""
+    keys = _key_array(values)
+    codes, uniques = pd.factorize(keys)
+    weights = np.ones(len(keys), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+    keep = codes >= 0
+    totals = np.bincount(codes[keep], weights=weights[keep], minlength=len(uniques)).astype(np.int64)
+    nonzero = totals > 0
+    return _key_array(uniques)[nonzero], totals[nonzero]
+
+
+def _save_arrays(**arrays):
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def _load_arrays(data):
+    with np.load(io.BytesIO(data), allow_pickle=True) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+class SpaceSaving:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}   # 键 -> 估计频数（上界）
+        self.errors = {}   # 键 -> 可能的高估量
+        self.floor_count = 0
+        self.total = 0
+
+    @property
+    def floor(self):
+        """未保留的键的真实频数上界。"""
+        return self.floor_count if len(self.counts) >= self.capacity else 0
+
+    @property
+    def max_error(self):
+        return max(self.errors.values(), default=0)
+
+    def _combine(self, counts, errors, floor, total):
+        # 一方未记录的键，其真实频数至多为该方的 floor
+        own_floor = self.floor
+        merged, merged_errors = {}, {}
+        for key in self.counts.keys() | counts.keys():
+            merged[key] = self.counts.get(key, own_floor) + counts.get(key, floor)
+            merged_errors[key] = self.errors.get(key, own_floor) + errors.get(key, floor)
+        keep = sorted(merged, key=merged.get, reverse=True)[:self.capacity]
+        self.counts = {k: merged[k] for k in keep}
+        self.errors = {k: merged_errors[k] for k in keep}
+        # 被淘汰或从未记录的键，其真实频数都不超过保留下来的最小估计值
+        self.floor_count = min(self.counts.values(), default=0)
+        self.total += total
+        return self
+
+    def update(self, values, counts=None):
+        """一批取值先精确汇总（该批次的摘要没有误差），再与当前摘要合并。"""
+        keys, counts = _aggregate(values, counts)
+        batch = dict(zip(keys.tolist(), counts.tolist()))
+        return self._combine(batch, {}, 0, int(counts.sum()))
+
+    def merge(self, other):
+        if self.capacity != other.capacity:
+            raise ValueError("SpaceSaving 的容量不一致，无法合并")
+        return self._combine(other.counts, other.errors, other.floor, other.total)
+
+    def top_k(self, k=None):
+        """按估计频数降序的 key / count / error 三列；真实频数在 [count - error, count] 内。"""
+        rows = sorted(self.counts.items(), key=lambda kv: (-kv[1], str(kv[0])))[:k]
+        return pd.DataFrame({
+            "key": [key for key, _ in rows],
+            "count": np.array([c for _, c in rows], dtype=np.int64),
+            "error": np.array([self.errors[key] for key, _ in rows], dtype=np.int64),
+        })
+
+    def guaranteed(self, k=None):
+        """top_k 中保证排在真实前列的键：其下界不小于下一个候选的估计值。"""
+        table = self.top_k()
+        if k is not None and len(table) > k:
+            threshold = table["count"].iloc[k]
+            table = table.head(k)
+            return table[table["count"] - table["error"] >= threshold]
+        return table
+
+    def to_bytes(self):
+        keys = np.array(list(self.counts), dtype=object)
+        return _save_arrays(keys=keys, counts=np.array([self.counts[k] for k in keys], dtype=np.int64),
+                            errors=np.array([self.errors[k] for k in keys], dtype=np.int64),
+                            meta=np.array([self.capacity, self.total, self.floor_count]))
+
+    @classmethod
+    def from_bytes(cls, data):
+        arrays = _load_arrays(data)
+        capacity, total, floor_count = (int(v) for v in arrays["meta"])
+        sketch = cls(capacity)
+        sketch.floor_count = floor_count
+        keys = arrays["keys"].tolist()
+        sketch.counts = dict(zip(keys, arrays["counts"].tolist()))
+        sketch.errors = dict(zip(keys, arrays["errors"].tolist()))
+        sketch.total = total
+        return sketch
+
+
+class HyperLogLog:
+    def __init__(self, p=DEFAULT_P):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update(self, values):
+        values = pd.Series(values).dropna().to_numpy()
+        if not len(values):
+            return self
+        hashes = hash_values(values)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        # 其余位中最低位 1 的位置（尾随零个数 + 1）；只取 64 - p 位，全零时记为 64 - p + 1
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        with np.errstate(over="ignore"):
+            lowest = rest & (~rest + np.uint64(1))
+        rank = np.where(rest == 0, 64 - self.p + 1, np.log2(np.maximum(lowest, 1).astype(np.float64)) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def merge(self, other):
+        if self.p != other.p:
+            raise ValueError("HyperLogLog 的精度 p 不一致，无法合并")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # 小基数时改用线性计数
+        return float(raw)
+
+    def to_bytes(self):
+        return _save_arrays(registers=self.registers, meta=np.array([self.p]))
+
+    @classmethod
+    def from_bytes(cls, data):
+        arrays = _load_arrays(data)
+        sketch = cls(int(arrays["meta"][0]))
+        sketch.registers = arrays["registers"]
+        return sketch
+
+
+class GroupedHyperLogLog:
+    """按分组键（如 (月份, 类别)）分别估计不同取值个数，每组一个 HyperLogLog。"""
+
+    def __init__(self, p=DEFAULT_P):
+        self.p = p
+        self.groups = {}
+
+    def update(self, groups, values):
+        frame = pd.DataFrame({"group": list(groups) if not isinstance(groups, pd.Series) else groups.to_numpy(),
+                              "value": np.asarray(values)}).dropna()
+        for group, part in frame.groupby("group", sort=False, observed=True)["value"]:
+            self.groups.setdefault(group, HyperLogLog(self.p)).update(part.to_numpy())
+        return self
+
+    def merge(self, other):
+        for group, sketch in other.groups.items():
+            if group in self.groups:
+                self.groups[group].merge(sketch)
+            else:
+                self.groups[group] = sketch
+        return self
+
+    def estimates(self):
+        return pd.Series({group: sketch.estimate() for group, sketch in self.groups.items()}, dtype=float)
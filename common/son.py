@@ -0,0 +1,124 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from common.itemsets import TransactionBitmaps, frequent_from_counts, mine_frequent_itemsets
+from common.parallel import map_reduce
+
+# SON 两阶段分区挖掘：第一阶段在每个分区上以相同的相对支持度求局部频繁项集，
+# 全局频繁项集必然在至少一个分区中局部频繁；第二阶段对候选并集逐分区精确计数。
+# 两个阶段都在进程池中按分区执行，单个进程只持有一个分区的交易。
+# 第一阶段的结果可以连同各局部频繁项集在该分区的次数一起保存（local_itemset_counts，如分区清单），
+# 之后不低于该局部支持度的任意阈值都由 son_from_local_counts 完成：已记录的次数直接相加，
+# 只对未记录某候选、且上界仍可能达到阈值的分区回到明细补数。
+
+
+def _as_bitmaps(transactions):
+    if isinstance(transactions, TransactionBitmaps):
+        return transactions
+    return TransactionBitmaps.from_transactions(transactions)
+
+
+def _local_candidates(task):
+    path, build_transactions, min_support, max_len = task
+    bitmaps = _as_bitmaps(build_transactions(path))
+    if bitmaps.n_transactions == 0:
+        return set(), 0
+    local = mine_frequent_itemsets(bitmaps, min_support=min_support, max_len=max_len)
+    return set(local["itemsets"]), bitmaps.n_transactions
+
+
+def _count_candidates(task):
+    path, build_transactions, candidates = task
+    bitmaps = _as_bitmaps(build_transactions(path))
+    return bitmaps.count_itemsets(candidates), bitmaps.n_transactions
+
+
+def _count_missing(task):
+    path, build_transactions, candidates = task
+    return Counter(dict(zip(candidates, _count_candidates((path, build_transactions, candidates))[0].tolist())))
+
+
+def _merge_counts(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+def _merge_candidates(a, b):
+    return a[0] | b[0], a[1] + b[1]
+
+
+def son_frequent_itemsets(partitions, build_transactions, min_support=0.5, max_len=None, workers=None):
+    """对多个分区（part 文件）做与全量挖掘结果一致的频繁项集挖掘。
+
+    build_transactions(path) 返回单个分区的交易列表或 TransactionBitmaps，须为模块级函数。
+    返回 support / itemsets 两列，与 mine_frequent_itemsets 相同。
+    """
+    return son_mine(partitions, build_transactions, min_support, max_len=max_len, workers=workers)[0]
+
+
+def son_mine(partitions, build_transactions, min_support=0.5, max_len=None, workers=None):
+    """同 son_frequent_itemsets，返回 (频繁项集, 全部分区的交易数)；交易数在第一阶段顺带统计。"""
+    partitions = list(partitions)
+    candidates, n = map_reduce(
+        _local_candidates,
+        [(p, build_transactions, min_support, max_len) for p in partitions],
+        _merge_candidates,
+        workers=workers,
+    ) or (set(), 0)
+    if not candidates:
+        return pd.DataFrame({"support": pd.Series(dtype=float), "itemsets": pd.Series(dtype=object)}), n
+
+    candidates = sorted(candidates, key=lambda s: (len(s), sorted(s)))
+    counts, _ = map_reduce(
+        _count_candidates,
+        [(p, build_transactions, candidates) for p in partitions],
+        _merge_counts,
+        workers=workers,
+    )
+    support = counts / n
+    keep = counts >= np.ceil(min_support * n - 1e-9)
+    return pd.DataFrame({
+        "support": support[keep],
+        "itemsets": [c for c, k in zip(candidates, keep) if k],
+    }), n
+
+
+def local_itemset_counts(transactions, min_support, max_len=None):
+    """单个分区上局部频繁（支持度 >= min_support）的项集及其在该分区的次数，返回 ({项集: 次数}, 交易数)。"""
+    bitmaps = _as_bitmaps(transactions)
+    local = mine_frequent_itemsets(bitmaps, min_support=min_support, max_len=max_len)
+    counts = np.rint(local["support"].to_numpy() * bitmaps.n_transactions).astype(np.int64)
+    return dict(zip(local["itemsets"], counts.tolist())), bitmaps.n_transactions
+
+
+def son_from_local_counts(partitions, partials, build_transactions, min_support, local_support, max_len=None, workers=None):
+    """由各分区的 local_itemset_counts（以 local_support <= min_support 得到）给出全量频繁项集，结果同 son_frequent_itemsets。
+
+    partials[i] 对应 partitions[i]；某分区未记录的候选在该分区的次数必小于 ceil(local_support * n_i)，
+    以此为上界剔除不可能频繁的候选，其余缺失的次数由 build_transactions 回到该分区精确统计。
+    """
+    if min_support < local_support:
+        raise ValueError(f"支持度 {min_support} 低于分区结果的局部支持度 {local_support}")
+    partitions = list(partitions)
+    n = sum(n_i for _, n_i in partials)
+    min_count = np.ceil(min_support * n - 1e-9)
+    candidates = {c for counts, _ in partials for c in counts if max_len is None or len(c) <= max_len}
+
+    totals = Counter()
+    for counts, _ in partials:
+        totals.update({c: counts[c] for c in candidates if c in counts})
+    upper = Counter(totals)
+    for counts, n_i in partials:
+        bound = max(int(np.ceil(local_support * n_i - 1e-9)) - 1, 0)
+        upper.update({c: bound for c in candidates if c not in counts})
+    candidates = sorted((c for c in candidates if upper[c] >= min_count), key=lambda s: (len(s), sorted(s)))
+
+    tasks = []
+    for path, (counts, n_i) in zip(partitions, partials):
+        missing = [c for c in candidates if c not in counts]
+        if missing and n_i:
+            tasks.append((path, build_transactions, missing))
+    if tasks:
+        totals.update(map_reduce(_count_missing, tasks, lambda a, b: a + b, workers=workers))
+    return frequent_from_counts({c: totals[c] for c in candidates}, n, min_support=min_support, max_len=max_len)
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 合成数据集：生成与作业数据同结构的 part-*.parquet，用于在没有原始数据时运行脚本和做性能基准。
+# purchase_history / login_history 为 JSON 字符串，按比例混入空值和各种格式错误的行；
+# age / income / email / phone_number / last_login 也按比例混入缺失、异常和格式错误的取值。
+
+CATEGORIES = ["电子产品", "服装", "食品", "家居", "玩具", "书籍", "美妆", "运动户外", "母婴", "汽车用品"]
+PAYMENT_METHODS = ["信用卡", "支付宝", "微信支付", "现金", "银联", "储蓄卡"]
+PAYMENT_STATUSES = ["已支付", "已退款", "部分退款", "待支付"]
+COUNTRIES = ["中国", "美国", "日本", "德国", "英国", "法国", "印度", "巴西", "澳大利亚", "加拿大"]
+GENDERS = ["男", "女", "其他"]
+MALFORMED_JSON = ["", "N/A", "{", "{\"avg_price\": }", "[1, 2, 3]", "null"]
+
+SYNTH_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("user_name", pa.string()),
+    ("age", pa.int64()),
+    ("income", pa.float64()),
+    ("gender", pa.string()),
+    ("country", pa.string()),
+    ("email", pa.string()),
+    ("phone_number", pa.string()),
+    ("is_active", pa.bool_()),
+    ("registration_date", pa.string()),
+    ("last_login", pa.string()),
+    ("purchase_history", pa.string()),
+    ("login_history", pa.string()),
+])
+
+DEFAULT_OPTIONS = {
+    "null_rate": 0.02,        # 各可空列的缺失比例
+    "malformed_rate": 0.02,   # JSON / 日期 / 邮箱 / 手机号的格式错误比例
+    "abnormal_rate": 0.01,    # age、income 超出合理范围的比例
+    "start_date": "2022-01-01",
+    "days": 3 * 365,          # 购买与登录时间的跨度
+    "max_items": 6,
+    "max_logins": 8,
+}
+
+
+def _with_nulls(rng, values, rate):
+    return [None if m else v for v, m in zip(values, rng.random(len(values)) < rate)]
+
+
+def _timestamps(rng, n, start, days):
+    seconds = rng.integers(0, days * 86400, size=n)
+    return (np.datetime64(start, "s") + seconds).astype(str)
+
+
+def _purchase_json(rng, rows, opts):
+    dates = np.datetime_as_string(np.datetime64(opts["start_date"], "D") + rng.integers(0, opts["days"], rows))
+    prices = np.round(rng.lognormal(6.5, 1.2, rows), 2)
+    category = rng.integers(0, len(CATEGORIES), rows)
+    method = rng.integers(0, len(PAYMENT_METHODS), rows)
+    status = rng.choice(len(PAYMENT_STATUSES), rows, p=[0.7, 0.1, 0.05, 0.15])
+    n_items = rng.integers(0, opts["max_items"] + 1, rows)
+    item_cats = rng.integers(0, len(CATEGORIES), n_items.sum())
+    item_ids = rng.integers(1, 100000, n_items.sum())
+
+    out, pos = [], 0
+    for i in range(rows):
+        items = ", ".join(
+            f'{{"id": {item_ids[j]}, "categories": "{CATEGORIES[item_cats[j]]}"}}' for j in range(pos, pos + n_items[i])
+        )
+        pos += n_items[i]
+        out.append(
+            f'{{"avg_price": {prices[i]}, "categories": "{CATEGORIES[category[i]]}", "items": [{items}], '
+            f'"payment_method": "{PAYMENT_METHODS[method[i]]}", "payment_status": "{PAYMENT_STATUSES[status[i]]}", '
+            f'"purchase_date": "{dates[i]}"}}'
+        )
+    return out
+
+
+def _login_json(rng, rows, opts):
+    n_logins = rng.integers(0, opts["max_logins"] + 1, rows)
+    stamps = _timestamps(rng, n_logins.sum(), opts["start_date"], opts["days"])
+    counts = n_logins + rng.integers(0, 50, rows)
+    out, pos = [], 0
+    for i in range(rows):
+        ts = ", ".join(f'"{t}"' for t in stamps[pos:pos + n_logins[i]])
+        pos += n_logins[i]
+        out.append(f'{{"login_count": {counts[i]}, "timestamps": [{ts}]}}')
+    return out
+
+
+def _corrupt(rng, values, rate, bad_values):
+    hit = np.flatnonzero(rng.random(len(values)) < rate)
+    for i, b in zip(hit, rng.integers(0, len(bad_values), len(hit))):
+        values[i] = bad_values[b]
+    return values
+
+
+def generate_partition(rows, seed=0, start_id=0, n_users=None, **options):
+    """生成一个分区的 Arrow 表。n_users 给定时 id 从 [0, n_users) 中有放回抽取（同一用户多条记录）。"""
+    opts = dict(DEFAULT_OPTIONS, **options)
+    rng = np.random.default_rng(seed)
+    null_rate, bad_rate, abnormal_rate = opts["null_rate"], opts["malformed_rate"], opts["abnormal_rate"]
+
+    ids = rng.integers(0, n_users, rows) if n_users else np.arange(start_id, start_id + rows)
+    age = rng.integers(18, 80, rows)
+    abnormal = rng.random(rows) < abnormal_rate
+    age[abnormal] = rng.choice([-5, -1, 120, 150], abnormal.sum())
+    income = np.round(rng.lognormal(11, 0.8, rows), 2)
+    abnormal = rng.random(rows) < abnormal_rate
+    income[abnormal] = rng.choice([-1000.0, 2e7], abnormal.sum())
+
+    emails = _corrupt(rng, [f"user{i}@example.com" for i in ids], bad_rate, ["user.example.com", "@", "user@", "无"])
+    phones = _corrupt(rng, [f"1{n:010d}" for n in rng.integers(0, 10 ** 10, rows)], bad_rate, ["123", "电话", "12-34"])
+    last_login = _corrupt(rng, list(_timestamps(rng, rows, opts["start_date"], opts["days"])), bad_rate,
+                          ["unknown", "2023/13/45", ""])
+    registration = np.datetime_as_string(np.datetime64("2015-01-01", "D") + rng.integers(0, 7 * 365, rows))
+    purchase = _corrupt(rng, _purchase_json(rng, rows, opts), bad_rate, MALFORMED_JSON)
+    login = _corrupt(rng, _login_json(rng, rows, opts), bad_rate, MALFORMED_JSON)
+
+    columns = {
+        "id": ids,
+        "user_name": [f"user_{i}" for i in ids],
+        "age": _with_nulls(rng, age.tolist(), null_rate),
+        "income": _with_nulls(rng, income.tolist(), null_rate),
+        "gender": _with_nulls(rng, [GENDERS[g] for g in rng.integers(0, len(GENDERS), rows)], null_rate),
+        "country": _with_nulls(rng, [COUNTRIES[c] for c in rng.integers(0, len(COUNTRIES), rows)], null_rate),
+        "email": _with_nulls(rng, emails, null_rate),
+        "phone_number": _with_nulls(rng, phones, null_rate),
+        "is_active": rng.random(rows) < 0.6,
+        "registration_date": registration.tolist(),
+        "last_login": _with_nulls(rng, last_login, null_rate),
+        "purchase_history": _with_nulls(rng, purchase, null_rate),
+        "login_history": _with_nulls(rng, login, null_rate),
+    }
+    return pa.table(columns, schema=SYNTH_SCHEMA)
+
+
+def write_dataset(out_dir, files=4, rows=100_000, seed=0, n_users=None, row_group_size=None, **options):
+    """写出 files 个 part 文件，每个 rows 行，返回文件路径列表。"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(files):
+        table = generate_partition(rows, seed=seed + i, start_id=i * rows, n_users=n_users, **options)
+        path = os.path.join(out_dir, f"part-{i:05d}.parquet")
+        pq.write_table(table, path, row_group_size=row_group_size or max(1, rows // 4))
+        paths.append(path)
+    return paths
@@ -0,0 +1,115 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# 时间戳的批量解析：整列（或展平后的列表列）按固定格式一次交给 Arrow strptime，得到 int64 的 Unix 秒，
+# 不走 pandas 的逐元素格式推断。格式未知时只用少量样本在候选格式中选一个，并按名称缓存；
+# check_format 用同样的样本检查格式，解析失败的比例异常时直接报错，而不是把整列当作缺失。
+# 候选格式中的 ISO8601 接受带小数秒与时区后缀（Z、+08:00、+0800）的写法：小数秒截断到秒，时区后缀忽略，
+# 取记录中的当地时间（与 pd.to_datetime 解析统一时区的列后取 .dt 字段的结果一致）。
+# 列表列（如 login_history.timestamps）保存为 CSR 结构：values 为全部有效时间戳，offsets[i]:offsets[i+1]
+# 为第 i 行的时间戳；每行的最大值、个数、距今天数都由 reduceat 等分段归约得到。
+
+DEFAULT_FORMAT = "%Y-%m-%dT%H:%M:%S"
+ISO8601 = "ISO8601"
+CANDIDATE_FORMATS = [DEFAULT_FORMAT, "%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d", ISO8601]
+_ISO8601_PATTERN = r"^(?P<date>\d{4}-\d{2}-\d{2})[T ](?P<time>\d{2}:\d{2}:\d{2})(?:[.,]\d+)?(?:Z|[+-]\d{2}(?::?\d{2})?)?$"
+SAMPLE_SIZE = 1000
+MAX_UNPARSED_RATIO = 0.5
+
+_format_cache = {}
+
+
+def _as_array(values):
+    if isinstance(values, pa.ChunkedArray):
+        return values.combine_chunks()
+    return values if isinstance(values, pa.Array) else pa.array(values, type=pa.string(), from_pandas=True)
+
+
+def _strptime(arr, fmt):
+    # 解析失败为 null 的 timestamp[s]
+    if fmt != ISO8601:
+        return pc.strptime(arr, format=fmt, unit="s", error_is_null=True)
+    parts = pc.extract_regex(arr, pattern=_ISO8601_PATTERN)
+    text = pc.binary_join_element_wise(pc.struct_field(parts, "date"), pc.struct_field(parts, "time"), "T")
+    return pc.strptime(text, format=DEFAULT_FORMAT, unit="s", error_is_null=True)
+
+
+def infer_format(values, key=None):
+    """在 CANDIDATE_FORMATS 中选出能解析最多样本的格式；给定 key 时结果按 key 缓存。"""
+    if key is not None and key in _format_cache:
+        return _format_cache[key]
+    sample = pc.drop_null(_as_array(values).slice(0, SAMPLE_SIZE))
+    best, best_count = DEFAULT_FORMAT, -1
+    for fmt in CANDIDATE_FORMATS:
+        count = len(sample) - _strptime(sample, fmt).null_count
+        if count > best_count:
+            best, best_count = fmt, count
+    if key is not None:
+        _format_cache[key] = best
+    return best
+
+
+def check_format(values, fmt, key=None, max_unparsed=MAX_UNPARSED_RATIO):
+    """用少量非空样本检查 fmt；无法解析的比例超过 max_unparsed 时抛出 ValueError，否则返回 fmt。"""
+    sample = pc.drop_null(_as_array(values).slice(0, SAMPLE_SIZE))
+    if len(sample):
+        unparsed = _strptime(sample, fmt).null_count / len(sample)
+        if unparsed > max_unparsed:
+            raise ValueError(f"{key or '时间戳'} 的样本中有 {unparsed:.0%} 无法按格式 {fmt!r} 解析，请检查时间戳格式")
+    return fmt
+
+
+def parse_epoch(values, fmt=DEFAULT_FORMAT):
+    """字符串列 -> (Unix 秒 int64 数组, 是否解析成功的布尔数组)；fmt=None 时推断格式。"""
+    arr = _as_array(values)
+    fmt = fmt or infer_format(arr)
+    parsed = _strptime(arr, fmt)
+    valid = parsed.is_valid().to_numpy(zero_copy_only=False)
+    seconds = pc.cast(parsed, pa.int64()).fill_null(0).to_numpy(zero_copy_only=False)
+    return seconds, valid
+
+
+def to_datetime64(seconds):
+    return np.asarray(seconds, dtype=np.int64).astype("datetime64[s]")
+
+
+class EpochLists:
+    """CSR 结构的时间戳列表：values 为 int64 Unix 秒，offsets 长度为行数 + 1；解析失败的元素已剔除。"""
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    @classmethod
+    def from_arrow(cls, lists, fmt=DEFAULT_FORMAT):
+        lists = _as_array(lists)
+        seconds, valid = parse_epoch(pc.list_flatten(lists), fmt)
+        rows = pc.list_parent_indices(lists).to_numpy()
+        counts = np.bincount(rows[valid], minlength=len(lists))
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(seconds[valid], offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def counts(self):
+        return np.diff(self.offsets)
+
+    def segment_max(self):
+        """每行的最大时间戳（Unix 秒，float64），空行为 NaN。"""
+        out = np.full(len(self), np.nan)
+        nonempty = self.counts() > 0
+        if nonempty.any():
+            out[nonempty] = np.maximum.reduceat(self.values, self.offsets[:-1][nonempty])
+        return out
+
+    def days_since_latest(self, today):
+        """每行最近一次时间戳距 today 的整天数（向下取整），空行为 NaN。"""
+        today_s = np.datetime64(today, "s").astype(np.int64)
+        latest = self.segment_max()
+        days = np.full(len(self), np.nan)
+        valid = ~np.isnan(latest)
+        days[valid] = (today_s - latest[valid].astype(np.int64)) // 86400
+        return days
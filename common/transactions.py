@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from common.itemsets import TransactionBitmaps
+from common.json_cache import load_parsed
+from common.loader import load_table
+
+# 各分析对应的交易定义：输入单个 part 文件路径，返回该分区的交易列表（每条交易为项的列表）或事件表。
+# 定义为模块级函数，便于在进程池中按分区调用。类别/支付字段在解析缓存中为字典编码，
+# 交易直接由整数编码构建为 TransactionBitmaps，不经过逐行的字符串列表。
+
+REFUND_STATUSES = ['已退款', '部分退款']
+CATEGORY_COLUMNS = ["purchase_valid", "categories", "category_list"]
+REFUND_COLUMNS = ["payment_status", "item_categories"]
+
+
+def _dictionary_codes(arr):
+    """字典编码数组的下标（空值为 -1）与字典。"""
+    arr = arr.combine_chunks() if isinstance(arr, pa.ChunkedArray) else arr
+    return arr.indices.fill_null(-1).to_numpy(zero_copy_only=False), arr.dictionary
+
+
+def category_transactions(path):
+    """每条成功解析的购买记录的商品类别构成一条交易（hw2/1.py），直接由字典编码构建位图。
+
+    categories 为单个类别时交易只含该类别，为类别列表时交易含列表中的各类别（与原脚本一致）。
+    """
+    return category_transactions_from(load_parsed(path, columns=CATEGORY_COLUMNS))
+
+
+def category_transactions_from(parsed):
+    """同 category_transactions，输入为已读取的解析列（含 CATEGORY_COLUMNS）。"""
+    rows = np.flatnonzero(parsed.column("purchase_valid").to_numpy())
+    codes, dictionary = _dictionary_codes(parsed.column("categories"))
+    codes = codes[rows]
+    keep = codes >= 0
+    lists = parsed.column("category_list").combine_chunks().take(pa.array(rows))
+    list_codes, list_dictionary = _dictionary_codes(pc.list_flatten(lists))
+    parents = pc.list_parent_indices(lists).to_numpy()
+    # 两份字典合并为同一套项编号，同一类别无论来自单值还是列表都对应同一项
+    labels = dictionary.to_pylist()
+    index = {label: i for i, label in enumerate(labels)}
+    for label in list_dictionary.to_pylist():
+        if label not in index:
+            index[label] = len(labels)
+            labels.append(label)
+    remap = np.array([index[label] for label in list_dictionary.to_pylist()], dtype=np.int64)
+    in_list = list_codes >= 0
+    tids = np.concatenate([np.flatnonzero(keep), parents[in_list]])
+    items = np.concatenate([codes[keep], remap[list_codes[in_list]]])
+    return TransactionBitmaps.from_dictionary(tids, items, labels, len(rows))
+
+
+def refund_transactions(path):
+    """支付状态为已退款/部分退款的记录中，各商品类别去重后构成一条交易（hw2/4.py）。"""
+    return refund_transactions_from(load_parsed(path, columns=REFUND_COLUMNS))
+
+
+def refund_transactions_from(parsed):
+    """同 refund_transactions，输入为已读取的解析列（含 REFUND_COLUMNS）；第 t 条交易对应 refund_rows 的第 t 行。"""
+    rows = refund_rows(parsed)
+    items = parsed.column("item_categories").combine_chunks().take(pa.array(rows))
+    parents = pc.list_parent_indices(items).to_numpy()
+    codes, dictionary = _dictionary_codes(pc.list_flatten(items))
+    labels = dictionary.to_pylist()
+    keep = (codes >= 0) & np.isin(codes, [i for i, c in enumerate(labels) if c])  # 空类别不作为项
+    return TransactionBitmaps.from_dictionary(parents[keep], codes[keep], labels, len(rows))
+
+
+def refund_rows(parsed):
+    """支付状态为已退款/部分退款的行号。"""
+    status, status_dict = _dictionary_codes(parsed.column("payment_status"))
+    # 只需在字典上判断一次，再按下标取回每行的结果
+    refund = pc.is_in(pc.utf8_trim_whitespace(status_dict), value_set=pa.array(REFUND_STATUSES)).to_numpy(zero_copy_only=False)
+    return np.flatnonzero((status >= 0) & refund[np.maximum(status, 0)])
+
+
+def purchase_events(path):
+    """每条成功解析出类别与购买日期的记录构成一个购买事件：user_id / purchase_date / category（hw2/3.py）。"""
+    parsed = load_parsed(path, columns=["categories", "purchase_date"]).to_pandas()
+    events = pd.DataFrame({
+        "user_id": load_table(path, columns=["id"]).column("id").to_numpy(),
+        "purchase_date": pd.to_datetime(parsed["purchase_date"], errors="coerce"),
+        "category": parsed["categories"],
+    })
+    return events.dropna(subset=["user_id", "purchase_date", "category"])
@@ -2,62 +2,115 @@ import pandas as pd
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import seaborn as sns
-import pyarrow.parquet as pq
-import glob
+from collections import Counter
+import argparse
 import os
-import time
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.aggregates import Histogram, parquet_min_max, top_k, update_counter
+from common.loader import dataset_pattern, iter_batches, list_files, load_df
+from common.profiling import enable, print_summary, stage
+from common.sketches import SpaceSaving
+from common.timestamps import check_format, infer_format, parse_epoch, to_datetime64
 
 print(mpl.get_cachedir())
 
 plt.rcParams["font.sans-serif"] = ["SimHei"]  # 设置字体
 plt.rcParams["axes.unicode_minus"] = False  # 正常显示负号
 
+parser = argparse.ArgumentParser(description="3.1 探索性分析和可视化")
+parser.add_argument("--stream", action="store_true", help="按批次流式统计，内存只与批次大小有关")
+parser.add_argument("--batch-size", type=int, default=65536)
+parser.add_argument("--sketch", type=int, default=None, metavar="CAPACITY",
+                    help="流式统计时国家与月份计数改用 SpaceSaving sketch（最多 CAPACITY 个计数器，误差不超过 行数/CAPACITY）")
+parser.add_argument("--profile", default=None, help="把各阶段的耗时、行数、峰值内存以 JSON 行写入该文件，并在结束时打印汇总")
+args = parser.parse_args()
+if args.profile:
+    enable(args.profile)
+
 names = ["10G"]
+COLUMNS = ['age', 'country', 'last_login']
+AGE_BINS = 30
+
+
+# ---------- 流式统计：年龄直方图、国家计数、每月登录计数 ----------
+def login_months(last_login):
+    # 按固定格式整列解析（格式由首批样本推断后缓存），解析失败的日期不计入；样本大面积无法解析时报错
+    fmt = check_format(last_login, infer_format(last_login, key='last_login'), key='last_login')
+    seconds, valid = parse_epoch(last_login, fmt)
+    return pd.Series(to_datetime64(seconds[valid])).dt.to_period('M')
+
+
+def stream_aggregates(files, batch_size, sketch=None):
+    lo, hi = parquet_min_max(files, 'age')
+    age_hist = Histogram.uniform(lo if lo is not None else 0, hi if hi is not None else 1, AGE_BINS)
+    country_counter = Counter() if sketch is None else SpaceSaving(sketch)
+    month_counter = Counter() if sketch is None else SpaceSaving(sketch)
+
+    for batch in iter_batches(files, columns=COLUMNS, batch_size=batch_size):
+        batch = batch.to_pandas()
+        age_hist.update(batch['age'])
+        if sketch is None:
+            update_counter(country_counter, batch['country'])
+            update_counter(month_counter, login_months(batch['last_login']))
+        else:
+            country_counter.update(batch['country'])
+            month_counter.update(login_months(batch['last_login']))
+
+    if sketch is None:
+        return age_hist, top_k(country_counter, 10), pd.Series(month_counter, dtype="int64").sort_index()
+    # 估计值为真实频数的上界，误差不超过 error 列
+    print(f"sketch 误差：国家计数 ≤ {country_counter.max_error}，月份计数 ≤ {month_counter.max_error}")
+    countries = country_counter.top_k(10)
+    months = month_counter.top_k()
+    return (age_hist, pd.Series(countries['count'].to_numpy(), index=countries['key']),
+            pd.Series(months['count'].to_numpy(), index=months['key']).sort_index())
+
 
 for name in names:
-    start_time = time.time()
-    dir = name + "_data_new"
-    # 加载数据
-    path = os.path.join("/data/qy/homework/2", dir, "part-*.parquet")
-
-    files_10g = sorted(glob.glob(path))
-    df_10g = pd.concat([pq.read_table(f, columns=['age', 'country', 'last_login']).to_pandas() for f in files_10g], ignore_index=True)
-    # df_10g = pd.read_parquet(path)
-    # 年龄分布图
-    plt.figure(figsize=(10, 6))
-    sns.histplot(df_10g['age'].dropna(), bins=30, kde=True)
-    plt.title("Age Distribution_" + name)
-    plt.xlabel("Age")
-    plt.ylabel("Frequency")
-    plt.savefig("age_dist_" + name + ".png")
-
-    # 国家分布图
-    plt.figure(figsize=(12, 6))
-    df_10g['country'].value_counts().head(10).plot(kind='bar')
-    plt.title("Top 10 Countries by User Count_" + name)
-    plt.ylabel("User Count")
-    plt.savefig("country_dist_" + name + ".png")
-
-
-    # 确保 last_login 是 datetime 类型（会自动跳过格式错误的）
-    df_10g['last_login'] = pd.to_datetime(df_10g['last_login'], errors='coerce')
-
-    # 删除解析失败的（NaT）日期
-    login_df = df_10g.dropna(subset=['last_login'])
-
-    # 按月统计登录活跃用户数
-    login_df['login_month'] = login_df['last_login'].dt.to_period('M')
-    login_counts = login_df['login_month'].value_counts().sort_index()
-
-    # 可视化
-    plt.figure(figsize=(12, 6))
-    login_counts.plot(kind='bar', color='skyblue')
-    plt.title('每月登录用户数量')
-    plt.xlabel('月份')
-    plt.ylabel('登录次数')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig("login_" + name + ".png")
-
-    end_time = time.time()  # 记录结束时间
-    print(f"数据集 {name} 的程序运行时间：{end_time - start_time:.2f} 秒")
+    with stage("dataset_" + name) as record:
+        # 加载数据
+        files_10g = list_files(dataset_pattern(name))
+        if args.stream:
+            age_hist, top_countries, login_counts = stream_aggregates(files_10g, args.batch_size, args.sketch)
+        else:
+            df_10g = load_df(files_10g, columns=COLUMNS)
+            top_countries = df_10g['country'].value_counts().head(10)
+            # 按月统计登录活跃用户数
+            login_counts = login_months(df_10g['last_login']).value_counts().sort_index()
+
+        # 年龄分布图
+        plt.figure(figsize=(10, 6))
+        if args.stream:
+            # 以分箱中心加权绘制，KDE 基于分箱结果估计
+            sns.histplot(x=age_hist.centers, weights=age_hist.counts, bins=AGE_BINS,
+                         binrange=(age_hist.edges[0], age_hist.edges[-1]), kde=True)
+        else:
+            sns.histplot(df_10g['age'].dropna(), bins=AGE_BINS, kde=True)
+        plt.title("Age Distribution_" + name)
+        plt.xlabel("Age")
+        plt.ylabel("Frequency")
+        plt.savefig("age_dist_" + name + ".png")
+
+        # 国家分布图
+        plt.figure(figsize=(12, 6))
+        top_countries.plot(kind='bar')
+        plt.title("Top 10 Countries by User Count_" + name)
+        plt.ylabel("User Count")
+        plt.savefig("country_dist_" + name + ".png")
+
+        # 可视化
+        plt.figure(figsize=(12, 6))
+        login_counts.plot(kind='bar', color='skyblue')
+        plt.title('每月登录用户数量')
+        plt.xlabel('月份')
+        plt.ylabel('登录次数')
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        plt.savefig("login_" + name + ".png")
+
+    print(f"数据集 {name} 的程序运行时间：{record.wall:.2f} 秒")
+
+if args.profile:
+    print_summary()
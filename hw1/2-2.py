@@ -1,96 +1,57 @@
-import pandas as pd
-import pyarrow.parquet as pq
-import glob
-import numpy as np
-import json
-import re
+import argparse
 import os
+import sys
 import time
-from datetime import datetime
 import matplotlib.pyplot as plt
 import warnings
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.cleaned import resolve_files
+from common.loader import dataset_pattern, list_files
+from common.scoring import load_config, read_segment, run_scoring
+
 # 忽略所有警告
 warnings.filterwarnings("ignore")
 
-names = ["30G", "10G"]
-
-for name in names:
-    start_time = time.time()
-    # ---------- 路径与数据加载 ----------
-    dir = name + "_data_new"
-
-    path = os.path.join("/data/qy/homework/2", dir, "part-00000.parquet")
-    # path = os.path.join("/data/qy/homework/2", dir, "*.parquet")
-    files = sorted(glob.glob(path))
-    df = pd.concat([pq.read_table(f).to_pandas() for f in files], ignore_index=True)
-    print('#' * 50, 'Dataset: ', name, '#' * 50)
-    print(f"原始数据量：{len(df):,} 行")
-
-    # ---------- 提取平均消费金额和消费次数 ----------
-    def extract_purchase_features(purchase_str):
-        try:
-            data = json.loads(purchase_str)
-            return pd.Series({
-                'avg_purchase': data.get('avg_price', np.nan),
-                'purchase_count': len(data.get('items', []))
-            })
-        except:
-            return pd.Series({'avg_purchase': np.nan, 'purchase_count': 0})
-
-    purchase_features = df['purchase_history'].apply(extract_purchase_features)
-    df = pd.concat([df, purchase_features], axis=1)
-
-    # ---------- 提取登录次数和最近登录时间 ----------
-    def extract_login_features(login_str):
-        try:
-            data = json.loads(login_str)
-            timestamps = pd.to_datetime(data.get('timestamps', []), errors='coerce')
-            login_count = data.get('login_count', 0)
-            last_login = max(timestamps) if len(timestamps) > 0 else pd.NaT
-            return pd.Series({
-                'login_count': login_count,
-                'recent_login': last_login
-            })
-        except:
-            return pd.Series({'login_count': 0, 'recent_login': pd.NaT})
-
-    login_features = df['login_history'].apply(extract_login_features)
-    df = pd.concat([df, login_features], axis=1)
-
-    # ---------- 标准化评分（可换成更复杂的模型） ----------
-    # 计算最近登录距今的天数
-    today = pd.Timestamp(datetime.now().date())
-    df['days_since_login'] = (today - df['recent_login']).dt.days.fillna(9999)
-
-    # 将所有关键字段标准化（归一化处理）
-    def normalize(series):
-        return (series - series.min()) / (series.max() - series.min())
-
-    df['score'] = (
-        normalize(df['avg_purchase'].fillna(0)) * 0.4 +
-        normalize(df['purchase_count']) * 0.2 +
-        normalize(df['login_count']) * 0.2 +
-        normalize(-df['days_since_login']) * 0.1 +
-        df['is_active'] * 0.1
-    )
-
-    # ---------- 按照分数排序识别 Top 高价值用户 ----------
-    df['value_segment'] = pd.qcut(df['score'], q=5, labels=['E', 'D', 'C', 'B', 'A'])  # 类似 RFM 分层
-    high_value_users = df[df['value_segment'] == 'A']
-
-    print(f"💎 高价值用户数量：{len(high_value_users)}")
-    print(high_value_users[['id', 'user_name', 'avg_purchase', 'purchase_count', 'login_count', 'days_since_login', 'score']].head(10))
-
-    # ---------- 可视化分数分布 ----------
-    plt.figure(figsize=(10, 5))
-    df['score'].hist(bins=50, color='orange')
-    plt.title("用户价值评分分布")
-    plt.xlabel("Score")
-    plt.ylabel("用户数量")
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("user_value_score_distribution_" + name + ".png")
-
-    
-
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="3.2 数据预处理：用户价值评分")
+    parser.add_argument("--exact-quantiles", action="store_true", help="分层边界使用精确分位数（与 pd.qcut 一致），默认使用 sketch 近似")
+    parser.add_argument("--config", default=None, help="评分配置文件（权重、分层标签），默认 config/scoring.json")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认使用全部 CPU 核")
+    parser.add_argument("--cleaned", action="store_true", help="读取 hw1/2-1.py 写出的清洗后数据集（内存映射），不再重复解码与清洗；评分只覆盖清洗后保留的记录")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    names = ["30G", "10G"]
+
+    for name in names:
+        start_time = time.time()
+        # ---------- 路径 ----------
+        # 评分引擎逐分区处理，内存与数据量无关，可直接对全部 part 文件评分
+        files = resolve_files(list_files(dataset_pattern(name)), cleaned=args.cleaned)
+        print('#' * 50, 'Dataset: ', name, '#' * 50)
+
+        # ---------- 两遍评分：全局归一化参数与分层边界 -> 逐分区打分写出 ----------
+        output_dir = "user_value_segments_" + name
+        result = run_scoring(files, output_dir, config=config, exact=args.exact_quantiles, workers=args.workers)
+        counts = result["segment_counts"]
+        print(f"原始数据量：{sum(counts.values()):,} 行")
+        print("各层用户数：", {label: counts.get(label, 0) for label in config["segments"]})
+
+        # ---------- 按照分数识别 Top 高价值用户 ----------
+        top_label = config["segments"][-1]
+        high_value_users = read_segment(output_dir, top_label)
+        print(f"💎 高价值用户数量：{len(high_value_users)}")
+        print(high_value_users[['id', 'user_name', 'avg_purchase', 'purchase_count', 'login_count', 'days_since_login', 'score']].head(10))
+        print(f"评分结果已按 value_segment 写出到 {output_dir}/，耗时 {time.time() - start_time:.2f} 秒")
+
+        # ---------- 可视化分数分布（合并后的直方图） ----------
+        hist = result["histogram"]
+        plt.figure(figsize=(10, 5))
+        plt.bar(hist.centers, hist.counts, width=hist.edges[1] - hist.edges[0], color='orange')
+        plt.title("用户价值评分分布")
+        plt.xlabel("Score")
+        plt.ylabel("用户数量")
+        plt.grid(True)
+        plt.tight_layout()
+        plt.savefig("user_value_score_distribution_" + name + ".png")
@@ -1,77 +1,96 @@
-import pandas as pd
-import json
-import glob
-import pyarrow.parquet as pq
-from mlxtend.frequent_patterns import apriori, association_rules
+import argparse
+import os
+import sys
 
-# ---------- 读取 parquet 数据 ----------
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.itemsets import TransactionBitmaps, association_rules, mine_frequent_itemsets
+from common.json_cache import load_parsed_files
+from common.loader import DATA_ROOT, list_files
+from common.rule_store import RuleStore
+from common.sampling import format_interval, sample_table
+from common.transactions import CATEGORY_COLUMNS
+
+# ---------- 读取 parquet 数据（解析缓存中的商品类别） ----------
 def load_parquet_data(folder_path):
-    files = sorted(glob.glob(folder_path + "/part-00000.parquet"))
-    df = pd.concat([pq.read_table(f).to_pandas() for f in files], ignore_index=True)
-    return df
-
-# ---------- 提取商品类别交易 ----------
-def extract_categories(row):
-    try:
-        items = json.loads(row)
-        if isinstance(items, dict):  # 单一交易
-            return [items.get('categories')]
-        elif isinstance(items, list):  # 多商品订单
-            return [item.get('categories') for item in items if 'categories' in item]
-    except:
-        return []
+    files = list_files(os.path.join(folder_path, "part-00000.parquet"))
+    return load_parsed_files(files, columns=["purchase_valid", "categories"]).to_pandas()
+
+# ---------- 抽样读取：全部 part 文件上的均匀/分层样本 ----------
+def load_sample(folder_path, size, strata=None, seed=0):
+    files = list_files(os.path.join(folder_path, "part-*.parquet"))
+    return sample_table(files, size, parsed_columns=CATEGORY_COLUMNS, strata=strata, seed=seed)
 
 # ---------- 构建交易数据 ----------
 def build_transaction_df(df):
-    df['categories_list'] = df['purchase_history'].apply(extract_categories)
-    transactions = df['categories_list'].dropna().tolist()
-    transactions = [list(set(t)) for t in transactions if isinstance(t, list) and len(t) > 0]
-    return transactions
-
-# ---------- One-hot 编码 ----------
-def transactions_to_df(transactions):
-    from mlxtend.preprocessing import TransactionEncoder
-    te = TransactionEncoder()
-    te_ary = te.fit(transactions).transform(transactions)
-    return pd.DataFrame(te_ary, columns=te.columns_)
+    # 单一交易的类别即为一条事务，解析失败的记录不计入；categories 为 category 类型，取整数编码
+    return df.loc[df['purchase_valid'], 'categories']
+
+# ---------- 构建位图索引 ----------
+def transactions_to_bitmaps(transactions):
+    codes = transactions.cat.codes.to_numpy()
+    tids = np.flatnonzero(codes >= 0)
+    return TransactionBitmaps.from_dictionary(tids, codes[tids], transactions.cat.categories, len(codes))
 
 # ---------- 挖掘频繁项集 ----------
-def run_apriori_analysis(oht_df, min_support=0.02, min_confidence=0.5):
-    freq_itemsets = apriori(oht_df, min_support=min_support, use_colnames=True)
+def run_apriori_analysis(bitmaps, min_support=0.02, min_confidence=0.5):
+    freq_itemsets = mine_frequent_itemsets(bitmaps, min_support=min_support)
     rules = association_rules(freq_itemsets, metric="confidence", min_threshold=min_confidence)
     return freq_itemsets, rules
 
-# ---------- 分析含“电子产品”规则 ----------
-def filter_rules_for_electronics(rules):
-    return rules[rules['antecedents'].apply(lambda x: '电子产品' in x) |
-                 rules['consequents'].apply(lambda x: '电子产品' in x)]
+# ---------- 分析含“电子产品”规则（按倒排索引查询） ----------
+def filter_rules_for_electronics(store):
+    return store.query(any_item='电子产品')
 
 # ---------- 主程序 ----------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="任务目标1：商品类别关联规则（单机内存版）")
+    parser.add_argument("--sample", type=int, default=None, metavar="N",
+                        help="从全部 part 文件中一遍扫描抽取 N 行样本（默认只读取 part-00000），并给出支持度的置信区间")
+    parser.add_argument("--strata", default=None, help="分层抽样的列（如 country、is_active），默认均匀抽样")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
     # ⚠️ 替换为你的 parquet 数据路径（10G 或 30G）
-    parquet_path = "/data/qy/homework/2/10G_data_new"  # 或 30G_data_new
+    parquet_path = os.path.join(DATA_ROOT, "10G_data_new")  # 或 30G_data_new
 
     print("读取数据中...")
-    df = load_parquet_data(parquet_path)
+    if args.sample:
+        sample = load_sample(parquet_path, args.sample, strata=args.strata, seed=args.seed)
+        df = sample.table.to_pandas()
+        print(f"抽样 {len(sample):,} 行（总体 {sample.total:,} 行，{len(sample.labels)} 层）")
+    else:
+        df = load_parquet_data(parquet_path)
 
     print("提取交易（商品类别）...")
     transactions = build_transaction_df(df)
 
     print(f"共提取到 {len(transactions):,} 条有效交易。")
+    if args.sample:
+        print("总体有效交易数估计：" + format_interval(*sample.count(df['purchase_valid'].to_numpy()), digits=0))
 
-    print("One-hot 编码...")
-    oht_df = transactions_to_df(transactions)
+    print("构建位图索引...")
+    bitmaps = transactions_to_bitmaps(transactions)
 
-    print("执行 Apriori 算法...")
-    freq_itemsets, rules = run_apriori_analysis(oht_df, min_support=0.02, min_confidence=0.5)
+    print("挖掘频繁项集...")
+    freq_itemsets, rules = run_apriori_analysis(bitmaps, min_support=0.02, min_confidence=0.5)
 
     print(f"共挖掘出 {len(rules)} 条关联规则。")
+    if args.sample:
+        # 交易 t 对应样本中第 t 条有效记录
+        freq_itemsets = sample.supports(freq_itemsets, bitmaps, df.index.get_indexer(transactions.index))
+        print("频繁项集支持度（95% 置信区间）：")
+        print(freq_itemsets.head(10))
+        freq_itemsets.to_csv("sampled_frequent_itemsets.csv", index=False)
 
     print("筛选包含“电子产品”的规则...")
-    electronics_rules = filter_rules_for_electronics(rules)
+    store = RuleStore.from_rules(rules)
+    electronics_rules = filter_rules_for_electronics(store)
 
     print(electronics_rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']].head(10))
 
     # 保存结果
     rules.to_csv("all_association_rules.csv", index=False)
+    store.save("all_association_rule_store")
     electronics_rules.to_csv("electronics_rules.csv", index=False)
@@ -1,57 +1,48 @@
-import pandas as pd
-import json
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
-import pyarrow.parquet as pq
-import glob
+import argparse
 import os
-
-# ---------- 数据加载 ----------
-def load_and_flatten_purchase_history(parquet_path):
-    print("正在加载数据...")
-    df = pd.concat([pq.read_table(file).to_pandas() for file in glob.glob(parquet_path)], ignore_index=True)
-
-    transactions = []
-    for record in df["purchase_history"]:
-        try:
-            data = json.loads(record)
-            if isinstance(data, dict):
-                category = data.get("categories")
-                if isinstance(category, list):
-                    transactions.append(category)
-                else:
-                    transactions.append([category])
-        except Exception:
-            continue
-
-    return transactions
-
-# ---------- 频繁项集挖掘（Apriori） ----------
-def mine_association_rules(transactions, min_support=0.02, min_confidence=0.5):
-    te = TransactionEncoder()
-    te_ary = te.fit(transactions).transform(transactions)
-    df = pd.DataFrame(te_ary, columns=te.columns_)
-
-    print("正在执行 Apriori 算法...")
-    frequent_itemsets = apriori(df, min_support=min_support, use_colnames=True)
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.cleaned import resolve_files
+from common.loader import dataset_pattern, list_files
+from common.itemset_cache import DEFAULT_FLOOR, ItemsetCache
+from common.rule_store import RuleStore
+
+# ---------- 频繁项集挖掘（按 part 文件分区计数，分区清单中保存各分区的项集计数） ----------
+def mine_association_rules(files, min_support=0.02, min_confidence=0.5, min_lift=None, floor=DEFAULT_FLOOR, workers=None):
+    # 交易按分区在子进程中构建（每条成功解析的购买记录的商品类别为一条交易），只对新增或变化的 part 计数；
+    # 以 floor 得到的频繁项集按数据指纹缓存，调整阈值时只需筛选并重新生成规则
+    print("正在挖掘频繁项集...")
+    frequent_itemsets, rules, hit = ItemsetCache.for_files(files).rules(
+        files, "category_itemsets", min_support, min_confidence, min_lift=min_lift, floor=floor, workers=workers)
+    print("复用已缓存的频繁项集" if hit else f"以最低支持度 {min(floor, min_support)} 计算并缓存频繁项集")
     print(f"共发现 {len(frequent_itemsets)} 个频繁项集")
-
-    rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_confidence)
-    rules = rules.sort_values(by="lift", ascending=False)
     print(f"共生成 {len(rules)} 条关联规则")
 
     return frequent_itemsets, rules
 
 # ---------- 主函数 ----------
 if __name__ == '__main__':
-    parquet_path = "/data/qy/homework/2/10G_data_new/*.parquet"  # 替换为你的路径
+    parser = argparse.ArgumentParser(description="任务目标1：商品类别关联规则")
+    parser.add_argument("--min-support", type=float, default=0.02)
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--min-lift", type=float, default=None)
+    parser.add_argument("--floor", type=float, default=DEFAULT_FLOOR, help="缓存频繁项集时使用的最低支持度")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认使用全部 CPU 核")
+    parser.add_argument("--cleaned", action="store_true", help="读取 hw1/2-1.py 写出的清洗后数据集（内存映射），不再重复解码与清洗")
+    args = parser.parse_args()
 
-    transactions = load_and_flatten_purchase_history(parquet_path)
-    frequent_itemsets, rules = mine_association_rules(transactions)
+    parquet_path = dataset_pattern("10G")  # 替换为你的数据集（10G 或 30G）
+
+    print("正在加载数据...")
+    files = resolve_files(list_files(parquet_path), cleaned=args.cleaned)
+    frequent_itemsets, rules = mine_association_rules(files, args.min_support, args.min_confidence, args.min_lift,
+                                                      args.floor, workers=args.workers)
 
     # 保存结果
     frequent_itemsets.to_csv("frequent_itemsets.csv", index=False)
     rules.to_csv("association_rules.csv", index=False)
+    RuleStore.from_rules(rules).save("association_rule_store")  # 可用 RuleStore.load 重新加载并按项查询
 
     # 输出部分结果
     print("前5个频繁项集：")
@@ -1,72 +1,54 @@
-import pandas as pd
-import pyarrow.parquet as pq
-import glob
-import json
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
+import argparse
+import os
+import sys
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.cleaned import resolve_files
+from common.loader import dataset_pattern, list_files
+from common.manifest import PartitionManifest
+from common.rule_store import RuleStore
 
 print(mpl.get_cachedir())
 
 plt.rcParams["font.sans-serif"] = ["SimHei"]  # 设置字体
 plt.rcParams["axes.unicode_minus"] = False  # 正常显示负号
 
-# ---------- 数据加载 ----------
-path = "/data/qy/homework/2/10G_data_new/*.parquet"
-files = sorted(glob.glob(path))[:2]
-df = pd.concat([pq.read_table(f).to_pandas() for f in files], ignore_index=True)
-print(f"读取数据中... 共 {len(df)} 条记录")
-
-# ---------- 提取支付方式和商品类别 ----------
-def extract_category_payment(purchase_json):
-    try:
-        data = json.loads(purchase_json)
-        cat = data.get("categories", None)
-        pay = data.get("payment_method", None)
-        return (cat, pay, data.get("avg_price", 0))
-    except:
-        return (None, None, 0)
-
-extracted = df['purchase_history'].apply(extract_category_payment)
-df_extracted = pd.DataFrame(extracted.tolist(), columns=["category", "payment_method", "price"])
-df_extracted.dropna(subset=["category", "payment_method"], inplace=True)
-
-# ---------- 一、挖掘支付方式与商品类别之间的关联规则 ----------
-# 为每条记录构建事务：将支付方式与类别视为“共现项”
-transactions = df_extracted.apply(lambda row: [f"PAY_{row['payment_method']}", f"CAT_{row['category']}"], axis=1)
-
-# 转换为布尔矩阵
-te = TransactionEncoder()
-te_ary = te.fit_transform(transactions.tolist())
-df_encoded = pd.DataFrame(te_ary, columns=te.columns_)
-
-# 挖掘频繁项集
-freq_items = apriori(df_encoded, min_support=0.01, use_colnames=True)
-rules = association_rules(freq_items, metric="confidence", min_threshold=0.6)
-
-# 仅保留“支付方式 → 类别”方向的规则
-rules_filtered = rules[
-    rules['antecedents'].apply(lambda x: any(i.startswith('PAY_') for i in x)) &
-    rules['consequents'].apply(lambda x: any(i.startswith('CAT_') for i in x))
-]
-
-print(f"\n✅ 挖掘出 {len(rules_filtered)} 条支付方式与类别之间的有效关联规则（支持度≥0.01，置信度≥0.6）")
-print(rules_filtered[["antecedents", "consequents", "support", "confidence", "lift"]].head())
-
-# ---------- 二、高价值商品的首选支付方式 ----------
-high_value = df_extracted[df_extracted["price"] > 5000]
-method_counts = high_value["payment_method"].value_counts(normalize=True)
-
-print("\n💰 高价值商品（价格 > 5000）首选支付方式占比:")
-print(method_counts)
-
-# 可视化高价值商品支付方式分布
-method_counts.plot(kind='bar', color='skyblue')
-plt.title("高价值商品的支付方式分布")
-plt.xlabel("支付方式")
-plt.ylabel("占比")
-plt.tight_layout()
-plt.savefig("high_value_payment_method.png")
-plt.show()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="任务目标2：支付方式与商品类别的关联分析")
+    parser.add_argument("--min-support", type=float, default=0.01)
+    parser.add_argument("--min-confidence", type=float, default=0.6)
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认使用全部 CPU 核")
+    parser.add_argument("--cleaned", action="store_true", help="读取 hw1/2-1.py 写出的清洗后数据集（内存映射），不再重复解码与清洗")
+    args = parser.parse_args()
+
+    # ---------- 数据加载：支付方式 × 类别 列联表（按 part 文件分区统计，分区清单中保存各分区的计数矩阵） ----------
+    # 每条记录只有一个支付方式和一个类别，(PAY_x, CAT_y) 两项事务的项集支持度就是列联表的单元格频率，
+    # 因此直接由整数编码的计数矩阵得到全部规则，可以覆盖全部 part 文件
+    files = resolve_files(list_files(dataset_pattern("10G")), cleaned=args.cleaned)
+    table, updated = PartitionManifest.for_files(files).update(files, "payment_category", workers=args.workers)
+    print(f"读取数据中... 共 {table.n} 条记录（本次统计 {updated} 个 part 文件，复用 {len(files) - updated} 个）")
+
+    # ---------- 一、支付方式与商品类别之间的关联规则 ----------
+    rules_filtered = table.rules(min_support=args.min_support, min_confidence=args.min_confidence,
+                                 row_prefix="PAY_", col_prefix="CAT_")
+    RuleStore.from_rules(rules_filtered).save("payment_category_rule_store")
+
+    print(f"\n✅ 挖掘出 {len(rules_filtered)} 条支付方式与类别之间的有效关联规则（支持度≥{args.min_support}，置信度≥{args.min_confidence}）")
+    print(rules_filtered[["antecedents", "consequents", "support", "confidence", "lift"]].head())
+
+    # ---------- 二、高价值商品的首选支付方式（与列联表同一遍统计） ----------
+    method_counts = table.flagged_shares()
+
+    print("\n💰 高价值商品（价格 > 5000）首选支付方式占比:")
+    print(method_counts)
+
+    # 可视化高价值商品支付方式分布
+    method_counts.plot(kind='bar', color='skyblue')
+    plt.title("高价值商品的支付方式分布")
+    plt.xlabel("支付方式")
+    plt.ylabel("占比")
+    plt.tight_layout()
+    plt.savefig("high_value_payment_method.png")
+    plt.show()
@@ -1,101 +1,104 @@
-import pandas as pd
-import pyarrow.parquet as pq
-import glob
-import json
+import argparse
+import os
+import sys
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.cleaned import resolve_files
+from common.cube import TimeCategoryCube, default_cube_path
+from common.loader import dataset_pattern, list_files
+from common.sequences import EventBuckets, distinct_buyers, mine_sequential_patterns, sequential_pair_counts
+from common.transactions import purchase_events
+
 plt.rcParams["font.sans-serif"] = ["SimHei"]  # 设置字体
 plt.rcParams["axes.unicode_minus"] = False  # 正常显示负号
-# ---------- 数据加载 ----------
-path = "/data/qy/homework/2/10G_data_new/*.parquet"
-files = sorted(glob.glob(path))
-df = pd.concat([pq.read_table(f).to_pandas() for f in files], ignore_index=True)
-print(f"加载 {len(df)} 条数据")
-
-# ---------- 提取类别和购买时间 ----------
-def extract_date_category(purchase_json):
-    try:
-        data = json.loads(purchase_json)
-        return pd.Series({
-            'category': data.get("categories", None),
-            'purchase_date': data.get("purchase_date", None),
-            'user_id': data.get("user_id", None)  # 如果有用户ID的话
-        })
-    except:
-        return pd.Series({'category': None, 'purchase_date': None, 'user_id': None})
-
-extracted = df['purchase_history'].apply(extract_date_category)
-extracted.dropna(subset=['category', 'purchase_date'], inplace=True)
-extracted['purchase_date'] = pd.to_datetime(extracted['purchase_date'], errors='coerce')
-extracted.dropna(subset=['purchase_date'], inplace=True)
 
-# ---------- 衍生时间字段 ----------
-extracted['year'] = extracted['purchase_date'].dt.year
-extracted['month'] = extracted['purchase_date'].dt.month
-extracted['quarter'] = extracted['purchase_date'].dt.quarter
-extracted['weekday'] = extracted['purchase_date'].dt.dayofweek  # 0=Monday
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="任务目标3：时间序列模式")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认使用全部 CPU 核")
+    parser.add_argument("--min-seq-support", type=float, default=0.01, help="顺序模式的最小支持度（用户比例）")
+    parser.add_argument("--max-seq-len", type=int, default=3, help="顺序模式的最大长度")
+    parser.add_argument("--max-gap", type=float, default=None, help="顺序模式中相邻两次购买的最大间隔（天）")
+    parser.add_argument("--cleaned", action="store_true", help="读取 hw1/2-1.py 写出的清洗后数据集（内存映射），不再重复解码与清洗")
+    parser.add_argument("--sketch", action="store_true",
+                        help="近似模式：购买对计数用 SpaceSaving，各月各类别的不同用户数用 HyperLogLog（内存固定，输出附误差）")
+    parser.add_argument("--sketch-capacity", type=int, default=1000, help="SpaceSaving 的计数器个数")
+    parser.add_argument("--hll-precision", type=int, default=14, help="HyperLogLog 的精度 p（2**p 个寄存器）")
+    args = parser.parse_args()
 
-# ---------- 一、季节性模式（季度/月/星期） ----------
-# 按月份统计所有类别的购买数量
-monthly_count = extracted.groupby(['month', 'category']).size().unstack().fillna(0)
-monthly_count.plot(kind='line', figsize=(12, 6), title='各商品类别的月度购买量')
-plt.xlabel("月份")
-plt.ylabel("购买次数")
-plt.tight_layout()
-plt.savefig("monthly_category_trend.png")
-plt.show()
+    # ---------- 数据加载 ----------
+    path = dataset_pattern("10G")
+    files = resolve_files(list_files(path), cleaned=args.cleaned)
 
-# 按季度统计
-quarterly_count = extracted.groupby(['quarter', 'category']).size().unstack().fillna(0)
-quarterly_count.plot(kind='bar', stacked=True, figsize=(12, 6), title='季度商品类别分布')
-plt.xlabel("季度")
-plt.ylabel("购买次数")
-plt.tight_layout()
-plt.savefig("quarterly_category_trend.png")
-plt.show()
+    # ---------- 时间 × 类别聚合立方体（只聚合新增或变化的 part 文件） ----------
+    cube_path = default_cube_path(files)
+    cube = TimeCategoryCube.load(cube_path)
+    updated = cube.update(files, workers=args.workers)
+    cube.save(cube_path)
+    print(f"聚合立方体：{int(cube.cells['count'].sum())} 条购买记录，本次更新 {updated} 个 part 文件")
 
-# 按星期统计
-weekday_count = extracted.groupby(['weekday', 'category']).size().unstack().fillna(0)
-weekday_count.plot(kind='line', figsize=(12, 6), title='每周商品购买分布')
-plt.xlabel("星期（0=周一）")
-plt.ylabel("购买次数")
-plt.tight_layout()
-plt.savefig("weekday_category_trend.png")
-plt.show()
-
-# ---------- 二、探索先后购买模式 ----------
-# 为了做序列模式，需按用户 + 时间排序
-if 'id' in df.columns:
-    extracted['user_id'] = df['id']
+    # ---------- 一、季节性模式（季度/月/星期，均由立方体上卷得到） ----------
+    # 按月份统计所有类别的购买数量
+    monthly_count = cube.rollup(['month', 'category'])
+    monthly_count.plot(kind='line', figsize=(12, 6), title='各商品类别的月度购买量')
+    plt.xlabel("月份")
+    plt.ylabel("购买次数")
+    plt.tight_layout()
+    plt.savefig("monthly_category_trend.png")
+    plt.show()
 
-extracted = extracted.dropna(subset=['user_id'])
-extracted.sort_values(by=['user_id', 'purchase_date'], inplace=True)
+    # 按季度统计
+    quarterly_count = cube.rollup(['quarter', 'category'])
+    quarterly_count.plot(kind='bar', stacked=True, figsize=(12, 6), title='季度商品类别分布')
+    plt.xlabel("季度")
+    plt.ylabel("购买次数")
+    plt.tight_layout()
+    plt.savefig("quarterly_category_trend.png")
+    plt.show()
 
-# 构建“前后购买对”
-sequential_pairs = []
-grouped = extracted.groupby("user_id")["category"].apply(list)
+    # 按星期统计
+    weekday_count = cube.rollup(['weekday', 'category'])
+    weekday_count.plot(kind='line', figsize=(12, 6), title='每周商品购买分布')
+    plt.xlabel("星期（0=周一）")
+    plt.ylabel("购买次数")
+    plt.tight_layout()
+    plt.savefig("weekday_category_trend.png")
+    plt.show()
 
-for cat_list in grouped:
-    for i in range(len(cat_list) - 1):
-        pair = (cat_list[i], cat_list[i + 1])
-        sequential_pairs.append(pair)
+    # ---------- 二、探索先后购买模式 ----------
+    # 按 user_id 哈希分桶并行：每个 part 只读取、解析一次并把事件分散到各桶，各月各类别的不同购买用户数、
+    # 相邻购买对与顺序模式的各遍都复用这些桶；同一用户的全部购买事件在一个桶内按时间排序，相邻购买对向量化计数
+    with EventBuckets.scatter(files, purchase_events, workers=args.workers) as buckets:
+        # 各月各类别的不同购买用户数（近似模式下为 HyperLogLog 估计）
+        buyers = distinct_buyers(files, purchase_events, p=args.hll_precision if args.sketch else None,
+                                 workers=args.workers, buckets=buckets)
+        pair_df = sequential_pair_counts(files, purchase_events, workers=args.workers,
+                                         sketch=args.sketch_capacity if args.sketch else None, buckets=buckets)
+        # 更长的顺序模式（PrefixSpan），支持度为包含该模式的用户比例
+        patterns = mine_sequential_patterns(files, purchase_events, min_support=args.min_seq_support,
+                                            max_len=args.max_seq_len, max_gap=args.max_gap, workers=args.workers,
+                                            buckets=buckets)
+    buyers.to_csv("monthly_category_buyers.csv")
+    if args.sketch:
+        print(f"各月各类别的不同购买用户数为 HyperLogLog 估计，相对标准误差约 {1.04 / 2 ** (args.hll_precision / 2):.2%}")
+        print(f"购买对计数为 SpaceSaving 估计值，最大高估量 {int(pair_df['error'].max() if len(pair_df) else 0)}")
+    top_pairs = pair_df[pair_df['count'] >= 20]  # 筛选出现较多的
 
-# 统计购买顺序的频率
-pair_df = pd.DataFrame(sequential_pairs, columns=['from_category', 'to_category'])
-top_pairs = pair_df.value_counts().reset_index(name='count')
-top_pairs = top_pairs[top_pairs['count'] >= 20]  # 筛选出现较多的
+    patterns.to_csv("sequential_patterns.csv", index=False)
+    print(f"共发现 {len(patterns)} 个频繁顺序模式，长度 ≥ 2 的前 10 个：")
+    print(patterns[patterns['length'] >= 2].sort_values('count', ascending=False).head(10))
 
-# 可视化：热力图
-pivot = top_pairs.pivot(index='from_category', columns='to_category', values='count').fillna(0)
-if pivot.empty:
-    print("⚠️ 没有足够的先后购买对满足频率条件，跳过热力图绘制。")
-else:
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(pivot, annot=True, fmt='.0f', cmap='YlGnBu')
-    plt.title("🧭 类别间购买顺序频率（前→后）")
-    plt.xlabel("后买")
-    plt.ylabel("先买")
-    plt.tight_layout()
-    plt.savefig("sequential_category_heatmap.png")
-    plt.show()
+    # 可视化：热力图
+    pivot = top_pairs.pivot(index='from_category', columns='to_category', values='count').fillna(0)
+    if pivot.empty:
+        print("⚠️ 没有足够的先后购买对满足频率条件，跳过热力图绘制。")
+    else:
+        plt.figure(figsize=(10, 8))
+        sns.heatmap(pivot, annot=True, fmt='.0f', cmap='YlGnBu')
+        plt.title("🧭 类别间购买顺序频率（前→后）")
+        plt.xlabel("后买")
+        plt.ylabel("先买")
+        plt.tight_layout()
+        plt.savefig("sequential_category_heatmap.png")
+        plt.show()
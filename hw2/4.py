@@ -1,57 +1,72 @@
-import pandas as pd
-import json
-from mlxtend.preprocessing import TransactionEncoder
-from mlxtend.frequent_patterns import apriori, association_rules
+import argparse
+import numpy as np
+import pyarrow.parquet as pq
+import os
+import sys
 import matplotlib.pyplot as plt
 
-# ---------- 读取数据 ----------
-df = pd.read_parquet("/data/qy/homework/2/30G_data_new/part-00000.parquet")
-print("数据加载完成，共 {} 条记录".format(len(df)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.itemset_cache import DEFAULT_FLOOR, ItemsetCache, rules_from_frequent
+from common.itemsets import mine_frequent_itemsets
+from common.loader import dataset_pattern, list_files
+from common.sampling import format_interval, sample_table
+from common.transactions import REFUND_COLUMNS, refund_rows, refund_transactions_from
 
-# ---------- 提取退款记录中的商品类别 ----------
-def extract_refunded_categories(ph_json):
-    try:
-        items = json.loads(ph_json).get('items', [])
-        status = json.loads(ph_json).get('payment_status', '').strip()
-        if status in ['已退款', '部分退款']:
-            return list(set([item.get('categories') for item in items if item.get('categories')]))
-        else:
-            return None
-    except:
-        return None
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="任务目标4：退款相关的商品类别关联规则")
+    parser.add_argument("--min-support", type=float, default=0.005)
+    parser.add_argument("--min-confidence", type=float, default=0.4)
+    parser.add_argument("--min-lift", type=float, default=None)
+    parser.add_argument("--floor", type=float, default=DEFAULT_FLOOR, help="缓存频繁项集时使用的最低支持度")
+    parser.add_argument("--sample", type=int, default=None, metavar="N",
+                        help="从全部 part 文件中一遍扫描抽取 N 行样本（默认只读取 part-00000），并给出退款率与支持度的置信区间")
+    parser.add_argument("--strata", default=None, help="分层抽样的列（如 country、is_active），默认均匀抽样")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
 
-df['refund_categories'] = df['purchase_history'].apply(extract_refunded_categories)
-refund_df = df[df['refund_categories'].notnull()].copy()
-transactions = refund_df['refund_categories'].tolist()
+    if args.sample:
+        # ---------- 抽样：全部 part 文件上的均匀/分层样本，在样本上挖掘并给出置信区间 ----------
+        sample = sample_table(list_files(dataset_pattern("30G")), args.sample, parsed_columns=REFUND_COLUMNS,
+                              strata=args.strata, seed=args.seed)
+        print(f"抽样 {len(sample):,} 行（总体 {sample.total:,} 行，{len(sample.labels)} 层）")
+        rows = refund_rows(sample.table)
+        bitmaps = refund_transactions_from(sample.table)
+        is_refund = np.zeros(len(sample), dtype=bool)
+        is_refund[rows] = True
+        print("💸 涉及退款的交易数：", bitmaps.n_transactions)
+        print("总体退款交易数估计：" + format_interval(*sample.count(is_refund), digits=0))
+        print("退款率估计：" + format_interval(*sample.proportion(is_refund)))
+        freq_items = sample.supports(mine_frequent_itemsets(bitmaps, min_support=args.min_support), bitmaps, rows)
+        print("✅ 找到频繁项集数：", len(freq_items))
+        print(freq_items.sort_values("support", ascending=False).head(10))
+    else:
+        # ---------- 读取数据 ----------
+        path = dataset_pattern("30G", "part-00000.parquet")
+        print("数据加载完成，共 {} 条记录".format(pq.ParquetFile(path).metadata.num_rows))
 
-print("💸 涉及退款的交易数：", len(transactions))
+        # ---------- 挖掘频繁项集（退款记录中的商品类别为一条交易，以 floor 剪枝挖掘（SON/Eclat）的结果按数据指纹缓存） ----------
+        freq_items, n, hit = ItemsetCache.for_files([path]).frequent([path], "refund_itemsets", args.min_support, floor=args.floor)
+        print("💸 涉及退款的交易数：", n)
+        print("✅ 找到频繁项集数：", len(freq_items))
+        if hit:
+            print("（复用已缓存的频繁项集，只按阈值重新筛选与生成规则）")
 
-# ---------- 转换为 one-hot 编码 ----------
-te = TransactionEncoder()
-te_ary = te.fit(transactions).transform(transactions)
-df_trans = pd.DataFrame(te_ary, columns=te.columns_)
+    # ---------- 计算关联规则 ----------
+    rules = rules_from_frequent(freq_items, args.min_confidence, min_lift=args.min_lift)
 
-# ---------- Apriori 挖掘频繁项集 ----------
-freq_items = apriori(df_trans, min_support=0.005, use_colnames=True)
-print("✅ 找到频繁项集数：", len(freq_items))
+    if len(rules) == 0:
+        print("⚠️ 没有满足置信度和支持度条件的退款相关规则。")
+    else:
+        print("📌 满足条件的规则如下（前 10 条）：")
+        print(rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']].head(10))
 
-# ---------- 计算关联规则 ----------
-rules = association_rules(freq_items, metric='confidence', min_threshold=0.4)
-rules = rules.sort_values(by='lift', ascending=False)
-
-if len(rules) == 0:
-    print("⚠️ 没有满足置信度和支持度条件的退款相关规则。")
-else:
-    print("📌 满足条件的规则如下（前 10 条）：")
-    print(rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']].head(10))
-
-    # ---------- 可视化 ----------
-    plt.figure(figsize=(8, 5))
-    rules['support'].plot(kind='hist', bins=20, color='coral', edgecolor='black')
-    plt.title("退款相关规则的支持度分布")
-    plt.xlabel("Support")
-    plt.ylabel("规则数量")
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("refund_rule_support_distribution.png")
-    plt.show()
+        # ---------- 可视化 ----------
+        plt.figure(figsize=(8, 5))
+        rules['support'].plot(kind='hist', bins=20, color='coral', edgecolor='black')
+        plt.title("退款相关规则的支持度分布")
+        plt.xlabel("Support")
+        plt.ylabel("规则数量")
+        plt.grid(True)
+        plt.tight_layout()
+        plt.savefig("refund_rule_support_distribution.png")
+        plt.show()
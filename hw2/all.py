@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.cleaned import resolve_files
+from common.itemsets import association_rules
+from common.loader import DEFAULT_BATCH_SIZE, dataset_pattern, list_files
+from common.pipeline import CategoryTransactions, PaymentCategoryPairs, RefundItemsets, SeasonalityCounts, run_pipeline
+
+# 单遍扫描同时完成任务目标 1、2、4 与季节性统计：每个 part 文件的解析列只读取一次，
+# 按批次依次交给各分析算子，合并后各自给出结果（与分别运行 1.py、2.py、3.py、4.py 的对应部分一致）
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="任务目标1、2、4与季节性统计：单遍扫描")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认使用全部 CPU 核")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--cleaned", action="store_true", help="读取 hw1/2-1.py 写出的清洗后数据集（内存映射），不再重复解码与清洗")
+    args = parser.parse_args()
+
+    files = resolve_files(list_files(dataset_pattern("10G")), cleaned=args.cleaned)
+    results = run_pipeline(files, {
+        "category": CategoryTransactions(min_support=0.02),
+        "refund": RefundItemsets(min_support=0.005),
+        "payment": PaymentCategoryPairs(),
+        "seasonality": SeasonalityCounts(),
+    }, batch_size=args.batch_size, workers=args.workers)
+    print(f"单遍扫描 {len(files)} 个 part 文件完成")
+
+    # ---------- 任务目标1：商品类别关联规则 ----------
+    frequent, n = results["category"]
+    rules = association_rules(frequent, metric="confidence", min_threshold=0.5).sort_values(by="lift", ascending=False)
+    print(f"\n[类别] {n} 条交易，{len(frequent)} 个频繁项集，{len(rules)} 条关联规则")
+    rules.to_csv("association_rules.csv", index=False)
+
+    # ---------- 任务目标2：支付方式与商品类别 ----------
+    table = results["payment"]
+    payment_rules = table.rules(min_support=0.01, min_confidence=0.6, row_prefix="PAY_", col_prefix="CAT_")
+    print(f"\n[支付] {table.n} 条记录，{len(payment_rules)} 条支付方式 → 类别规则")
+    print("高价值商品（价格 > 5000）支付方式占比:")
+    print(table.flagged_shares())
+
+    # ---------- 任务目标4：退款相关规则 ----------
+    refund_frequent, refund_n = results["refund"]
+    refund_rules = association_rules(refund_frequent, metric="confidence", min_threshold=0.4).sort_values(by="lift", ascending=False)
+    print(f"\n[退款] {refund_n} 条退款交易，{len(refund_frequent)} 个频繁项集，{len(refund_rules)} 条关联规则")
+    refund_rules.to_csv("refund_rules.csv", index=False)
+
+    # ---------- 季节性：按季度上卷 ----------
+    cube = results["seasonality"]
+    print(f"\n[季节性] {int(cube.cells['count'].sum())} 条购买记录，各季度购买次数：")
+    print(cube.rollup(["quarter", "category"]))
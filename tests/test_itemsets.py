@@ -0,0 +1,78 @@
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.itemset_cache import ITEMSET_KINDS, ItemsetCache
+from common.itemsets import mine_frequent_itemsets, transaction_counts
+from common.json_cache import CACHE_DIR_ENV
+from common.manifest import ITEMSET_FLOOR, PartitionManifest
+from common.pipeline import CategoryTransactions, RefundItemsets, run_pipeline
+from common.synth import write_dataset
+
+# 频繁项集的各条路径（分区清单 + SON 补数、低于清单 floor 的两阶段 SON、单遍流水线的加权 Eclat）
+# 都须与把全部交易放在一起直接挖掘的结果一致。
+
+
+@pytest.fixture(scope="module")
+def files(tmp_path_factory):
+    mp = pytest.MonkeyPatch()
+    mp.delenv(CACHE_DIR_ENV, raising=False)  # 分区清单与缓存写在临时数据目录下
+    yield write_dataset(str(tmp_path_factory.mktemp("synth")), files=3, rows=2000, seed=11)
+    mp.undo()
+
+
+def _expected(files, kind, min_support, max_len=None):
+    # 全部分区的交易展开为一个列表后直接挖掘
+    counts, n = Counter(), 0
+    for path in files:
+        part, n_part = transaction_counts(ITEMSET_KINDS[kind](path))
+        counts.update(part)
+        n += n_part
+    transactions = [list(t) for t, c in counts.items() for _ in range(c)]
+    frequent = mine_frequent_itemsets(transactions, min_support=min_support, max_len=max_len)
+    return dict(zip(frequent["itemsets"], frequent["support"])), n
+
+
+def _as_dict(frequent):
+    return dict(zip(frequent["itemsets"], frequent["support"]))
+
+
+@pytest.mark.parametrize("kind", sorted(ITEMSET_KINDS))
+@pytest.mark.parametrize("floor, max_len", [(ITEMSET_FLOOR, None), (ITEMSET_FLOOR * 2, 2), (ITEMSET_FLOOR / 5, None)])
+def test_cache_matches_full_mining(files, kind, floor, max_len):
+    frequent, n, hit = ItemsetCache.for_files(files).frequent(files, kind, floor, floor=floor, max_len=max_len, workers=1)
+    expected, expected_n = _expected(files, kind, floor, max_len)
+    assert not hit and n == expected_n
+    assert _as_dict(frequent) == pytest.approx(expected)
+
+
+def test_manifest_mines_only_new_parts(tmp_path):
+    files = write_dataset(str(tmp_path), files=3, rows=500, seed=5)
+    manifest = PartitionManifest.for_files(files)
+    manifest.partials(files[:2], "refund_itemsets", workers=1)
+    _, updated = manifest.partials(files, "refund_itemsets", workers=1)
+    assert updated == 1
+    with pytest.raises(ValueError):
+        manifest.update(files, "refund_itemsets")
+
+
+def test_low_floor_skips_manifest(tmp_path):
+    # floor 低于 ITEMSET_FLOOR 时清单中的局部结果用不上，也不应为了交易数去计算它们
+    files = write_dataset(str(tmp_path), files=2, rows=500, seed=5)
+    _, n, _ = ItemsetCache.for_files(files).frequent(files, "refund_itemsets", 0.001, floor=0.001, workers=1)
+    assert n == _expected(files, "refund_itemsets", 0.001)[1]
+    assert PartitionManifest.for_files(files).stale(files, "refund_itemsets") == files
+
+
+def test_pipeline_matches_full_mining(files):
+    results = run_pipeline(files, {"category": CategoryTransactions(min_support=0.02),
+                                   "refund": RefundItemsets(min_support=0.005, max_len=2)}, workers=1)
+    for name, kind, min_support, max_len in (("category", "category_itemsets", 0.02, None),
+                                             ("refund", "refund_itemsets", 0.005, 2)):
+        frequent, n = results[name]
+        expected, expected_n = _expected(files, kind, min_support, max_len)
+        assert n == expected_n
+        assert _as_dict(frequent) == pytest.approx(expected)
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pyarrow as pa
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import common.json_extract as json_extract
+from common.json_cache import LOGIN_FIELDS, PURCHASE_FIELDS
+from common.json_extract import extract_fields
+from common.synth import generate_partition
+
+# 批量抽取须与原脚本逐行 json.loads + data.get 的结果一致：不是 JSON 对象的行所有字段取默认值，
+# 单个字段类型不符时只有该字段取默认值。
+
+
+def _row(column, fields, text):
+    # 夹在正常行之间，走 Arrow 整块解析失败后的定位与逐行路径
+    good = column[0]
+    table = extract_fields(pa.array([good] * 200 + [text] + [good] * 200), fields, valid_name="valid")
+    return table.slice(200, 1).to_pylist()[0]
+
+
+PURCHASE = '{"avg_price": 12.5, "categories": "书籍", "items": [{"id": 1, "categories": "玩具"}], "payment_status": "已支付"}'
+LOGIN = '{"login_count": 2, "timestamps": ["2024-01-02T03:04:05", "2024-02-03T04:05:06"]}'
+
+
+def test_type_mismatch_only_defaults_that_field():
+    row = _row([PURCHASE], PURCHASE_FIELDS, '{"avg_price": "abc", "categories": "书籍", "items": [{}, {}]}')
+    assert row["valid"] and row["avg_price"] is None and row["categories"] == "书籍" and row["item_count"] == 2
+
+    row = _row([PURCHASE], PURCHASE_FIELDS, '{"avg_price": 3, "categories": ["书籍", "玩具"], "payment_status": "已退款"}')
+    assert row["valid"] and row["categories"] is None and row["avg_price"] == 3.0 and row["payment_status"] == "已退款"
+    assert row["category_list"] == ["书籍", "玩具"]
+
+    row = _row([LOGIN], LOGIN_FIELDS, '{"login_count": 3.0, "timestamps": ["2024-01-02T03:04:05"]}')
+    assert row["valid"] and row["login_count"] == 3 and row["login_timestamps"] == ["2024-01-02T03:04:05"]
+
+    row = _row([LOGIN], LOGIN_FIELDS, '{"login_count": 4, "timestamps": [1, 2]}')
+    assert row["valid"] and row["login_count"] == 4 and row["login_timestamps"] == [None, None]
+
+
+@pytest.mark.parametrize("text", ["", "N/A", "{", '{"avg_price": }', "[1, 2, 3]", "null", '{"a": 1} {"a": 2}'])
+def test_malformed_row_uses_defaults(text):
+    row = _row([PURCHASE], PURCHASE_FIELDS, text)
+    assert not row["valid"] and row["avg_price"] is None and row["item_count"] == 0
+
+
+@pytest.mark.parametrize("column, fields", [("purchase_history", PURCHASE_FIELDS), ("login_history", LOGIN_FIELDS)])
+def test_batched_matches_row_by_row(monkeypatch, column, fields):
+    values = generate_partition(5000, seed=2, malformed_rate=0.05).column(column)
+    batched = extract_fields(values, fields, batch_size=2048, valid_name="valid")
+    monkeypatch.setattr(json_extract, "_FALLBACK_ROWS", len(values))  # 全部逐行解析
+    rows = extract_fields(values, fields, batch_size=len(values), valid_name="valid")
+    assert batched.to_pylist() == rows.to_pylist()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import profiling
+from common.itemsets import TransactionBitmaps, association_rules, mine_frequent_itemsets
+
+# @timed 阶段记录的是输入行数：挖掘与规则生成的输出大小与输入无关，不能当作处理行数。
+
+
+def test_timed_records_input_rows(monkeypatch):
+    monkeypatch.delenv(profiling.PROFILE_ENV, raising=False)
+    profiling.reset()
+    transactions = [["a", "b"], ["a", "b", "c"], ["a"], ["b", "c"]] * 5
+    frequent = mine_frequent_itemsets(transactions, min_support=0.5)
+    association_rules(frequent, min_threshold=0.1)
+    mine_frequent_itemsets(TransactionBitmaps.from_counts({("a", "b"): 7, ("c",): 3}), min_support=0.5)
+    rows = [(r["stage"], r["rows"]) for r in profiling.RECORDS]
+    assert rows == [("itemsets", 20), ("association_rules", len(frequent)), ("itemsets", 10)]
+    profiling.reset()
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.cleaning import fill_values, merge_stats, partition_stats
+from common.loader import load_df
+from common.parallel import map_reduce
+from common.quantiles import exact_quantiles, rescan_until_resolved
+from common.synth import write_dataset
+
+# 两遍精确分位数须与 pandas 的 quantile/median 一致；窗口放宽到覆盖全部取值仍无法求解时报错，而不是返回空值。
+
+
+def test_exact_quantiles_match_pandas():
+    rng = np.random.default_rng(3)
+    values = np.concatenate([rng.normal(size=5000), np.full(3000, 0.25), rng.exponential(size=2000)])
+    batches = np.array_split(values, 7)
+    qs = [0, 0.1, 0.5, 0.77, 1]
+    assert exact_quantiles(lambda: iter(batches), qs).tolist() == pytest.approx(pd.Series(values).quantile(qs).tolist())
+    assert np.isnan(exact_quantiles(lambda: iter([]), [0.5])).all()
+
+
+def test_rescan_raises_when_unresolved():
+    slacks = []
+    with pytest.raises(RuntimeError):
+        rescan_until_resolved(lambda slack: slacks.append(slack) or [1.0, None], rank_error=0.01)
+    assert slacks == [2.0, 8.0, 32.0, 128.0]
+
+
+def test_exact_fill_values_match_pandas(tmp_path):
+    files = write_dataset(str(tmp_path), files=2, rows=1000, seed=4)
+    fill = fill_values(map_reduce(partition_stats, files, merge_stats, workers=1), files, exact=True, workers=1)
+    df = load_df(files, columns=["age", "income"])
+    abnormal = (df["age"] < 0) | (df["age"] > 100)
+    assert fill["age"] == pytest.approx(df["age"].median())
+    assert fill["income"] == pytest.approx(df["income"].median())
+    assert fill["age_abnormal"] == pytest.approx(df["age"].fillna(df["age"].median())[~abnormal].median())
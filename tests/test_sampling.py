@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.json_cache import CACHE_DIR_ENV, load_parsed_files
+from common.loader import load_table
+from common.sampling import sample_table
+from common.synth import write_dataset
+
+# 分层样本须是各层随机键最小的行：与把全部行和随机键放在一起直接挑选的结果一致，原始列与解析列逐行对齐。
+
+
+@pytest.fixture(scope="module")
+def files(tmp_path_factory):
+    mp = pytest.MonkeyPatch()
+    mp.delenv(CACHE_DIR_ENV, raising=False)  # 解析缓存写在临时数据目录下
+    yield write_dataset(str(tmp_path_factory.mktemp("synth")), files=3, rows=1500, seed=3)
+    mp.undo()
+
+
+@pytest.mark.parametrize("strata", [None, "country"])
+def test_sample_matches_full_selection(files, strata):
+    size, batch_size, seed = 300, 400, 5
+    sample = sample_table(files, size, columns=["id"], parsed_columns=["categories"], strata=strata, seed=seed,
+                          batch_size=batch_size)
+
+    # 全量：逐文件、逐批次生成同样的随机键，各层按比例取键最小的行
+    full = load_table(files, columns=["id"] + ([strata] if strata else [])).to_pandas()
+    categories = load_parsed_files(files, columns=["categories"]).column("categories").to_pylist()
+    rng = np.random.default_rng(seed)
+    sizes = [len(load_table([f], columns=["id"])) for f in files]
+    full["key"] = np.concatenate([rng.random(min(batch_size, n - s)) for n in sizes for s in range(0, n, batch_size)])
+    full["label"] = full[strata].astype(object).where(full[strata].notna(), "缺失").astype(str) if strata else "全部"
+    expected = []
+    for h, label in enumerate(sample.labels):
+        group = full[full["label"] == label]
+        n_h = max(round(size * len(group) / len(full)), 1)
+        assert sample.population[h] == len(group)
+        expected.append(group.nsmallest(n_h, "key").sort_index())
+    expected = pd.concat(expected)
+
+    assert sample.table.column("id").to_pylist() == expected["id"].tolist()
+    assert sample.table.column("categories").to_pylist() == [categories[i] for i in expected.index]
+    assert [sample.labels[h] for h in sample.strata] == expected["label"].tolist()
@@ -0,0 +1,93 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.backends import CPUBackend, get_backend
+from common.json_cache import CACHE_DIR_ENV
+from common.scoring import load_config, partition_features, run_scoring, score_frame
+from common.synth import write_dataset
+
+# 评分流水线在没有 GPU 的机器上以 CPU 后端运行：分层边界与各层人数须与全量 pd.qcut 一致；
+# 未安装 cudf 时 cuDF 相关用例跳过，auto 回退到 CPU。
+
+TODAY = "2025-01-01"
+
+try:
+    import cudf  # noqa: F401
+    HAS_CUDF = True
+except ImportError:
+    HAS_CUDF = False
+
+
+@pytest.fixture(scope="module")
+def files(tmp_path_factory):
+    mp = pytest.MonkeyPatch()
+    mp.delenv(CACHE_DIR_ENV, raising=False)  # 解析缓存写在临时数据目录下
+    yield write_dataset(str(tmp_path_factory.mktemp("synth")), files=3, rows=2000, seed=7)
+    mp.undo()
+
+
+def _expected_segments(files, ranges, config):
+    # 用同一套特征与归一化参数在内存中算出全量得分，再由 pd.qcut 分层
+    backend = CPUBackend()
+    frames = []
+    for path in files:
+        frame = partition_features(path, TODAY, config, backend)
+        frames.append(pd.DataFrame({"id": frame["id"], "score": score_frame(frame, ranges, config["weights"], backend)}))
+    scores = pd.concat(frames, ignore_index=True)
+    segment, edges = pd.qcut(scores["score"], len(config["segments"]), labels=config["segments"], retbins=True)
+    return scores.assign(value_segment=segment.astype(str)), edges
+
+
+def _written_segments(output_dir):
+    table = pq.read_table(output_dir, columns=["id", "value_segment"]).to_pandas()
+    return table.assign(value_segment=table["value_segment"].astype(str))
+
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_cpu_scoring_matches_qcut(files, tmp_path, exact):
+    config = load_config()
+    output_dir = str(tmp_path / "segments")
+    result = run_scoring(files, output_dir, config=config, exact=exact, workers=1, today=TODAY, backend="cpu")
+    expected, edges = _expected_segments(files, result["ranges"], config)
+
+    counts = expected["value_segment"].value_counts().to_dict()
+    assert sum(result["segment_counts"].values()) == len(expected)
+    if exact:
+        np.testing.assert_allclose(result["edges"], edges)
+        assert dict(result["segment_counts"]) == counts
+        written = _written_segments(output_dir).merge(expected, on="id", suffixes=("", "_qcut"))
+        assert len(written) == len(expected)
+        assert (written["value_segment"] == written["value_segment_qcut"]).all()
+    else:
+        # sketch 边界的秩误差约 1.65 / k，各层人数与 qcut 相差不超过该比例
+        tolerance = 2 * 1.65 / 200 * len(expected)
+        for label in config["segments"]:
+            assert abs(result["segment_counts"].get(label, 0) - counts[label]) <= tolerance
+
+
+def test_wrong_timestamp_format_fails_loudly(files):
+    config = load_config()
+    config["timestamp_format"] = "%Y/%m/%d"
+    with pytest.raises(ValueError, match="login_timestamps"):
+        partition_features(files[0], TODAY, config, CPUBackend())
+
+
+@pytest.mark.skipif(HAS_CUDF, reason="已安装 cudf")
+def test_cudf_backend_unavailable_without_cudf():
+    with pytest.raises(ImportError):
+        get_backend("cudf")
+    assert get_backend("auto").name == "cpu"
+
+
+@pytest.mark.skipif(not HAS_CUDF, reason="未安装 cudf")
+def test_cudf_scoring_matches_cpu(files, tmp_path):
+    cpu = run_scoring(files, str(tmp_path / "cpu"), exact=True, workers=1, today=TODAY, backend="cpu")
+    gpu = run_scoring(files, str(tmp_path / "gpu"), exact=True, workers=1, today=TODAY, backend="cudf")
+    np.testing.assert_allclose(gpu["edges"], cpu["edges"])
+    assert dict(gpu["segment_counts"]) == dict(cpu["segment_counts"])
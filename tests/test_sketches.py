@@ -0,0 +1,75 @@
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.json_cache import CACHE_DIR_ENV
+from common.sequences import EventBuckets, distinct_buyers, sequential_pair_counts
+from common.sketches import HyperLogLog, SpaceSaving
+from common.synth import write_dataset
+from common.transactions import purchase_events
+
+# 近似路径须落在各自的误差界内：SpaceSaving 的真实频数在 [count - error, count] 内、保证的前 k 项确为真实前 k 项，
+# HyperLogLog 的相对误差不超过数倍标准误差；分桶的精确不同用户数与全量 nunique 一致。
+
+
+@pytest.fixture(scope="module")
+def files(tmp_path_factory):
+    mp = pytest.MonkeyPatch()
+    mp.delenv(CACHE_DIR_ENV, raising=False)  # 解析缓存写在临时数据目录下
+    yield write_dataset(str(tmp_path_factory.mktemp("synth")), files=3, rows=3000, seed=9, n_users=500)
+    mp.undo()
+
+
+def test_space_saving_bounds_and_top_k():
+    rng = np.random.default_rng(1)
+    parts = [rng.zipf(1.3, size=20000) % 5000 for _ in range(4)]
+    exact = Counter(np.concatenate(parts).tolist())
+    summary = SpaceSaving(200)
+    for part in parts:
+        summary.merge(SpaceSaving(200).update(part))
+    top = summary.top_k()
+    true = np.array([exact[k] for k in top["key"]])
+    assert np.all(true <= top["count"]) and np.all(true >= top["count"] - top["error"])
+    k = 20
+    guaranteed = summary.guaranteed(k)["key"]
+    assert len(guaranteed) and min(exact[key] for key in guaranteed) >= exact.most_common(k)[-1][1]
+
+
+def test_hyperloglog_within_error():
+    hll = HyperLogLog(12)
+    for part in np.array_split(np.arange(200000) * 7919, 5):
+        hll.merge(HyperLogLog(12).update(part))
+    assert abs(hll.estimate() / 200000 - 1) <= 4 * hll.relative_error
+
+
+def test_pair_sketch_matches_exact(files):
+    with EventBuckets.scatter(files, purchase_events, n_buckets=3, workers=1) as buckets:
+        exact = sequential_pair_counts(files, purchase_events, workers=1, buckets=buckets)
+        approx = sequential_pair_counts(files, purchase_events, workers=1, sketch=30, buckets=buckets)
+    true = exact.set_index(["from_category", "to_category"])["count"]
+    keys = list(zip(approx["from_category"], approx["to_category"]))
+    counts = true.reindex(keys, fill_value=0).to_numpy()
+    assert np.all(counts <= approx["count"]) and np.all(counts >= approx["count"] - approx["error"])
+    # 真实次数超过摘要最小估计值的对都被保留；精确结果的第 k 大次数落在摘要第 k 大的下界与上界之间
+    assert set(true.index[true > approx["count"].min()]) <= set(keys)
+    for k in (1, 5, 10):
+        lower = np.sort((approx["count"] - approx["error"]).to_numpy())[::-1][k - 1]
+        assert lower <= true.iloc[k - 1] <= approx["count"].iloc[k - 1]
+
+
+def test_distinct_buyers_exact_and_sketch(files):
+    events = pd.concat([purchase_events(f) for f in files], ignore_index=True)
+    month = events["purchase_date"].dt.to_period("M")
+    expected = events.groupby([month, events["category"]], observed=True)["user_id"].nunique().unstack().fillna(0)
+    with EventBuckets.scatter(files, purchase_events, n_buckets=3, workers=1) as buckets:
+        exact = distinct_buyers(files, purchase_events, workers=1, buckets=buckets)
+        approx = distinct_buyers(files, purchase_events, p=12, workers=1, buckets=buckets)
+    expected = expected.rename(columns=str).sort_index(axis=1).astype("int64")
+    pd.testing.assert_frame_equal(exact, expected, check_names=False, check_column_type=False)
+    error = 1.04 / 2 ** 6
+    assert np.all(np.abs(approx.to_numpy() - exact.to_numpy()) <= np.maximum(4 * error * exact.to_numpy(), 1))
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.timestamps import ISO8601, check_format, infer_format, parse_epoch, to_datetime64
+
+# 推断出的格式须能解析 pd.to_datetime 接受的常见 ISO 8601 写法（小数秒、Z、±hh:mm），
+# 解析结果取记录中的当地时间；样本大面积无法解析时报错。
+
+ISO_VALUES = ["2024-01-02T03:04:05.123", "2024-03-04T05:06:07Z", "2024-05-06T07:08:09.5+08:00", "2024-07-08T09:10:11+0800"]
+
+
+@pytest.mark.parametrize("value", ISO_VALUES)
+def test_iso8601_variants_parse_like_pandas(value):
+    fmt = infer_format([value] * 3)
+    assert fmt == ISO8601
+    seconds, valid = parse_epoch([value, "坏值", None], check_format([value], fmt))
+    assert valid.tolist() == [True, False, False]
+    expected = pd.Timestamp(value).tz_localize(None).floor("s")
+    assert pd.Timestamp(to_datetime64(seconds)[0]) == expected
+
+
+def test_plain_format_preferred_over_iso8601():
+    assert infer_format(["2024-01-02T03:04:05"] * 3) == "%Y-%m-%dT%H:%M:%S"
+
+
+def test_check_format_rejects_mostly_unparsable():
+    with pytest.raises(ValueError, match="last_login"):
+        check_format(ISO_VALUES, "%Y/%m/%d", key="last_login")
+    assert check_format(ISO_VALUES + [None] * 10, ISO8601) == ISO8601
+    assert np.all(parse_epoch(ISO_VALUES, ISO8601)[1])
@@ -0,0 +1,186 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+import traceback
+from queue import Empty
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.json_cache import load_parsed
+from common.loader import list_files
+from common.synth import write_dataset
+
+# 各分析阶段的性能基准：每个阶段在独立的子进程（spawn）中运行，记录耗时、吞吐（行/秒）与峰值内存。
+# 结果可写入 JSON，并与基线结果比较，吞吐下降超过阈值时以非零状态退出，便于在 CI 中跟踪性能回退。
+#   python tools/benchmark.py --files 4 --rows 50000 --output bench.json
+#   python tools/benchmark.py --files 4 --rows 50000 --baseline bench.json
+
+STAGES = ["load", "json_parse", "cleaning", "scoring", "apriori", "sequences"]
+POLL_S = 1.0
+
+
+# ---------- 各阶段（模块级函数，子进程中执行） ----------
+def stage_load(files, workers, work_dir):
+    from common.loader import load_table
+    from common.synth import SYNTH_SCHEMA
+    columns = [c for c in SYNTH_SCHEMA.names if c not in ("purchase_history", "login_history")]
+    return load_table(files, columns=columns).num_rows
+
+
+def stage_json_parse(files, workers, work_dir):
+    from common.json_cache import build_cache
+    return sum(build_cache(f).num_rows for f in files)
+
+
+def stage_cleaning(files, workers, work_dir):
+    from common.cleaning import fill_values, merge_stats, partition_stats
+    from common.parallel import map_reduce
+    stats = map_reduce(partition_stats, files, merge_stats, workers=workers)
+    fill_values(stats)
+    return stats.rows
+
+
+def stage_scoring(files, workers, work_dir):
+    from common.scoring import run_scoring
+    result = run_scoring(files, os.path.join(work_dir, "scores"), workers=workers)
+    return sum(result["segment_counts"].values())
+
+
+def stage_apriori(files, workers, work_dir):
+    from common.itemsets import association_rules
+    from common.son import son_frequent_itemsets
+    from common.transactions import category_transactions, refund_transactions
+    frequent = son_frequent_itemsets(files, category_transactions, min_support=0.02, workers=workers)
+    association_rules(frequent, metric="confidence", min_threshold=0.5)
+    refunds = son_frequent_itemsets(files, refund_transactions, min_support=0.005, workers=workers)
+    association_rules(refunds, metric="confidence", min_threshold=0.4)
+    return _row_count(files)
+
+
+def stage_sequences(files, workers, work_dir):
+    from common.sequences import mine_sequential_patterns, sequential_pair_counts
+    from common.transactions import purchase_events
+    sequential_pair_counts(files, purchase_events, workers=workers)
+    mine_sequential_patterns(files, purchase_events, min_support=0.01, max_len=3, workers=workers)
+    return _row_count(files)
+
+
+def _row_count(files):
+    import pyarrow.parquet as pq
+    return sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+
+
+def _run_stage(name, files, workers, work_dir, queue):
+    func = globals()["stage_" + name]
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        rows = func(files, workers, work_dir)
+    except Exception:
+        queue.put({"stage": name, "error": traceback.format_exc()})
+        return
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    # Linux 上 ru_maxrss 单位为 KB；子进程（进程池）的峰值单独给出
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    child_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    queue.put({"stage": name, "rows": rows, "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+               "rows_per_s": round(rows / wall, 1) if wall > 0 else None,
+               "peak_rss_mb": round(peak, 1), "peak_child_rss_mb": round(child_peak, 1)})
+
+
+def _wait_result(name, proc, queue, timeout):
+    # 子进程异常时由 _run_stage 放回 error；被信号杀死、超时等没有结果时按退出码记为失败
+    start = time.perf_counter()
+    while True:
+        try:
+            return queue.get(timeout=POLL_S)
+        except Empty:
+            pass
+        if not proc.is_alive():
+            try:
+                return queue.get(timeout=POLL_S)
+            except Empty:
+                return {"stage": name, "error": f"子进程退出（exitcode={proc.exitcode}），未返回结果"}
+        if timeout is not None and time.perf_counter() - start > timeout:
+            proc.terminate()
+            return {"stage": name, "error": f"超过 {timeout} s 未完成，已终止"}
+
+
+def run_benchmark(files, stages=STAGES, workers=1, work_dir=None, timeout=None):
+    """逐阶段在子进程中运行；失败的阶段记为 {"stage", "error"}，不影响后续阶段。"""
+    ctx = mp.get_context("spawn")
+    results = []
+    for name in stages:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_stage, args=(name, files, workers, work_dir, queue))
+        proc.start()
+        result = _wait_result(name, proc, queue, timeout)
+        proc.join()
+        results.append(result)
+        if "error" in result:
+            print(f"{name:<12} 失败：{result['error'].strip().splitlines()[-1]}")
+            continue
+        print(f"{name:<12} {result['rows']:>10,} 行 {result['wall_s']:>9.3f} s "
+              f"{result['rows_per_s'] or 0:>12,.0f} 行/s  峰值内存 {result['peak_rss_mb']:.1f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """与基线比较吞吐，返回下降超过 tolerance 的阶段。"""
+    base = {r["stage"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get(r["stage"])
+        if b and b.get("rows_per_s") and r.get("rows_per_s"):
+            ratio = r["rows_per_s"] / b["rows_per_s"]
+            print(f"{r['stage']:<12} 吞吐为基线的 {ratio:.2f} 倍")
+            if ratio < 1 - tolerance:
+                regressions.append(r["stage"])
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="各分析阶段的性能基准")
+    parser.add_argument("--data", default=None, help="已有的 part 文件目录；不指定时生成合成数据")
+    parser.add_argument("--files", type=int, default=4, help="合成数据的 part 文件个数")
+    parser.add_argument("--rows", type=int, default=50000, help="合成数据每个文件的行数")
+    parser.add_argument("--n-users", type=int, default=None, help="合成数据的用户数（同一用户多条记录）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default=",".join(STAGES), help="逗号分隔的阶段列表：" + ",".join(STAGES))
+    parser.add_argument("--workers", type=int, default=1, help="各阶段的进程数，默认 1 以便比较")
+    parser.add_argument("--output", default=None, help="结果写入的 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="基线结果 JSON，吞吐下降超过 --tolerance 时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=None, help="单个阶段的最长秒数，超时记为失败")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="dm_bench_") as work_dir:
+        data_dir = args.data or os.path.join(work_dir, "data")
+        if args.data is None:
+            write_dataset(data_dir, files=args.files, rows=args.rows, seed=args.seed, n_users=args.n_users)
+        # 解析缓存写到临时目录并预先建好：json_parse 阶段总是完整重新解析，其余阶段只计读取缓存的开销
+        os.environ["DM_CACHE_DIR"] = os.path.join(work_dir, "cache")
+        files = list_files(os.path.join(data_dir, "part-*.parquet"))
+        for f in files:
+            load_parsed(f)
+        stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+        results = run_benchmark(files, stages, workers=args.workers, work_dir=work_dir,
+                                timeout=args.timeout)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    failed = [r["stage"] for r in results if "error" in r]
+    if failed:
+        print("失败的阶段：", ", ".join(failed))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("性能回退：", ", ".join(regressions))
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
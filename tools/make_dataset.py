@@ -0,0 +1,27 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.synth import write_dataset
+
+# 生成合成数据集，例如：
+#   python tools/make_dataset.py --out /tmp/dm/10G_data_new --files 8 --rows 200000
+# 之后设置 DM_DATA_ROOT=/tmp/dm 即可直接运行 hw1 / hw2 下的脚本。
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成与作业数据同结构的合成 part-*.parquet 文件")
+    parser.add_argument("--out", required=True, help="输出目录")
+    parser.add_argument("--files", type=int, default=4, help="part 文件个数")
+    parser.add_argument("--rows", type=int, default=100000, help="每个文件的行数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n-users", type=int, default=None, help="用户数；给定时同一用户可有多条记录（用于顺序模式）")
+    parser.add_argument("--null-rate", type=float, default=0.02, help="各可空列的缺失比例")
+    parser.add_argument("--malformed-rate", type=float, default=0.02, help="JSON/日期/邮箱/手机号格式错误比例")
+    parser.add_argument("--abnormal-rate", type=float, default=0.01, help="age/income 异常值比例")
+    args = parser.parse_args()
+
+    paths = write_dataset(args.out, files=args.files, rows=args.rows, seed=args.seed, n_users=args.n_users,
+                          null_rate=args.null_rate, malformed_rate=args.malformed_rate,
+                          abnormal_rate=args.abnormal_rate)
+    print(f"已写出 {len(paths)} 个文件，共 {len(paths) * args.rows:,} 行 -> {args.out}")